@@ -0,0 +1,298 @@
+"""
+Hourly ride rollups.
+
+ride_hourly_stats counts rides per UTC hour of creation, vehicle type and
+current status, with completed revenue and distance. The analytics API reads
+only this table, so a chart over months touches at most a few rows per hour
+instead of every ride.
+
+The rollup is maintained incrementally. Every ride change (creation and each
+status transition) appends signed deltas to ride_stat_deltas in the ride's own
+transaction: -1 for the old status, +1 for the new one. RollupCompactor folds
+the pending deltas into the rollup in batches, like the loyalty ledger, so busy
+hours never queue on one hot rollup row. ``rebuild`` recomputes everything from
+the rides table and the rides archive.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.archive import with_archive
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Ride, RideHourlyStat, RideStatDelta, RideStatus, VehicleType
+
+# pg_advisory_xact_lock key serializing compaction and rebuilds across workers
+ROLLUP_LOCK_ID = 0x52494445
+MEASURES = ("rides", "revenue", "distance_km")
+GROUP_FIELDS = ("vehicle_type", "status")
+
+RollupKey = Tuple[datetime, VehicleType, RideStatus]
+
+def hour_start(value: datetime) -> datetime:
+    """UTC hour a timestamp falls in; naive timestamps are taken as UTC"""
+    value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def hour_bucket(column, dialect: str):
+    """SQL for the UTC hour of ``column``, stored the way the ORM stores hour_start()"""
+    if dialect == "postgresql":
+        return func.timezone("UTC", func.date_trunc("hour", func.timezone("UTC", column)))
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00:00.000000", column)
+    raise ValueError(f"No hour bucket expression for {dialect}")
+
+def ride_deltas(
+    created_at: Optional[datetime],
+    vehicle_type: Optional[VehicleType],
+    distance_km: Optional[float],
+    final_fare: Optional[float],
+    old_status: Optional[RideStatus],
+    new_status: Optional[RideStatus]
+) -> List[dict]:
+    """Delta rows moving one ride from ``old_status`` to ``new_status`` (None for created)"""
+    if created_at is None or old_status == new_status:
+        return []
+    key = {"bucket_start": hour_start(created_at), "vehicle_type": vehicle_type or VehicleType.ECONOMY}
+    distance = float(distance_km or 0)
+    fare = float(final_fare or 0)
+    rows = []
+    for status, sign in ((old_status, -1), (new_status, 1)):
+        if status is None:
+            continue
+        rows.append({
+            **key,
+            "status": status,
+            "rides": sign,
+            "revenue": sign * fare if status == RideStatus.COMPLETED else 0.0,
+            "distance_km": sign * distance
+        })
+    return rows
+
+def record_ride_changes(db: Session, rows: Iterable[dict]):
+    """Append delta rows in the caller's transaction"""
+    rows = list(rows)
+    if rows:
+        db.execute(insert(RideStatDelta), rows)
+
+def record_rides_created(db: Session, rides: Iterable[Ride]):
+    """Count new rides; their created_at must be loaded (INSERT ... RETURNING or a flush)"""
+    record_ride_changes(db, [
+        delta
+        for ride in rides
+        for delta in ride_deltas(ride.created_at, ride.vehicle_type, ride.distance_km, ride.final_fare, None, ride.status)
+    ])
+
+def _lock(db: Session):
+    if db.bind.dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(ROLLUP_LOCK_ID)))
+
+def _upsert(db: Session, totals: Dict[RollupKey, List[float]]):
+    rows = [
+        {"bucket_start": bucket, "vehicle_type": vehicle_type, "status": status,
+         "rides": int(values[0]), "revenue": values[1], "distance_km": values[2]}
+        for (bucket, vehicle_type, status), values in totals.items()
+    ]
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        statement = (postgresql if dialect == "postgresql" else sqlite).insert(RideHourlyStat)
+        statement = statement.on_conflict_do_update(
+            index_elements=["bucket_start", "vehicle_type", "status"],
+            set_={name: getattr(RideHourlyStat, name) + getattr(statement.excluded, name) for name in MEASURES}
+        )
+        db.execute(statement, rows)
+        return
+    for row in rows:
+        stat = db.get(RideHourlyStat, (row["bucket_start"], row["vehicle_type"], row["status"]))
+        if stat is None:
+            db.add(RideHourlyStat(**row))
+        else:
+            for name in MEASURES:
+                setattr(stat, name, getattr(stat, name) + row[name])
+
+def rebuild() -> int:
+    """Recompute the rollup from rides and rides_archive; returns the number of rollup rows.
+
+    Runs in its own REPEATABLE READ transaction under the compaction lock, so
+    deltas committed after its snapshot stay pending and are folded in later
+    without being counted twice.
+    """
+    db = SessionLocal()
+    try:
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        _lock(db)
+        db.execute(delete(RideStatDelta))
+        db.execute(delete(RideHourlyStat))
+        rides = with_archive(lambda model: select(
+            model.id, model.created_at, model.vehicle_type, model.status, model.final_fare, model.distance_km
+        ).where(model.created_at != None)).subquery()
+        bucket = hour_bucket(rides.c.created_at, dialect)
+        vehicle_type = func.coalesce(rides.c.vehicle_type, VehicleType.ECONOMY)
+        status = func.coalesce(rides.c.status, RideStatus.PENDING)
+        grouped = select(
+            bucket, vehicle_type, status,
+            func.count(rides.c.id),
+            func.coalesce(func.sum(case((rides.c.status == RideStatus.COMPLETED, rides.c.final_fare))), 0.0),
+            func.coalesce(func.sum(rides.c.distance_km), 0.0)
+        ).group_by(bucket, vehicle_type, status)
+        db.execute(insert(RideHourlyStat).from_select(
+            ["bucket_start", "vehicle_type", "status", *MEASURES], grouped
+        ))
+        count = db.query(func.count()).select_from(RideHourlyStat).scalar()
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+class RollupCompactor:
+    """Background task that folds ride_stat_deltas into ride_hourly_stats"""
+
+    def __init__(self, interval_seconds: float = 10.0, batch_size: int = 5000):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.compacted_deltas = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_compacted_at: Optional[float] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="rollup-compactor")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.drain()
+            except Exception as e:
+                self.errors += 1
+                print(f"Rollup compactor error: {e}")
+
+    async def drain(self):
+        while await asyncio.to_thread(self._compact_batch) >= self.batch_size:
+            pass
+
+    def _compact_batch(self) -> int:
+        db = SessionLocal()
+        try:
+            _lock(db)
+            deltas = db.query(
+                RideStatDelta.id, RideStatDelta.bucket_start, RideStatDelta.vehicle_type, RideStatDelta.status,
+                RideStatDelta.rides, RideStatDelta.revenue, RideStatDelta.distance_km
+            ).order_by(RideStatDelta.id).limit(self.batch_size).all()
+            if not deltas:
+                db.rollback()
+                self.last_compacted_at = time.time()
+                return 0
+
+            totals: Dict[RollupKey, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+            for _, bucket, vehicle_type, status, rides, revenue, distance in deltas:
+                values = totals[(hour_start(bucket), vehicle_type, status)]
+                values[0] += rides
+                values[1] += revenue or 0.0
+                values[2] += distance or 0.0
+            # A ride created and moved on within one batch nets out to nothing
+            totals = {key: values for key, values in totals.items() if any(values)}
+            if totals:
+                _upsert(db, totals)
+            # Only the rows read: a delta with a lower id may commit after the SELECT
+            db.execute(delete(RideStatDelta).where(RideStatDelta.id.in_([delta[0] for delta in deltas])))
+            db.commit()
+
+            self.compacted_deltas += len(deltas)
+            self.batches += 1
+            self.last_compacted_at = time.time()
+            return len(deltas)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "compacted_deltas": self.compacted_deltas,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_compacted_at": self.last_compacted_at
+        }
+
+def query_rollup(
+    db: Session,
+    since: datetime,
+    until: datetime,
+    granularity: str = "hour",
+    group_by: Iterable[str] = (),
+    vehicle_type: Optional[VehicleType] = None,
+    status: Optional[RideStatus] = None
+) -> dict:
+    """Rides, revenue and distance per hour or day in [since, until), optionally split by group_by"""
+    group_by = [name for name in GROUP_FIELDS if name in set(group_by)]
+    group_columns = [getattr(RideHourlyStat, name) for name in group_by]
+    query = db.query(
+        RideHourlyStat.bucket_start, *group_columns,
+        func.sum(RideHourlyStat.rides), func.sum(RideHourlyStat.revenue), func.sum(RideHourlyStat.distance_km)
+    ).filter(
+        RideHourlyStat.bucket_start >= hour_start(since),
+        RideHourlyStat.bucket_start < until
+    )
+    if vehicle_type is not None:
+        query = query.filter(RideHourlyStat.vehicle_type == vehicle_type)
+    if status is not None:
+        query = query.filter(RideHourlyStat.status == status)
+    rows = query.group_by(RideHourlyStat.bucket_start, *group_columns).all()
+
+    series: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    for bucket, *rest in rows:
+        groups, (rides, revenue, distance) = rest[:len(group_by)], rest[len(group_by):]
+        bucket = hour_start(bucket)
+        if granularity == "day":
+            bucket = bucket.replace(hour=0)
+        values = series[(bucket, *groups)]
+        values[0] += int(rides or 0)
+        values[1] += revenue or 0.0
+        values[2] += distance or 0.0
+
+    points = []
+    totals = [0, 0.0, 0.0]
+    for key in sorted(series, key=lambda key: (key[0], *[str(group.value) for group in key[1:]])):
+        rides, revenue, distance = series[key]
+        if not rides and not revenue:
+            continue
+        point = {"bucket_start": key[0]}
+        point.update({name: group.value for name, group in zip(group_by, key[1:])})
+        point.update({"rides": rides, "revenue": round(revenue, 2), "distance_km": round(distance, 2)})
+        points.append(point)
+        totals[0] += rides
+        totals[1] += revenue
+        totals[2] += distance
+
+    return {
+        "granularity": granularity,
+        "since": hour_start(since),
+        "until": until,
+        "group_by": group_by,
+        "series": points,
+        "totals": {"rides": totals[0], "revenue": round(totals[1], 2), "distance_km": round(totals[2], 2)}
+    }
+
+rollup_compactor = RollupCompactor(
+    interval_seconds=settings.rollup_compact_interval_seconds,
+    batch_size=settings.rollup_compact_batch_size
+)
@@ -0,0 +1,166 @@
+"""
+Ride archival.
+
+Completed and cancelled rides never change again, apart from a rating, yet
+every query on ``rides`` had to step over them. RideArchiver moves terminal
+rides that have not changed for ``ride_archive_after_days`` (by ``updated_at``,
+so a ride booked long ago but finished yesterday stays) into ``rides_archive``
+in batches. Dispatch, the driver's ride list and the admin stats then only touch
+the active set. Each batch locks its rides, copies them and deletes them in
+one transaction, so a ride is always in exactly one of the two tables.
+
+History endpoints add the archive when asked (``include_archived``) through
+``with_archive``. Single-ride lookups fall back to it. The analytics rollup
+counts archived rides as well, and archiving leaves their rollup rows alone.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional, Tuple, Union
+
+from sqlalchemy import case, delete, func, insert, select, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Ride, RideArchive, RideStatus
+
+RIDE_COLUMNS = [column.name for column in Ride.__table__.columns]
+TERMINAL_STATUSES = (RideStatus.COMPLETED, RideStatus.CANCELLED)
+
+def with_archive(build: Callable[[Any], Select]) -> Select:
+    """UNION ALL of ``build(Ride)`` and ``build(RideArchive)``; select its columns by name to order or filter"""
+    combined = union_all(build(Ride), build(RideArchive)).subquery()
+    return select(*combined.c)
+
+def find_ride(db: Session, ride_id: int) -> Optional[Union[Ride, RideArchive]]:
+    """The ride from rides, or from the archive once it has been moved there"""
+    return db.query(Ride).filter(Ride.id == ride_id).first() or db.get(RideArchive, ride_id)
+
+class ArchiveTotals:
+    """Ride, completed ride and revenue totals over the archive.
+
+    The archive only grows when the archiver runs, so the totals are cached.
+    Another worker's archiver invalidates only its own copy. Elsewhere the
+    totals can trail by up to ``max_age_seconds``.
+    """
+
+    def __init__(self, max_age_seconds: float = 300.0):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._totals: Optional[Tuple[int, int, float]] = None
+        self._loaded_at = 0.0
+
+    def get(self, db: Session) -> Tuple[int, int, float]:
+        with self._lock:
+            if self._totals is not None and time.monotonic() - self._loaded_at < self.max_age_seconds:
+                return self._totals
+        completed = RideArchive.status == RideStatus.COMPLETED
+        rides, completed_rides, revenue = db.query(
+            func.count(RideArchive.id),
+            func.coalesce(func.sum(case((completed, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((completed, RideArchive.final_fare), else_=None)), 0.0)
+        ).one()
+        totals = (int(rides), int(completed_rides), float(revenue))
+        with self._lock:
+            self._totals, self._loaded_at = totals, time.monotonic()
+        return totals
+
+    def invalidate(self):
+        with self._lock:
+            self._totals = None
+
+class RideArchiver:
+    """Background task that moves long-finished completed and cancelled rides to rides_archive"""
+
+    def __init__(self, after_days: int = 30, interval_seconds: float = 3600.0, batch_size: int = 1000):
+        self.after_days = after_days
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.archived = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_run_at: Optional[float] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="ride-archiver")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                self.errors += 1
+                print(f"Ride archiver error: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def drain(self) -> int:
+        """Archive every eligible ride; returns how many were moved"""
+        moved = 0
+        while True:
+            count = await asyncio.to_thread(self._archive_batch)
+            moved += count
+            if count < self.batch_size:
+                self.last_run_at = time.time()
+                return moved
+
+    def _archive_batch(self) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.after_days)
+        db = SessionLocal()
+        try:
+            query = db.query(Ride.id).filter(
+                Ride.status.in_(TERMINAL_STATUSES),
+                Ride.updated_at < cutoff
+            ).order_by(Ride.id).limit(self.batch_size)
+            if db.bind.dialect.name == "postgresql":
+                # Several workers can archive concurrently, and a rating in flight keeps its ride
+                query = query.with_for_update(skip_locked=True)
+            ride_ids = [ride_id for ride_id, in query.all()]
+            if not ride_ids:
+                db.rollback()
+                return 0
+
+            rides = Ride.__table__
+            db.execute(insert(RideArchive).from_select(
+                RIDE_COLUMNS,
+                select(*[rides.c[name] for name in RIDE_COLUMNS]).where(rides.c.id.in_(ride_ids))
+            ))
+            db.execute(delete(rides).where(rides.c.id.in_(ride_ids)))
+            db.commit()
+            archive_totals.invalidate()
+
+            self.archived += len(ride_ids)
+            self.batches += 1
+            return len(ride_ids)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "after_days": self.after_days,
+            "archived": self.archived,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at
+        }
+
+archive_totals = ArchiveTotals(max_age_seconds=settings.ride_archive_totals_max_age_seconds)
+ride_archiver = RideArchiver(
+    after_days=settings.ride_archive_after_days,
+    interval_seconds=settings.ride_archive_interval_seconds,
+    batch_size=settings.ride_archive_batch_size
+)
@@ -0,0 +1,198 @@
+"""
+In-memory city table with precomputed intercity distances.
+
+The cities table is small and changes rarely, so it is loaded once into a
+CitySnapshot. The snapshot holds an all-pairs distance matrix stored as a flat
+``array('d')``. An intercity quote is two dict lookups, an index into the array
+and a multiply-add per vehicle class.
+
+Snapshots are built in a worker thread with their own session, like the other
+background engines, so the O(n^2) matrix never runs on the event loop. A
+snapshot older than ``max_age_seconds`` keeps being served while a replacement
+loads in the background. ``create_city`` invalidates the cache in its own
+worker; a request for a city the snapshot lacks but the database has (added by
+another worker or by seed_database.py / update_cities.py) waits for a reload.
+"""
+import asyncio
+import threading
+import time
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.fares import INTERCITY_TARIFFS, INTERCITY_MULTIPLIER, INTERCITY_AVERAGE_SPEED_KMH
+from app.geo import haversine_km
+from app.models import City, VehicleType
+
+# Used when either city has no coordinates
+DEFAULT_INTERCITY_DISTANCE_KM = 100.0
+# Used for a zero-distance trip, e.g. within one city
+DEFAULT_INTERCITY_DURATION_HOURS = 2.0
+
+class CityRow(NamedTuple):
+    id: int
+    name: str
+    state: Optional[str]
+    country: Optional[str]
+    lat: Optional[float]
+    lng: Optional[float]
+    is_active: bool
+
+class IntercityQuote(NamedTuple):
+    distance_km: float
+    estimated_duration_hours: float
+    price: float
+
+def distance_matrix(cities: List[CityRow]) -> array:
+    """Row-major n x n great-circle distances in km"""
+    n = len(cities)
+    matrix = array("d", bytes(8 * n * n))
+    for i in range(n):
+        origin = cities[i]
+        row = i * n
+        for j in range(i + 1, n):
+            dest = cities[j]
+            if None in (origin.lat, origin.lng, dest.lat, dest.lng):
+                distance = DEFAULT_INTERCITY_DISTANCE_KM
+            else:
+                distance = haversine_km(origin.lat, origin.lng, dest.lat, dest.lng)
+            matrix[row + j] = distance
+            matrix[j * n + i] = distance
+    return matrix
+
+class CitySnapshot:
+    def __init__(self, cities: List[CityRow], loaded_at: float):
+        self.cities = cities
+        self.index: Dict[int, int] = {city.id: i for i, city in enumerate(cities)}
+        self.size = len(cities)
+        self.distances = distance_matrix(cities)
+        # When the cities were read, not when the matrix was finished
+        self.loaded_at = loaded_at
+
+    def get(self, city_id: int) -> Optional[CityRow]:
+        i = self.index.get(city_id)
+        return self.cities[i] if i is not None else None
+
+    def active_cities(self) -> List[CityRow]:
+        return [city for city in self.cities if city.is_active]
+
+    def _cell(self, origin_id: int, destination_id: int) -> Optional[int]:
+        i = self.index.get(origin_id)
+        j = self.index.get(destination_id)
+        if i is None or j is None:
+            return None
+        return i * self.size + j
+
+    def quote(self, origin_id: int, destination_id: int, vehicle_type: VehicleType) -> Optional[IntercityQuote]:
+        """Distance, duration and price between two cities; None if either is unknown"""
+        cell = self._cell(origin_id, destination_id)
+        if cell is None:
+            return None
+        distance = self.distances[cell]
+        duration = distance / INTERCITY_AVERAGE_SPEED_KMH if distance else DEFAULT_INTERCITY_DURATION_HOURS
+        return IntercityQuote(distance, duration, INTERCITY_TARIFFS.price(distance, vehicle_type, INTERCITY_MULTIPLIER))
+
+    def quote_all(self, origin_id: int, destination_id: int) -> Optional[List[Tuple[VehicleType, float]]]:
+        cell = self._cell(origin_id, destination_id)
+        if cell is None:
+            return None
+        distance = self.distances[cell]
+        return [
+            (vehicle_type, INTERCITY_TARIFFS.price(distance, vehicle_type, INTERCITY_MULTIPLIER))
+            for vehicle_type in INTERCITY_TARIFFS.vehicle_types
+        ]
+
+class CityCache:
+    def __init__(self, max_age_seconds: float = 300.0):
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: Optional[CitySnapshot] = None
+        # Serializes loads, so a burst of misses builds one snapshot, not one each
+        self._lock = threading.Lock()
+        self._background: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.errors = 0
+        self.last_load_ms = 0.0
+
+    async def get(self, *city_ids: int) -> CitySnapshot:
+        """The current snapshot, reloaded first if it lacks any of ``city_ids`` that exist"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await asyncio.to_thread(self._reload, time.monotonic())
+        missing = [city_id for city_id in city_ids if city_id not in snapshot.index]
+        if missing:
+            return await asyncio.to_thread(self._reload_if_exists, missing, time.monotonic())
+        if time.monotonic() - snapshot.loaded_at > self.max_age_seconds and self._background is None:
+            # Serve the old snapshot meanwhile
+            self._background = asyncio.create_task(self._reload_in_background(), name="city-cache-reload")
+        return snapshot
+
+    def current(self) -> Optional[CitySnapshot]:
+        """The loaded snapshot, without checking its age"""
+        return self._snapshot
+
+    async def _reload_in_background(self):
+        try:
+            await asyncio.to_thread(self._reload, time.monotonic())
+        except Exception as e:
+            self.errors += 1
+            print(f"City cache reload error: {e}")
+        finally:
+            self._background = None
+
+    def _reload(self, requested_at: float) -> CitySnapshot:
+        db = SessionLocal()
+        try:
+            return self._load(db, requested_at)
+        finally:
+            db.close()
+
+    def _reload_if_exists(self, city_ids: List[int], requested_at: float) -> CitySnapshot:
+        db = SessionLocal()
+        try:
+            # One indexed lookup, so unknown ids cannot force a reload per request
+            if db.query(City.id).filter(City.id.in_(city_ids)).first() is None:
+                return self._snapshot
+            return self._load(db, requested_at)
+        finally:
+            db.close()
+
+    def _load(self, db: Session, requested_at: float) -> CitySnapshot:
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.loaded_at >= requested_at:
+                # Another thread read the cities after this caller asked
+                return snapshot
+            started = time.perf_counter()
+            loaded_at = time.monotonic()
+            rows = db.query(
+                City.id, City.name, City.state, City.country, City.lat, City.lng, City.is_active
+            ).order_by(City.id).all()
+            snapshot = CitySnapshot([
+                CityRow(
+                    city_id, name, state, country,
+                    float(lat) if lat is not None else None,
+                    float(lng) if lng is not None else None,
+                    bool(is_active) if is_active is not None else True
+                )
+                for city_id, name, state, country, lat, lng, is_active in rows
+            ], loaded_at)
+            self._snapshot = snapshot
+            self.loads += 1
+            self.last_load_ms = (time.perf_counter() - started) * 1000
+            return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def stats(self) -> dict:
+        return {
+            "cities": self._snapshot.size if self._snapshot else 0,
+            "loads": self.loads,
+            "errors": self.errors,
+            "last_load_ms": round(self.last_load_ms, 3)
+        }
+
+city_cache = CityCache(max_age_seconds=settings.city_cache_max_age_seconds)
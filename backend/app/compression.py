@@ -0,0 +1,151 @@
+"""
+Response compression.
+
+CompressionMiddleware encodes response bodies with brotli or gzip, whichever the
+client prefers in Accept-Encoding (brotli wins ties). Bodies below
+``compression_minimum_size`` are sent as is, because compressing them costs
+more CPU than it saves on the wire. Streaming responses are compressed chunk
+by chunk and flushed after every chunk, so an NDJSON stream stays a stream.
+A strong ETag on a compressed response is made weak, since the encoded bytes
+differ from the identity body it was computed for.
+
+brotli is optional. Without the package, only gzip is offered.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+def compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith("text/") or media_type.endswith("+json") or media_type in COMPRESSIBLE_TYPES
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best of br/gzip acceptable to the client, by q-value"""
+    offered = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    wildcard = offered.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        quality = offered.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def add_vary(headers: MutableHeaders, name: str):
+    """Add ``name`` to Vary unless it is already listed"""
+    listed = [item.strip().lower() for item in headers.get("vary", "").split(",")]
+    if name.lower() not in listed and "*" not in listed:
+        headers.add_vary_header(name)
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+class CompressionMiddleware:
+    """Pure ASGI, so streaming bodies pass through chunk by chunk"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        # None until the first body chunk decides; False means pass through
+        encoder = None
+
+        async def send_wrapper(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=list(start["headers"]))
+                if (
+                    "content-encoding" in headers
+                    or not compressible(headers.get("content-type"))
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    encoder = False
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = self.encoder(encoding)
+                body = encoder.encode(body, final=not more_body)
+                headers["Content-Encoding"] = encoding
+                add_vary(headers, "Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send({**start, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+            if encoder is False:
+                await send(message)
+                return
+            await send({"type": "http.response.body", "body": encoder.encode(body, final=not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
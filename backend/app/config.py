@@ -9,6 +9,67 @@ class Settings(BaseSettings):
     google_maps_api_key: str = ""
     stripe_secret_key: str = ""
     redis_url: str = "redis://localhost:6379"
+    dispatcher_queue_size: int = 10000
+    dispatcher_workers: int = 4
+    outbox_poll_interval_seconds: float = 1.0
+    outbox_batch_size: int = 100
+    outbox_lease_seconds: int = 30
+    outbox_retention_hours: int = 24
+    notification_email_backend: str = "console"  # console, smtp or memory
+    notification_sms_backend: str = "console"  # console or memory
+    notification_workers_per_channel: int = 2
+    notification_batch_size: int = 50
+    notification_max_retries: int = 5
+    notification_rate_limit_per_second: float = 20.0
+    smtp_host: str = "localhost"
+    smtp_port: int = 25
+    smtp_username: str = ""
+    smtp_password: str = ""
+    smtp_sender: str = "no-reply@uber-clone.local"
+    smtp_use_tls: bool = False
+    geo_cell_size_deg: float = 0.02  # ~2.2 km grid cells
+    surge_recompute_seconds: float = 5.0
+    surge_window_seconds: float = 600.0
+    surge_reconcile_seconds: float = 60.0
+    surge_sensitivity: float = 0.5
+    surge_max_multiplier: float = 3.0
+    ride_release_lead_minutes: int = 15  # scheduled rides enter dispatch this long before pickup
+    ride_scheduler_horizon_hours: float = 6.0  # only rides due within this window are held in memory
+    ride_dispatch_radius_km: float = 3.0
+    vacation_plan_cache_size: int = 10000
+    vacation_notify_radius_km: float = 25.0
+    vacation_notify_top_k: int = 20
+    vacation_notify_rating_weight: float = 0.5
+    loyalty_apply_interval_seconds: float = 5.0
+    loyalty_batch_size: int = 500
+    city_cache_max_age_seconds: float = 300.0
+    intercity_pool_window_hours: float = 3.0  # bookings departing in the same window can share a vehicle
+    intercity_pool_reconcile_seconds: float = 60.0
+    metrics_enabled: bool = True
+    query_profiler_enabled: bool = False  # per-request SQL profiling; adds response headers
+    query_profiler_strict: bool = False  # raise when a request exceeds its budget (for test runs)
+    query_profiler_n_plus_one_threshold: int = 5  # same statement shape this many times in one request
+    query_profiler_max_queries: int = 0  # per-request budget in strict mode, 0 = unlimited
+    query_profiler_history: int = 200
+    profiler_max_seconds: float = 60.0  # upper bound for one sampling profile
+    loop_monitor_enabled: bool = True
+    loop_monitor_threshold_ms: float = 100.0  # log when the event loop is blocked this long
+    loop_monitor_interval_seconds: float = 0.05
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # smaller bodies are sent uncompressed
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4  # 4-5 trades little ratio for much less CPU than 11
+    stream_batch_size: int = 1000  # rows fetched and written per NDJSON chunk
+    export_batch_size: int = 5000
+    export_max_concurrent: int = 2  # per worker; each export holds a pooled connection while it runs
+    rollup_compact_interval_seconds: float = 10.0  # analytics lag behind rides by at most about this much
+    rollup_compact_batch_size: int = 5000
+    singleton_jobs_enabled: bool = True  # rollup compactor and ride archiver; turn off on all but one worker
+    ride_archive_enabled: bool = True
+    ride_archive_after_days: int = 30  # completed/cancelled rides unchanged for this long move to rides_archive
+    ride_archive_interval_seconds: float = 3600.0
+    ride_archive_batch_size: int = 1000
+    ride_archive_totals_max_age_seconds: float = 300.0  # admin stats may trail another worker's archival by this much
     
     class Config:
         env_file = ".env"
@@ -3,7 +3,15 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-engine = create_engine(settings.database_url)
+connect_args = {}
+if settings.database_url.startswith("sqlite"):
+    # Pooled connections are reused by whichever threadpool thread serves the next request
+    connect_args["check_same_thread"] = False
+elif settings.database_url.startswith("postgresql"):
+    # Timestamps are bound as naive UTC, so read them in UTC whatever the server default
+    connect_args["options"] = "-c timezone=utc"
+
+engine = create_engine(settings.database_url, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -0,0 +1,157 @@
+"""
+In-process event dispatcher for WebSocket notifications.
+
+Request handlers publish a DomainEvent after their transaction commits and return
+immediately; a small pool of worker tasks drains the bounded queue and fans the
+event out to connected clients through the ConnectionManager. A publisher that
+needs to know when an event has been processed (the outbox relay) sets
+``handed_off`` to a future, which the worker resolves once it is done with it.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.config import settings
+from app.websocket import manager
+from app.metrics import event_delivery_duration, event_queue_size, ride_dispatch_duration
+
+@dataclass
+class DomainEvent:
+    """A notification to deliver; ``user_ids=None`` means broadcast to everyone"""
+    type: str
+    payload: dict
+    user_ids: Optional[List[int]] = None
+    created_at: float = field(default_factory=time.time)
+    handed_off: Optional[asyncio.Future] = field(default=None, repr=False, compare=False)
+
+    def message(self) -> dict:
+        return {"type": self.type, **self.payload}
+
+class EventDispatcher:
+    """Bounded queue plus worker tasks that deliver events off the request path"""
+
+    def __init__(self, max_queue_size: int = 10000, worker_count: int = 4, max_tracked_rides: int = 10000):
+        self.max_queue_size = max_queue_size
+        self.worker_count = worker_count
+        self.max_tracked_rides = max_tracked_rides
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._workers: List[asyncio.Task] = []
+        # Rides whose request already reached a driver, oldest first
+        self._notified_rides: "OrderedDict[int, None]" = OrderedDict()
+
+        # Metrics
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._total_lag_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"event-dispatcher-{i}")
+            for i in range(self.worker_count)
+        ]
+        print(f"Event dispatcher started with {self.worker_count} workers")
+
+    async def stop(self, timeout: float = 5.0):
+        """Give in-flight events a chance to drain, then cancel the workers"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Event dispatcher stopping with {self._queue.qsize()} undelivered events")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def publish(self, event: DomainEvent) -> bool:
+        """Enqueue an event without waiting. Returns False if the queue is full."""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"Event queue full, dropping {event.type} event")
+            return False
+        self.published += 1
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._deliver(event)
+                self.delivered += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Dispatcher worker {index} failed to deliver {event.type}: {e}")
+            finally:
+                lag = max(time.time() - event.created_at, 0.0)
+                self.last_lag_seconds = lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+                self._total_lag_seconds += lag
+                if event.handed_off is not None and not event.handed_off.done():
+                    event.handed_off.set_result(None)
+                self._queue.task_done()
+
+    async def _deliver(self, event: DomainEvent):
+        message = event.message()
+        if event.user_ids is None:
+            sent = await manager.broadcast(message)
+        else:
+            sent = 0
+            for user_id in event.user_ids:
+                sent += await manager.send_personal_message(message, user_id)
+        if sent:
+            latency = max(time.time() - event.created_at, 0.0)
+            event_delivery_duration.observe(latency, event.type)
+            if event.type == "new_ride_request" and self._first_offer(event.payload):
+                # The request is staged with the ride, so this is ride created -> first driver notified
+                ride_dispatch_duration.observe(latency, "notified")
+
+    def _first_offer(self, payload: dict) -> bool:
+        """True the first time an on-demand ride's request reaches a driver"""
+        if payload.get("scheduled_time"):
+            # Staged at release, long after booking
+            return False
+        ride_id = payload.get("ride_id")
+        if ride_id in self._notified_rides:
+            # Offered again after a driver rejected it
+            return False
+        self._notified_rides[ride_id] = None
+        if len(self._notified_rides) > self.max_tracked_rides:
+            self._notified_rides.popitem(last=False)
+        return True
+
+    def stats(self) -> dict:
+        processed = self.delivered + self.failed
+        return {
+            "running": self.running,
+            "workers": len(self._workers),
+            "queue_size": self._queue.qsize(),
+            "queue_capacity": self.max_queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "last_lag_ms": round(self.last_lag_seconds * 1000, 2),
+            "max_lag_ms": round(self.max_lag_seconds * 1000, 2),
+            "avg_lag_ms": round(self._total_lag_seconds / processed * 1000, 2) if processed else 0.0
+        }
+
+dispatcher = EventDispatcher(
+    max_queue_size=settings.dispatcher_queue_size,
+    worker_count=settings.dispatcher_workers
+)
+event_queue_size.set_function(lambda: dispatcher._queue.qsize())
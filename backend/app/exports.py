@@ -0,0 +1,119 @@
+"""
+Bulk exports of rides and users as streamed CSV or NDJSON.
+
+Rows come from a server-side cursor (``yield_per``) and are written one batch
+per chunk, so memory stays constant however many rows match. Each running
+export holds one pooled connection for its whole duration. ExportLimiter caps
+concurrent exports at ``export_max_concurrent`` per worker, well below the pool
+size, and turns extra requests away instead of queueing them, so exports
+cannot starve regular API traffic.
+"""
+import csv
+import enum
+import io
+import threading
+from datetime import datetime, timezone
+from typing import Callable, List, Sequence
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.models import Ride, User
+from app.serialization import NDJSON_MEDIA_TYPE, NDJSON_OPTIONS, stream_rows
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+RIDE_EXPORT_FIELDS = [column.name for column in Ride.__table__.columns]
+# Never export password hashes
+USER_EXPORT_COLUMNS = [
+    User.__table__.c[name]
+    for name in ("id", "name", "email", "phone", "role", "is_active", "is_verified", "created_at", "updated_at")
+]
+
+class ExportBusy(RuntimeError):
+    """Raised when the worker is already running its maximum number of exports"""
+
+class ExportLimiter:
+    def __init__(self, max_concurrent: int = 2):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.started = 0
+        self.rejected = 0
+
+    def acquire(self) -> Callable[[], None]:
+        """Take a slot or raise ExportBusy; returns an idempotent release"""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise ExportBusy(f"{self.max_concurrent} exports are already running, retry shortly")
+        with self._lock:
+            self.running += 1
+            self.started += 1
+        released = []
+
+        def release():
+            # Called from the stream's thread and possibly again by its finalizer
+            with self._lock:
+                if released:
+                    return
+                released.append(True)
+                self.running -= 1
+            self._slots.release()
+
+        return release
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "started": self.started,
+            "rejected": self.rejected
+        }
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def csv_line(values: Sequence) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue().encode()
+
+def ride_export_columns(model) -> List:
+    """Export columns of rides or rides_archive, in the same order"""
+    return [model.__table__.c[name] for name in RIDE_EXPORT_FIELDS]
+
+def export_response(statement, name: str, format: str) -> StreamingResponse:
+    """Stream the rows of ``statement`` ordered by its first column, the primary key"""
+    statement = statement.order_by(list(statement.selected_columns)[0])
+    names = list(statement.selected_columns.keys())
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    headers = {"Content-Disposition": f'attachment; filename="{name}-{stamp}.{format}"'}
+
+    if format == "csv":
+        media_type, prefix = CSV_MEDIA_TYPE, csv_line(names)
+
+        def encode(rows) -> bytes:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows([[csv_value(value) for value in row] for row in rows])
+            return buffer.getvalue().encode()
+    else:
+        media_type, prefix = NDJSON_MEDIA_TYPE, b""
+
+        def encode(rows) -> bytes:
+            return b"".join([orjson.dumps(dict(zip(names, row)), option=NDJSON_OPTIONS) for row in rows])
+
+    release = export_limiter.acquire()
+    return stream_rows(
+        statement, encode, media_type, settings.export_batch_size,
+        prefix=prefix, headers=headers, on_close=release
+    )
+
+export_limiter = ExportLimiter(max_concurrent=settings.export_max_concurrent)
@@ -0,0 +1,91 @@
+"""
+Fare quote engine.
+
+Tariffs are loaded once at import into immutable tables indexed by vehicle type
+(both the enum and its string value), so pricing a trip is a dict lookup and a
+multiply-add. ``quote_batch`` prices many trips for one or all vehicle classes in
+a single pass, computing each distance once and reusing it for every class.
+"""
+from types import MappingProxyType
+from typing import Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from app.geo import haversine_km
+from app.models import VehicleType
+
+RIDE_AVERAGE_SPEED_KMH = 40
+INTERCITY_AVERAGE_SPEED_KMH = 80
+INTERCITY_MULTIPLIER = 1.5
+
+class Tariff(NamedTuple):
+    base_fare: float
+    per_km_rate: float
+
+VehicleKey = Union[VehicleType, str]
+
+class TariffTable:
+    """Read-only vehicle type -> Tariff mapping with a default class"""
+
+    def __init__(self, tariffs: Mapping[VehicleType, Tariff], default: VehicleType = VehicleType.ECONOMY):
+        index = {}
+        for vehicle_type, tariff in tariffs.items():
+            index[vehicle_type] = tariff
+            index[vehicle_type.value] = tariff
+        self._index = MappingProxyType(index)
+        self.vehicle_types: Tuple[VehicleType, ...] = tuple(tariffs)
+        self.default = tariffs[default]
+
+    def __getitem__(self, vehicle_type: VehicleKey) -> Tariff:
+        return self._index.get(vehicle_type, self.default)
+
+    def price(self, distance_km: float, vehicle_type: VehicleKey, multiplier: float = 1.0) -> float:
+        tariff = self[vehicle_type]
+        return (tariff.base_fare + distance_km * tariff.per_km_rate) * multiplier
+
+RIDE_TARIFFS = TariffTable({
+    VehicleType.ECONOMY: Tariff(50, 10),
+    VehicleType.PREMIUM: Tariff(100, 15),
+    VehicleType.SUV: Tariff(120, 18),
+    VehicleType.LUXURY: Tariff(200, 25),
+})
+
+INTERCITY_TARIFFS = TariffTable({
+    VehicleType.ECONOMY: Tariff(200, 12),
+    VehicleType.PREMIUM: Tariff(350, 18),
+    VehicleType.SUV: Tariff(450, 22),
+    VehicleType.LUXURY: Tariff(700, 30),
+})
+
+def estimate_duration_minutes(distance_km: float) -> int:
+    """Estimated city ride duration at the average urban speed"""
+    return int((distance_km / RIDE_AVERAGE_SPEED_KMH) * 60)
+
+def haversine_many(coords: Iterable[Sequence[float]]) -> List[float]:
+    """Great-circle distances in km for (lat1, lng1, lat2, lng2) tuples"""
+    return [haversine_km(lat1, lng1, lat2, lng2) for lat1, lng1, lat2, lng2 in coords]
+
+class TripQuote(NamedTuple):
+    distance_km: float
+    duration_minutes: int
+    fares: List[Tuple[VehicleType, float]]
+
+def quote_batch(
+    trips: Sequence[Tuple[float, float, float, float, Optional[VehicleType]]],
+    table: TariffTable = RIDE_TARIFFS,
+    multipliers: Optional[Sequence[float]] = None
+) -> List[TripQuote]:
+    """Price (pickup_lat, pickup_lng, dest_lat, dest_lng, vehicle_type) trips.
+
+    A vehicle_type of None quotes every class in the table. ``multipliers`` is an
+    optional per-trip factor applied to every fare of that trip.
+    """
+    distances = haversine_many(trip[:4] for trip in trips)
+    quotes = []
+    for i, (trip, distance) in enumerate(zip(trips, distances)):
+        vehicle_types = (trip[4],) if trip[4] is not None else table.vehicle_types
+        multiplier = multipliers[i] if multipliers is not None else 1.0
+        quotes.append(TripQuote(
+            distance,
+            estimate_duration_minutes(distance),
+            [(vehicle_type, table.price(distance, vehicle_type, multiplier)) for vehicle_type in vehicle_types]
+        ))
+    return quotes
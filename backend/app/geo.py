@@ -0,0 +1,150 @@
+"""
+Grid-based geo helpers.
+
+Coordinates are bucketed into square cells of ``cell_size`` degrees. The
+DriverLocationIndex keeps every available driver with a known position in its
+cell, so "drivers near X" only looks at the handful of cells around X instead of
+scanning the whole fleet.
+"""
+import heapq
+import math
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User, DriverProfile, UserRole
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE_LAT = 111.32
+
+Cell = Tuple[int, int]
+
+def cell_for(lat: float, lng: float, cell_size: float) -> Cell:
+    return (math.floor(lat / cell_size), math.floor(lng / cell_size))
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) of a box enclosing the circle"""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    lng_delta = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - lat_delta, lat + lat_delta, lng - lng_delta, lng + lng_delta
+
+class DriverPosition(NamedTuple):
+    lat: float
+    lng: float
+    cell: Cell
+    rating: float
+
+class NearbyDriver(NamedTuple):
+    driver_id: int
+    distance_km: float
+    rating: float
+
+class DriverLocationIndex:
+    """In-memory cell -> driver ids index of available, located drivers"""
+
+    def __init__(self, cell_size: float = 0.02):
+        self.cell_size = cell_size
+        self._drivers: Dict[int, DriverPosition] = {}
+        self._cells: Dict[Cell, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    def update(self, driver_id: int, lat: float, lng: float, rating: Optional[float] = None):
+        """Add or move an available driver"""
+        previous = self._drivers.get(driver_id)
+        if rating is None:
+            rating = previous.rating if previous else 5.0
+        cell = cell_for(lat, lng, self.cell_size)
+        if previous and previous.cell != cell:
+            self._discard_from_cell(driver_id, previous.cell)
+        self._cells.setdefault(cell, set()).add(driver_id)
+        self._drivers[driver_id] = DriverPosition(lat, lng, cell, float(rating))
+
+    def remove(self, driver_id: int):
+        """Drop a driver that went offline"""
+        previous = self._drivers.pop(driver_id, None)
+        if previous:
+            self._discard_from_cell(driver_id, previous.cell)
+
+    def _discard_from_cell(self, driver_id: int, cell: Cell):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(driver_id)
+            if not members:
+                del self._cells[cell]
+
+    def count_in_cell(self, cell: Cell) -> int:
+        return len(self._cells.get(cell, ()))
+
+    def cells(self) -> Dict[Cell, int]:
+        return {cell: len(members) for cell, members in self._cells.items()}
+
+    def nearby(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None) -> List[NearbyDriver]:
+        """Drivers within ``radius_km`` of a point, closest first"""
+        lat_span = math.ceil(radius_km / (KM_PER_DEGREE_LAT * self.cell_size))
+        km_per_degree_lng = KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01)
+        lng_span = math.ceil(radius_km / (km_per_degree_lng * self.cell_size))
+        center_lat, center_lng = cell_for(lat, lng, self.cell_size)
+
+        found = []
+        for cell_lat in range(center_lat - lat_span, center_lat + lat_span + 1):
+            for cell_lng in range(center_lng - lng_span, center_lng + lng_span + 1):
+                for driver_id in self._cells.get((cell_lat, cell_lng), ()):
+                    position = self._drivers[driver_id]
+                    distance = haversine_km(lat, lng, position.lat, position.lng)
+                    if distance <= radius_km:
+                        found.append(NearbyDriver(driver_id, distance, position.rating))
+        found.sort(key=lambda driver: driver.distance_km)
+        return found[:limit] if limit is not None else found
+
+    def replace_all(self, drivers: List[Tuple[int, float, float, float]]):
+        """Rebuild from (driver_id, lat, lng, rating) rows, e.g. loaded from the DB"""
+        self._drivers = {}
+        self._cells = {}
+        for driver_id, lat, lng, rating in drivers:
+            self.update(driver_id, lat, lng, rating)
+
+def best_drivers(
+    drivers: List[NearbyDriver],
+    limit: int,
+    radius_km: float,
+    rating_weight: float = 0.5
+) -> List[NearbyDriver]:
+    """Top ``limit`` drivers, ranking closer and better-rated drivers first.
+
+    Distance is scaled to 0..1 over the search radius and the rating to 0..1 over
+    the 1-5 scale; ``rating_weight`` sets how much a full rating point difference
+    is worth against distance.
+    """
+    def score(driver: NearbyDriver) -> float:
+        return driver.distance_km / radius_km - rating_weight * (driver.rating - 1.0) / 4.0
+    return heapq.nsmallest(limit, drivers, key=score)
+
+def load_available_drivers(db: Session) -> List[Tuple[int, float, float, float]]:
+    """(driver_id, lat, lng, rating) of every active, available, located driver"""
+    rows = db.query(
+        DriverProfile.user_id,
+        DriverProfile.current_lat,
+        DriverProfile.current_lng,
+        DriverProfile.rating
+    ).join(User, User.id == DriverProfile.user_id).filter(
+        User.role == UserRole.DRIVER,
+        User.is_active == True,
+        DriverProfile.is_available == True,
+        DriverProfile.current_lat != None,
+        DriverProfile.current_lng != None
+    ).all()
+    return [(int(user_id), float(lat), float(lng), float(rating or 5.0)) for user_id, lat, lng, rating in rows]
+
+driver_index = DriverLocationIndex(cell_size=settings.geo_cell_size_deg)
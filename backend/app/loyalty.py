@@ -0,0 +1,211 @@
+"""
+Loyalty points accrual and tiers.
+
+Points are added with a single ``UPDATE loyalty_points SET total_points =
+total_points + :n, tier = CASE ...`` inside the caller's transaction, so
+concurrent bookings never lose points and the tier always matches the new total.
+
+Completed rides do not touch loyalty_points directly. They write a LoyaltyLedger
+entry in the ride's transaction, and LoyaltyAccruer applies unapplied entries in
+batches with one upsert per rider per batch. That keeps the hot ride-completion
+path off the per-rider row lock.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, case, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import LoyaltyLedger, LoyaltyPoints
+
+# Minimum total points per tier, highest first
+TIER_THRESHOLDS = (
+    ("platinum", 10000),
+    ("gold", 5000),
+    ("silver", 1000),
+    ("bronze", 0),
+)
+
+TIER_BENEFITS = {
+    "bronze": "Basic rewards",
+    "silver": "5% discount on rides",
+    "gold": "10% discount + priority booking",
+    "platinum": "15% discount + free upgrades",
+}
+
+CURRENCY_PER_POINT = 100
+
+def tier_table() -> list:
+    """Tiers lowest first, as served by the loyalty tiers endpoint"""
+    return [
+        {"tier": tier, "min_points": minimum, "benefits": TIER_BENEFITS[tier]}
+        for tier, minimum in reversed(TIER_THRESHOLDS)
+    ]
+
+def points_for(amount: float) -> int:
+    """1 point per 100 currency spent"""
+    return int((amount or 0) / CURRENCY_PER_POINT)
+
+def tier_for(points: int) -> str:
+    """Tier for a points total; the Python twin of ``tier_case``"""
+    for tier, minimum in TIER_THRESHOLDS:
+        if points >= minimum:
+            return tier
+    return TIER_THRESHOLDS[-1][0]
+
+def tier_case(points):
+    """SQL expression computing the tier for a points expression"""
+    return case(
+        *[(points >= minimum, tier) for tier, minimum in TIER_THRESHOLDS[:-1]],
+        else_=TIER_THRESHOLDS[-1][0]
+    )
+
+def accrue(db: Session, user_id: int, points: int) -> bool:
+    """Atomically add points in the caller's transaction. False if the user has no loyalty account."""
+    if points <= 0:
+        return False
+    new_total = func.coalesce(LoyaltyPoints.total_points, 0) + points
+    result = db.execute(
+        update(LoyaltyPoints)
+        .where(LoyaltyPoints.user_id == user_id)
+        .values(total_points=new_total, tier=tier_case(new_total))
+    )
+    return result.rowcount > 0
+
+def accrue_many(db: Session, totals: Dict[int, int]):
+    """Add points for many users with one executemany upsert.
+
+    Users without a loyalty account get one, so ledger points are never dropped.
+    """
+    rows = [
+        {"user_id": user_id, "total_points": points, "tier": tier_for(points)}
+        for user_id, points in totals.items() if points > 0
+    ]
+    if not rows:
+        return
+    table = LoyaltyPoints.__table__
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert(table) if dialect == "postgresql" else sqlite.insert(table)
+        new_total = func.coalesce(table.c.total_points, 0) + insert.excluded.total_points
+        db.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.user_id],
+                set_={"total_points": new_total, "tier": tier_case(new_total)}
+            ),
+            rows
+        )
+        return
+    existing = {user_id for (user_id,) in db.query(LoyaltyPoints.user_id).filter(
+        LoyaltyPoints.user_id.in_([row["user_id"] for row in rows])
+    )}
+    missing = [{"user_id": row["user_id"]} for row in rows if row["user_id"] not in existing]
+    if missing:
+        db.execute(table.insert().values(total_points=0, tier=tier_for(0)), missing)
+    new_total = func.coalesce(table.c.total_points, 0) + bindparam("b_points")
+    db.execute(
+        table.update()
+        .where(table.c.user_id == bindparam("b_user_id"))
+        .values(total_points=new_total, tier=tier_case(new_total)),
+        [{"b_user_id": row["user_id"], "b_points": row["total_points"]} for row in rows]
+    )
+
+def record_ride_points(db: Session, ride_id: int, rider_id: int, fare: float):
+    """Queue points for a completed ride in the ride's transaction; idempotent per ride"""
+    points = points_for(fare)
+    if points <= 0:
+        return
+    values = {"user_id": rider_id, "source": "ride", "source_id": ride_id, "points": points}
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        db.execute(postgresql.insert(LoyaltyLedger).values(**values).on_conflict_do_nothing())
+    elif dialect == "sqlite":
+        db.execute(sqlite.insert(LoyaltyLedger).values(**values).on_conflict_do_nothing())
+    else:
+        db.add(LoyaltyLedger(**values))
+
+class LoyaltyAccruer:
+    """Background task that applies ledger entries to loyalty_points in batches"""
+
+    def __init__(self, interval_seconds: float = 5.0, batch_size: int = 500):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.applied_entries = 0
+        self.batches = 0
+        self.errors = 0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loyalty-accruer")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.drain()
+            except Exception as e:
+                self.errors += 1
+                print(f"Loyalty accruer error: {e}")
+
+    async def drain(self):
+        while await asyncio.to_thread(self._apply_batch) >= self.batch_size:
+            pass
+
+    def _apply_batch(self) -> int:
+        db = SessionLocal()
+        try:
+            query = db.query(LoyaltyLedger.id, LoyaltyLedger.user_id, LoyaltyLedger.points).filter(
+                LoyaltyLedger.applied_at == None
+            ).order_by(LoyaltyLedger.id).limit(self.batch_size)
+            if db.bind.dialect.name == "postgresql":
+                # Several workers can drain concurrently without double-applying
+                query = query.with_for_update(skip_locked=True)
+            entries = query.all()
+            if not entries:
+                db.rollback()
+                return 0
+
+            totals: Dict[int, int] = defaultdict(int)
+            for _, user_id, points in entries:
+                totals[user_id] += points
+            accrue_many(db, totals)
+            db.execute(
+                update(LoyaltyLedger)
+                .where(LoyaltyLedger.id.in_([entry_id for entry_id, _, _ in entries]))
+                .values(applied_at=datetime.utcnow())
+            )
+            db.commit()
+
+            self.applied_entries += len(entries)
+            self.batches += 1
+            return len(entries)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "applied_entries": self.applied_entries,
+            "batches": self.batches,
+            "errors": self.errors
+        }
+
+loyalty_accruer = LoyaltyAccruer(
+    interval_seconds=settings.loyalty_apply_interval_seconds,
+    batch_size=settings.loyalty_batch_size
+)
@@ -0,0 +1,314 @@
+"""
+Prometheus-style metrics.
+
+Counters, gauges and histograms live in one process-wide registry that renders
+the text exposition format for ``GET /metrics``. Label values are passed
+positionally (``requests.inc("GET", "/api/rides/", "200")``), so recording is
+a dict lookup under a lock plus, for histograms, a bisect into the buckets.
+
+MetricsMiddleware times HTTP requests per route template, and ``instrument_engine``
+hooks SQLAlchemy cursor events. Queries are also charged to the request in
+progress, which yields per-route query counts and DB time. ``observe_queries``
+lets other code (the query profiler) see the same statements without hooking
+the engine again.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+Labels = Tuple[str, ...]
+# (sample name, (label names, label values), value)
+Sample = Tuple[str, Tuple[Labels, Labels], float]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(*labels)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in list(self._values.items()):
+            yield self.name, (self.labelnames, labels), value
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function: Callable[[], object]):
+        """Compute the value at scrape time: a number, or a dict of label tuple -> number"""
+        self._function = function
+
+    def samples(self) -> Iterator[Sample]:
+        values = self._values
+        if self._function is not None:
+            result = self._function()
+            values = result if isinstance(result, dict) else {(): result}
+        for labels, value in list(values.items()):
+            yield self.name, (self.labelnames, labels), value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [per-bucket counts (last is +Inf), sum, count]
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def samples(self) -> Iterator[Sample]:
+        bucket_names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", (bucket_names, labels + (_format_value(bound),)), cumulative
+            yield f"{self.name}_sum", (self.labelnames, labels), total
+            yield f"{self.name}_count", (self.labelnames, labels), count
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"Failed to collect metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- HTTP -----------------------------------------------------------------
+
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+http_requests_in_progress = Gauge("http_requests_in_progress", "HTTP requests currently being served")
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+)
+http_request_db_duration = Histogram("http_request_db_seconds", "Time spent in SQL per HTTP request", ("method", "route"))
+
+# --- Database -------------------------------------------------------------
+
+db_query_duration = Histogram("db_query_duration_seconds", "SQL statement latency by operation", ("operation",))
+db_pool_connections = Gauge("db_pool_connections", "SQLAlchemy connection pool state", ("state",))
+
+# --- WebSocket and dispatch -----------------------------------------------
+
+ws_connections = Counter("ws_connections_total", "WebSocket connections accepted")
+ws_disconnects = Counter("ws_disconnects_total", "WebSocket connections closed")
+ws_active_connections = Gauge("ws_active_connections", "Open WebSocket connections")
+ws_messages_sent = Counter("ws_messages_sent_total", "WebSocket messages sent by result", ("result",))
+ws_messages_received = Counter("ws_messages_received_total", "WebSocket messages received")
+event_queue_size = Gauge("event_queue_size", "Events waiting in the dispatcher queue")
+event_delivery_duration = Histogram("event_delivery_seconds", "Event creation to WebSocket delivery by event type", ("type",))
+ride_dispatch_duration = Histogram(
+    "ride_dispatch_seconds", "Ride request to first driver notified / to accepted", ("stage",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+event_loop_lag = Histogram("event_loop_lag_seconds", "How late the event loop heartbeat woke up")
+event_loop_stalls = Counter("event_loop_stalls_total", "Heartbeats delayed past the loop monitor threshold")
+
+# --- Per-request DB accounting --------------------------------------------
+
+class RequestDbStats:
+    __slots__ = ("queries", "seconds", "observers")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        # Objects with record(statement, elapsed) that see each statement too
+        self.observers: tuple = ()
+
+    def record(self, statement: str, elapsed: float):
+        self.queries += 1
+        self.seconds += elapsed
+        for observer in self.observers:
+            observer.record(statement, elapsed)
+
+# Set by the middleware for the duration of a request; handlers running in the
+# threadpool see the same object through the copied context
+current_request_db: ContextVar[Optional[RequestDbStats]] = ContextVar("current_request_db", default=None)
+
+@contextmanager
+def observe_queries(observer) -> Iterator[RequestDbStats]:
+    """Pass the statements run in this context to ``observer.record(statement, elapsed)``.
+
+    Joins the request's stats when there is one, otherwise starts its own, so it
+    also works in scripts and tests. Needs ``instrument_engine``.
+    """
+    stats = current_request_db.get()
+    token = None
+    if stats is None:
+        stats = RequestDbStats()
+        token = current_request_db.set(stats)
+    stats.observers += (observer,)
+    try:
+        yield stats
+    finally:
+        stats.observers = tuple(item for item in stats.observers if item is not observer)
+        if token is not None:
+            current_request_db.reset(token)
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip()[:6].upper()
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+def instrument_engine(engine: Engine):
+    """Time every cursor execution and expose the engine's pool state"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        db_query_duration.observe(elapsed, _operation(statement))
+        stats = current_request_db.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+    pool = engine.pool
+
+    def pool_state() -> dict:
+        state = {}
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            method = getattr(pool, name, None)
+            if callable(method):
+                state[(name,)] = method()
+        return state
+
+    db_pool_connections.set_function(pool_state)
+
+# --- ASGI middleware ------------------------------------------------------
+
+class MetricsMiddleware:
+    """Records latency, status and DB usage per route template.
+
+    Pure ASGI rather than BaseHTTPMiddleware, so responses are not buffered. The
+    route template comes from ``scope["route"]``, which FastAPI sets when a
+    route matches. Unmatched paths are grouped under one label so arbitrary URLs
+    cannot create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestDbStats()
+        token = current_request_db.set(stats)
+        http_requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_progress.dec()
+            current_request_db.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, template, str(status_code))
+            http_request_duration.observe(elapsed, method, template)
+            http_request_db_queries.observe(stats.queries, method, template)
+            http_request_db_duration.observe(stats.seconds, method, template)
@@ -1,15 +1,20 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text, Index, JSON, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 import enum
 
+# JSONB on PostgreSQL, JSON text elsewhere (e.g. SQLite)
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 class UserRole(str, enum.Enum):
     RIDER = "rider"
     DRIVER = "driver"
     ADMIN = "admin"
 
 class RideStatus(str, enum.Enum):
+    SCHEDULED = "scheduled"
     PENDING = "pending"
     ACCEPTED = "accepted"
     IN_PROGRESS = "in_progress"
@@ -46,6 +51,9 @@ class User(Base):
 
 class DriverProfile(Base):
     __tablename__ = "driver_profiles"
+    __table_args__ = (
+        Index("ix_driver_profiles_is_available", "is_available"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True)
@@ -66,6 +74,14 @@ class DriverProfile(Base):
 
 class Ride(Base):
     __tablename__ = "rides"
+    __table_args__ = (
+        Index("ix_rides_status_driver_id", "status", "driver_id"),
+        Index("ix_rides_rider_id_created_at", "rider_id", "created_at"),
+        Index("ix_rides_driver_id_status", "driver_id", "status"),
+        Index("ix_rides_status_scheduled_time", "status", "scheduled_time"),
+        Index("ix_rides_status_created_at", "status", "created_at"),
+        Index("ix_rides_status_updated_at", "status", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     rider_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -81,6 +97,7 @@ class Ride(Base):
     distance_km = Column(Float, nullable=True)
     duration_minutes = Column(Integer, nullable=True)
     estimated_fare = Column(Float, nullable=True)
+    surge_multiplier = Column(Float, default=1.0)
     final_fare = Column(Float, nullable=True)
     rating = Column(Integer, nullable=True)
     feedback = Column(Text, nullable=True)
@@ -88,11 +105,45 @@ class Ride(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     rider = relationship("User", back_populates="rides_as_rider", foreign_keys=[rider_id])
     driver = relationship("User", back_populates="rides_as_driver", foreign_keys=[driver_id])
 
+class RideArchive(Base):
+    """Completed and cancelled rides moved out of ``rides`` by the archiver; same columns"""
+    __tablename__ = "rides_archive"
+    __table_args__ = (
+        Index("ix_rides_archive_rider_id_created_at", "rider_id", "created_at"),
+        Index("ix_rides_archive_driver_id_created_at", "driver_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # keeps the id from rides
+    rider_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    driver_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    pickup_address = Column(String, nullable=False)
+    pickup_lat = Column(Float, nullable=False)
+    pickup_lng = Column(Float, nullable=False)
+    destination_address = Column(String, nullable=False)
+    destination_lat = Column(Float, nullable=False)
+    destination_lng = Column(Float, nullable=False)
+    status = Column(Enum(RideStatus), nullable=False)
+    vehicle_type = Column(Enum(VehicleType))
+    distance_km = Column(Float, nullable=True)
+    duration_minutes = Column(Integer, nullable=True)
+    estimated_fare = Column(Float, nullable=True)
+    surge_multiplier = Column(Float)
+    final_fare = Column(Float, nullable=True)
+    rating = Column(Integer, nullable=True)
+    feedback = Column(Text, nullable=True)
+    scheduled_time = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class City(Base):
     __tablename__ = "cities"
     
@@ -110,6 +161,10 @@ class City(Base):
 
 class IntercityRide(Base):
     __tablename__ = "intercity_rides"
+    __table_args__ = (
+        Index("ix_intercity_rides_status_scheduled_date", "status", "scheduled_date"),
+        Index("ix_intercity_rides_rider_id", "rider_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     rider_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -133,6 +188,10 @@ class IntercityRide(Base):
 
 class Vacation(Base):
     __tablename__ = "vacations"
+    __table_args__ = (
+        Index("ix_vacations_user_id_created_at", "user_id", "created_at"),
+        Index("ix_vacations_status_created_at", "status", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -149,15 +208,19 @@ class Vacation(Base):
     status = Column(String, default="pending")
     booking_reference = Column(String, unique=True, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Bumped on every ORM update; keys the parsed planner data cache
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # New fields for automated schedule-based trip planner
-    schedule = Column(Text, nullable=True)  # JSON string containing the full trip schedule
-    flight_details = Column(Text, nullable=True)  # JSON string containing flight/train details
-    activities = Column(Text, nullable=True)  # JSON string containing activities schedule
-    meal_preferences = Column(Text, nullable=True)  # JSON string containing meal timings
+    schedule = Column(JSONType, nullable=True)  # the full trip schedule
+    flight_details = Column(JSONType, nullable=True)  # flight/train details
+    activities = Column(JSONType, nullable=True)  # list of activities
+    meal_preferences = Column(JSONType, nullable=True)  # meal timings
     
     # Relationships
     user = relationship("User", back_populates="vacations")
+    
+    __mapper_args__ = {"version_id_col": version}
 
 class LoyaltyPoints(Base):
     __tablename__ = "loyalty_points"
@@ -171,3 +234,55 @@ class LoyaltyPoints(Base):
     
     # Relationships
     user = relationship("User", back_populates="loyalty_points")
+
+class LoyaltyLedger(Base):
+    """Points earned but not yet added to LoyaltyPoints; applied in batches"""
+    __tablename__ = "loyalty_ledger"
+    __table_args__ = (
+        # One entry per earning event, so re-recording it is a no-op
+        UniqueConstraint("source", "source_id", name="uq_loyalty_ledger_source"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    source = Column(String, nullable=False)  # e.g. "ride"
+    source_id = Column(Integer, nullable=False)
+    points = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    applied_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+class RideHourlyStat(Base):
+    """Rides created in one UTC hour, per vehicle type and current status"""
+    __tablename__ = "ride_hourly_stats"
+    
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    vehicle_type = Column(Enum(VehicleType), primary_key=True)
+    status = Column(Enum(RideStatus), primary_key=True)
+    rides = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)  # final fares of completed rides
+    distance_km = Column(Float, nullable=False, default=0.0)
+
+class RideStatDelta(Base):
+    """A change to RideHourlyStat written with the ride change; folded in by the compactor"""
+    __tablename__ = "ride_stat_deltas"
+    
+    id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    vehicle_type = Column(Enum(VehicleType), nullable=False)
+    status = Column(Enum(RideStatus), nullable=False)
+    rides = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False, default=0.0)
+    distance_km = Column(Float, nullable=False, default=0.0)
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON string with the message body
+    user_ids = Column(Text, nullable=True)  # JSON list of recipient user ids, NULL broadcasts
+    notify_email = Column(String, nullable=True)  # Also deliver through NotificationService
+    attempts = Column(Integer, default=0)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    dispatched_at = Column(DateTime(timezone=True), nullable=True, index=True)
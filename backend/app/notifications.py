@@ -1,38 +1,337 @@
 """
 Notification utilities for sending updates to users
+
+Messages are queued per channel (email, SMS) and delivered by a pool of worker
+tasks per channel. Workers group queued messages into batches so a channel can
+reuse one connection for many messages (e.g. a single SMTP session), respect a
+per-channel rate limit, and retry failed messages with exponential backoff.
+Permanent failures, such as a refused recipient, are not retried. Blocking I/O
+such as smtplib runs in a thread so it never stalls the event loop.
+
+Queues are bounded. When a channel's queue is full, new messages are dropped and
+counted rather than waited on, so a stalled mail server cannot back up the
+outbox relay that enqueues them. Enqueueing never blocks, so ``enqueue`` and the
+``send_*`` helpers are plain methods, but they must be called from the event
+loop thread that runs the workers.
 """
+import asyncio
 import smtplib
+import time
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+@dataclass
+class Notification:
+    """A single outgoing message"""
+    channel: str
+    recipient: str
+    subject: str
+    body: str
+    attempts: int = 0
+    retryable: bool = True  # cleared by a channel when retrying cannot help
+
+class NotificationChannel:
+    """Base class for delivery backends"""
+    name = "base"
+
+    async def send_batch(self, messages: List[Notification]) -> List[Notification]:
+        """Deliver messages and return the ones that failed; set ``retryable`` False on permanent failures"""
+        raise NotImplementedError
+
+class ConsoleChannel(NotificationChannel):
+    """Prints messages; the default for local development"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def send_batch(self, messages: List[Notification]) -> List[Notification]:
+        icon = "📱" if self.name == "sms" else "📧"
+        for message in messages:
+            print(f"{icon} {message.subject} to {message.recipient}: {message.body}")
+        return []
+
+class MemorySink(NotificationChannel):
+    """Offline fake SMTP/SMS sink that records delivered messages for tests and benchmarks"""
+
+    def __init__(self, name: str, latency_seconds: float = 0.0):
+        self.name = name
+        self.latency_seconds = latency_seconds
+        self.messages: List[Notification] = []
+        self.batches = 0
+
+    async def send_batch(self, messages: List[Notification]) -> List[Notification]:
+        if self.latency_seconds:
+            # Simulate one round trip per batch, as with a reused connection
+            await asyncio.sleep(self.latency_seconds)
+        self.messages.extend(messages)
+        self.batches += 1
+        return []
+
+    def clear(self):
+        self.messages.clear()
+        self.batches = 0
+
+class SMTPChannel(NotificationChannel):
+    """Sends email over one SMTP connection per batch"""
+    name = "email"
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        username: str = "",
+        password: str = "",
+        use_tls: bool = False,
+        timeout: float = 10.0
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    async def send_batch(self, messages: List[Notification]) -> List[Notification]:
+        return await asyncio.to_thread(self._send_sync, messages)
+
+    def _send_sync(self, messages: List[Notification]) -> List[Notification]:
+        failed = []
+        done = 0
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+                for message in messages:
+                    mime = MIMEMultipart()
+                    mime["From"] = self.sender
+                    mime["To"] = message.recipient
+                    mime["Subject"] = message.subject
+                    mime.attach(MIMEText(message.body, "plain"))
+                    try:
+                        smtp.sendmail(self.sender, [message.recipient], mime.as_string())
+                    except smtplib.SMTPRecipientsRefused as e:
+                        # The server rejected the address; it will reject it again
+                        print(f"SMTP delivery to {message.recipient} failed: {e}")
+                        message.retryable = False
+                        failed.append(message)
+                    done += 1
+        except (OSError, smtplib.SMTPException) as e:
+            # The connection dropped; everything not yet attempted is retried
+            print(f"SMTP connection to {self.host}:{self.port} failed: {e}")
+            return failed + messages[done:]
+        return failed
+
+class RateLimiter:
+    """Token bucket shared by the workers of one channel"""
+
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = burst if burst is not None else max(rate_per_second, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until ``tokens`` are paid; more than ``capacity`` is paid in installments"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            remaining = tokens
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                paid = min(remaining, self._tokens)
+                self._tokens -= paid
+                remaining -= paid
+                if remaining <= 0:
+                    return
+                await asyncio.sleep(min(remaining, self.capacity) / self.rate)
+
+class ChannelStats:
+    def __init__(self):
+        self.queued = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
 
 class NotificationService:
     """Service for sending notifications via various channels"""
-    
-    @staticmethod
-    def send_ride_notification(user_email: str, ride_status: str, ride_details: dict):
-        """Send ride status notification"""
-        # In production, implement actual email/SMS sending
-        print(f"📧 Notification to {user_email}: Ride status changed to {ride_status}")
-        print(f"   Details: {ride_details}")
+
+    def __init__(
+        self,
+        channels: Dict[str, NotificationChannel],
+        workers_per_channel: int = 2,
+        batch_size: int = 50,
+        max_retries: int = 5,
+        retry_base_seconds: float = 1.0,
+        rate_limit_per_second: float = 20.0,
+        max_queue_size: int = 10000
+    ):
+        self.channels = channels
+        self.workers_per_channel = workers_per_channel
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self._queues = {name: asyncio.Queue(maxsize=max_queue_size) for name in channels}
+        self._limiters = {name: RateLimiter(rate_limit_per_second) for name in channels}
+        self._stats = {name: ChannelStats() for name in channels}
+        self._workers: List[asyncio.Task] = []
+        self._retries = set()
+
+    async def start(self):
+        if self._workers:
+            return
+        for name in self.channels:
+            for i in range(self.workers_per_channel):
+                self._workers.append(
+                    asyncio.create_task(self._worker(name), name=f"notifications-{name}-{i}")
+                )
+
+    async def stop(self, timeout: float = 5.0):
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues.values())),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            print("Notification service stopping with undelivered messages")
+        for task in [*self._workers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers = []
+        self._retries = set()
+
+    def enqueue(self, notification: Notification) -> bool:
+        """Queue a message for delivery without waiting; drops it and returns False if the channel is backed up"""
+        queue = self._queues.get(notification.channel)
+        if queue is None:
+            print(f"No notification channel configured for {notification.channel}")
+            return False
+        stats = self._stats[notification.channel]
+        try:
+            queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            stats.dropped += 1
+            print(f"Dropping {notification.channel} notification to {notification.recipient}: queue is full")
+            return False
+        stats.queued += 1
         return True
-    
-    @staticmethod
-    def send_driver_assignment(rider_email: str, driver_name: str, ride_id: int):
+
+    async def _worker(self, name: str):
+        queue = self._queues[name]
+        channel = self.channels[name]
+        stats = self._stats[name]
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._limiters[name].acquire(len(batch))
+                try:
+                    failed = await channel.send_batch(batch)
+                except Exception as e:
+                    print(f"Notification channel {name} failed a batch of {len(batch)}: {e}")
+                    failed = batch
+                stats.batches += 1
+                stats.sent += len(batch) - len(failed)
+                for notification in failed:
+                    self._retry_later(notification)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _retry_later(self, notification: Notification):
+        stats = self._stats[notification.channel]
+        notification.attempts += 1
+        if not notification.retryable or notification.attempts > self.max_retries:
+            stats.failed += 1
+            print(f"Giving up on {notification.channel} notification to {notification.recipient}")
+            return
+        stats.retried += 1
+        delay = self.retry_base_seconds * (2 ** (notification.attempts - 1))
+        task = asyncio.create_task(self._requeue(notification, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue(self, notification: Notification, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            self._queues[notification.channel].put_nowait(notification)
+        except asyncio.QueueFull:
+            self._stats[notification.channel].dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "queue_size": self._queues[name].qsize(),
+                **vars(self._stats[name])
+            }
+            for name in self.channels
+        }
+
+    def send_ride_notification(self, user_email: str, ride_status: str, ride_details: dict):
+        """Send ride status notification"""
+        return self.enqueue(Notification(
+            "email", user_email,
+            f"Ride status changed to {ride_status}",
+            f"Details: {ride_details}"
+        ))
+
+    def send_driver_assignment(self, rider_email: str, driver_name: str, ride_id: int):
         """Notify rider that a driver has been assigned"""
-        print(f"📧 Driver {driver_name} assigned to ride #{ride_id} for {rider_email}")
-        return True
-    
-    @staticmethod
-    def send_booking_confirmation(user_email: str, booking_type: str, booking_id: str):
+        return self.enqueue(Notification(
+            "email", rider_email,
+            f"Driver assigned to ride #{ride_id}",
+            f"Driver {driver_name} is on the way"
+        ))
+
+    def send_booking_confirmation(self, user_email: str, booking_type: str, booking_id: str):
         """Send booking confirmation"""
-        print(f"📧 {booking_type} booking confirmed for {user_email}: {booking_id}")
-        return True
-    
-    @staticmethod
-    async def send_sms(phone_number: str, message: str):
+        return self.enqueue(Notification(
+            "email", user_email,
+            f"{booking_type} booking confirmed",
+            f"Booking reference: {booking_id}"
+        ))
+
+    def send_sms(self, phone_number: str, message: str):
         """Send SMS notification (placeholder for Twilio integration)"""
-        print(f"📱 SMS to {phone_number}: {message}")
-        return True
+        return self.enqueue(Notification("sms", phone_number, "SMS", message))
+
+def build_channel(name: str, backend: str) -> NotificationChannel:
+    """Create the channel configured for ``name`` ("console", "memory" or "smtp")"""
+    if backend == "memory":
+        return MemorySink(name)
+    if backend == "smtp" and name == "email":
+        return SMTPChannel(
+            settings.smtp_host,
+            settings.smtp_port,
+            settings.smtp_sender,
+            username=settings.smtp_username,
+            password=settings.smtp_password,
+            use_tls=settings.smtp_use_tls
+        )
+    return ConsoleChannel(name)
 
-notification_service = NotificationService()
+notification_service = NotificationService(
+    {
+        "email": build_channel("email", settings.notification_email_backend),
+        "sms": build_channel("sms", settings.notification_sms_backend),
+    },
+    workers_per_channel=settings.notification_workers_per_channel,
+    batch_size=settings.notification_batch_size,
+    max_retries=settings.notification_max_retries,
+    rate_limit_per_second=settings.notification_rate_limit_per_second
+)
@@ -0,0 +1,243 @@
+"""
+Transactional outbox for ride and vacation events.
+
+Handlers call ``add_event`` inside the same transaction as their Ride/Vacation
+change, so the event is persisted if and only if the state change is. After the
+commit they call ``outbox_relay.wake()``; the relay claims undelivered rows in
+batches, hands them to the WebSocket dispatcher and waits for its workers to
+process them. Only then are notifications handed to NotificationService and
+the rows marked dispatched. Rows whose events are still queued when the wait
+runs out, and rows claimed by a worker that crashes, are retried once their
+lease expires, so delivery is at-least-once.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_, update, delete, func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.events import dispatcher, DomainEvent
+from app.models import OutboxEvent
+from app.notifications import notification_service
+
+def add_event(
+    db: Session,
+    event_type: str,
+    payload: dict,
+    user_ids: Optional[List[int]] = None,
+    notify_email: Optional[str] = None
+) -> OutboxEvent:
+    """Stage an event in the caller's transaction. ``user_ids=None`` broadcasts."""
+    event = OutboxEvent(
+        event_type=event_type,
+        payload=json.dumps(payload),
+        user_ids=json.dumps(user_ids) if user_ids is not None else None,
+        notify_email=notify_email,
+        # Set client-side: server_default is only second-precision on SQLite
+        created_at=datetime.utcnow()
+    )
+    db.add(event)
+    return event
+
+def _epoch(value: Optional[datetime]) -> float:
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _notify_ride_status(email: str, payload: dict):
+    notification_service.send_ride_notification(email, payload["status"], payload)
+
+def _notify_vacation_status(email: str, payload: dict):
+    notification_service.send_booking_confirmation(
+        email, "Vacation", payload.get("booking_reference") or str(payload["vacation_id"])
+    )
+
+# Event types that also go out through NotificationService when notify_email is set
+NOTIFIERS = {
+    "ride_status_update": _notify_ride_status,
+    "vacation_status_update": _notify_vacation_status,
+}
+
+ClaimedEvent = Tuple[int, DomainEvent, Optional[str]]
+
+class OutboxRelay:
+    """Background task that drains the outbox table into the delivery channels"""
+
+    def __init__(
+        self,
+        poll_interval: float = 1.0,
+        batch_size: int = 100,
+        lease_seconds: int = 30,
+        retention_hours: int = 24
+    ):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.retention_hours = retention_hours
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+        # Metrics
+        self.relayed = 0
+        self.deferred = 0
+        self.errors = 0
+        self.last_batch_size = 0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="outbox-relay")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def wake(self):
+        """Ask the relay to drain now instead of at the next poll"""
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.drain()
+                if time.monotonic() - self._last_purge > 3600:
+                    await asyncio.to_thread(self._purge_dispatched)
+                    self._last_purge = time.monotonic()
+            except Exception as e:
+                self.errors += 1
+                print(f"Outbox relay error: {e}")
+
+    async def drain(self):
+        """Relay claimed batches until the outbox is empty"""
+        while True:
+            batch = await asyncio.to_thread(self._claim_batch)
+            self.last_batch_size = len(batch)
+            if not batch:
+                return
+
+            loop = asyncio.get_running_loop()
+            published = []
+            for outbox_id, event, notify_email in batch:
+                event.handed_off = loop.create_future()
+                if not dispatcher.publish(event):
+                    # Dispatcher is saturated; the lease expires and we retry later
+                    self.deferred += 1
+                    continue
+                published.append((outbox_id, event, notify_email))
+            if published:
+                # The in-memory queue dies with the process, so wait until the workers are done with them
+                await asyncio.wait([event.handed_off for _, event, _ in published], timeout=self.lease_seconds)
+
+            delivered_ids = []
+            for outbox_id, event, notify_email in published:
+                if not event.handed_off.done():
+                    self.deferred += 1
+                    continue
+                notifier = NOTIFIERS.get(event.type)
+                if notify_email and notifier:
+                    try:
+                        notifier(notify_email, event.payload)
+                    except Exception as e:
+                        print(f"Failed to queue notification for outbox event {outbox_id}: {e}")
+                delivered_ids.append(outbox_id)
+
+            if delivered_ids:
+                await asyncio.to_thread(self._mark_dispatched, delivered_ids)
+                self.relayed += len(delivered_ids)
+            if len(batch) < self.batch_size or len(delivered_ids) < len(batch):
+                return
+
+    def _claim_batch(self) -> List[ClaimedEvent]:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            query = db.query(OutboxEvent).filter(
+                OutboxEvent.dispatched_at == None,
+                or_(OutboxEvent.locked_until == None, OutboxEvent.locked_until < now)
+            ).order_by(OutboxEvent.id).limit(self.batch_size)
+            if db.bind.dialect.name == "postgresql":
+                # Let several workers relay concurrently without double-claiming rows
+                query = query.with_for_update(skip_locked=True)
+
+            claimed = []
+            for row in query.all():
+                event = DomainEvent(
+                    row.event_type,
+                    json.loads(row.payload),
+                    json.loads(row.user_ids) if row.user_ids is not None else None,
+                    created_at=_epoch(row.created_at)
+                )
+                claimed.append((row.id, event, row.notify_email))
+            if not claimed:
+                db.rollback()
+                return []
+
+            db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_([outbox_id for outbox_id, _, _ in claimed]))
+                .values(
+                    locked_until=now + timedelta(seconds=self.lease_seconds),
+                    attempts=func.coalesce(OutboxEvent.attempts, 0) + 1
+                )
+            )
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _mark_dispatched(self, ids: List[int]):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_(ids))
+                .values(dispatched_at=datetime.utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _purge_dispatched(self):
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+            db.execute(
+                delete(OutboxEvent).where(
+                    OutboxEvent.dispatched_at != None,
+                    OutboxEvent.dispatched_at < cutoff
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "relayed": self.relayed,
+            "deferred": self.deferred,
+            "errors": self.errors,
+            "last_batch_size": self.last_batch_size
+        }
+
+outbox_relay = OutboxRelay(
+    poll_interval=settings.outbox_poll_interval_seconds,
+    batch_size=settings.outbox_batch_size,
+    lease_seconds=settings.outbox_lease_seconds,
+    retention_hours=settings.outbox_retention_hours
+)
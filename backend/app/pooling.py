@@ -0,0 +1,229 @@
+"""
+Intercity seat sharing.
+
+Pending intercity rides are indexed by pool key: (origin city, destination city,
+departure window, vehicle type). Departure windows are fixed ``window_hours``
+buckets of ``scheduled_date``. The rides in each key are packed into shared
+trips with first-fit decreasing on passenger count, so no trip exceeds the
+vehicle's seats. Drivers fetch pre-grouped trips for a corridor straight from
+the index. Packing only runs again for keys that changed.
+
+Booking and accept handlers update the index incrementally. Each worker only
+sees its own writes, so the index also reconciles from the database
+periodically.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import IntercityRide, RideStatus, VehicleType
+from app.scheduler import as_utc, naive_utc, utcnow
+
+# Passenger seats per vehicle class
+VEHICLE_CAPACITY = {
+    VehicleType.ECONOMY: 4,
+    VehicleType.PREMIUM: 4,
+    VehicleType.SUV: 6,
+    VehicleType.LUXURY: 3,
+}
+
+Corridor = Tuple[int, int]
+PoolKey = Tuple[int, int, int, VehicleType]
+
+class PendingSeat(NamedTuple):
+    ride_id: int
+    passengers: int
+    scheduled_date: datetime
+    price: float
+
+class PooledTrip(NamedTuple):
+    origin_city_id: int
+    destination_city_id: int
+    window_start: datetime
+    vehicle_type: VehicleType
+    capacity: int
+    seats_booked: int
+    ride_ids: List[int]
+    departure: datetime
+    total_price: float
+
+def pack(seats: Iterable[PendingSeat], capacity: int) -> List[List[PendingSeat]]:
+    """First-fit decreasing bin packing of rides into vehicles of ``capacity`` seats"""
+    bins: List[List[PendingSeat]] = []
+    free: List[int] = []
+    for seat in sorted(seats, key=lambda s: (-s.passengers, s.scheduled_date, s.ride_id)):
+        needed = max(seat.passengers, 1)
+        for i, remaining in enumerate(free):
+            if needed <= remaining:
+                bins[i].append(seat)
+                free[i] -= needed
+                break
+        else:
+            # Oversized parties get a vehicle of their own
+            bins.append([seat])
+            free.append(max(capacity - needed, 0))
+    return bins
+
+class PoolingIndex:
+    def __init__(self, window_hours: float = 3.0, reconcile_seconds: float = 60.0):
+        self.window_seconds = window_hours * 3600
+        self.reconcile_seconds = reconcile_seconds
+        self._groups: Dict[PoolKey, Dict[int, PendingSeat]] = {}
+        self._corridors: Dict[Corridor, Set[PoolKey]] = {}
+        self._ride_keys: Dict[int, PoolKey] = {}
+        self._trips: Dict[PoolKey, List[PooledTrip]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_reconcile_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._ride_keys)
+
+    def key_for(self, origin_city_id: int, destination_city_id: int, scheduled_date: datetime, vehicle_type) -> PoolKey:
+        bucket = int(as_utc(scheduled_date).timestamp() // self.window_seconds)
+        return (origin_city_id, destination_city_id, bucket, VehicleType(vehicle_type or VehicleType.ECONOMY))
+
+    def add(self, ride: IntercityRide):
+        """Index a pending intercity ride"""
+        key = self.key_for(ride.origin_city_id, ride.destination_city_id, ride.scheduled_date, ride.vehicle_type)
+        self.remove(ride.id)
+        self._groups.setdefault(key, {})[ride.id] = PendingSeat(
+            ride.id, int(ride.passengers or 1), as_utc(ride.scheduled_date), float(ride.price or 0)
+        )
+        self._corridors.setdefault(key[:2], set()).add(key)
+        self._ride_keys[ride.id] = key
+        self._trips.pop(key, None)
+
+    def remove(self, ride_id: int):
+        """Drop a ride that is no longer pending"""
+        key = self._ride_keys.pop(ride_id, None)
+        if key is None:
+            return
+        group = self._groups.get(key)
+        if group is not None:
+            group.pop(ride_id, None)
+            if not group:
+                del self._groups[key]
+                corridor = self._corridors.get(key[:2])
+                if corridor is not None:
+                    corridor.discard(key)
+                    if not corridor:
+                        del self._corridors[key[:2]]
+        self._trips.pop(key, None)
+
+    def remove_many(self, ride_ids: Iterable[int]):
+        for ride_id in ride_ids:
+            self.remove(ride_id)
+
+    def _trips_for(self, key: PoolKey) -> List[PooledTrip]:
+        trips = self._trips.get(key)
+        if trips is None:
+            origin_id, destination_id, bucket, vehicle_type = key
+            capacity = VEHICLE_CAPACITY.get(vehicle_type, 4)
+            window_start = datetime.fromtimestamp(bucket * self.window_seconds, tz=timezone.utc)
+            trips = [
+                PooledTrip(
+                    origin_id, destination_id, window_start, vehicle_type, capacity,
+                    sum(seat.passengers for seat in seats),
+                    sorted(seat.ride_id for seat in seats),
+                    min(seat.scheduled_date for seat in seats),
+                    sum(seat.price for seat in seats)
+                )
+                for seats in pack(self._groups.get(key, {}).values(), capacity)
+            ]
+            self._trips[key] = trips
+        return trips
+
+    def trips(
+        self,
+        origin_city_id: Optional[int] = None,
+        destination_city_id: Optional[int] = None,
+        vehicle_type: Optional[VehicleType] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[PooledTrip]:
+        """Pooled trips, soonest departure first, optionally for one corridor"""
+        if origin_city_id is not None and destination_city_id is not None:
+            keys = self._corridors.get((origin_city_id, destination_city_id), set())
+        else:
+            keys = [
+                key for corridor, corridor_keys in self._corridors.items()
+                if (origin_city_id is None or corridor[0] == origin_city_id)
+                and (destination_city_id is None or corridor[1] == destination_city_id)
+                for key in corridor_keys
+            ]
+        since_bucket = int(as_utc(since).timestamp() // self.window_seconds) if since else None
+        trips = []
+        for key in keys:
+            if vehicle_type is not None and key[3] != vehicle_type:
+                continue
+            if since_bucket is not None and key[2] < since_bucket:
+                continue
+            trips.extend(self._trips_for(key))
+        trips.sort(key=lambda trip: (trip.departure, trip.ride_ids[0]))
+        return trips[:limit] if limit is not None else trips
+
+    # --- Background reconcile ---------------------------------------------
+
+    async def start(self):
+        if self._task is None:
+            # The first reconcile runs in the task, so startup does not wait on the database
+            self._task = asyncio.create_task(self._run(), name="intercity-pooling")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Intercity pooling reconcile error: {e}")
+            await asyncio.sleep(self.reconcile_seconds)
+
+    async def reconcile(self):
+        """Rebuild the index from the pending rides in the database"""
+        started = time.perf_counter()
+        rides = await asyncio.to_thread(self._load_pending)
+        self._groups = {}
+        self._corridors = {}
+        self._ride_keys = {}
+        self._trips = {}
+        for ride in rides:
+            self.add(ride)
+        self.last_reconcile_ms = (time.perf_counter() - started) * 1000
+
+    def _load_pending(self) -> List[IntercityRide]:
+        db = SessionLocal()
+        try:
+            # Departures that are already well in the past are not worth pooling
+            since = utcnow() - timedelta(seconds=self.window_seconds)
+            rides = db.query(IntercityRide).filter(
+                IntercityRide.status == RideStatus.PENDING,
+                IntercityRide.driver_id == None,
+                IntercityRide.scheduled_date >= naive_utc(since)
+            ).all()
+            db.expunge_all()
+            return rides
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "pending_rides": len(self._ride_keys),
+            "pools": len(self._groups),
+            "corridors": len(self._corridors),
+            "last_reconcile_ms": round(self.last_reconcile_ms, 3)
+        }
+
+pooling_index = PoolingIndex(
+    window_hours=settings.intercity_pool_window_hours,
+    reconcile_seconds=settings.intercity_pool_reconcile_seconds
+)
@@ -0,0 +1,245 @@
+"""
+Live diagnosis of a running worker.
+
+SamplingProfiler walks every thread's Python stack with ``sys._current_frames()``
+at a fixed interval for a bounded number of seconds, and aggregates the stacks
+in collapsed format (``thread;outer;...;leaf count``). flamegraph.pl, inferno
+and speedscope read that format directly. Sampling runs in its own thread and
+needs no tracing hooks, so the cost is a short GIL hold per sample and nothing
+outside a profile.
+
+LoopLagMonitor measures how late a periodic heartbeat on the event loop wakes up.
+A watchdog thread watches the heartbeat. When the loop has not ticked for
+``loop_monitor_threshold_ms``, it logs the loop thread's current stack, which
+names the coroutine doing blocking work (bcrypt, a sync DB call, a long loop).
+"""
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from functools import lru_cache
+from typing import List, Optional
+
+from app.config import settings
+from app.metrics import event_loop_lag, event_loop_stalls
+
+# Leaf frames of threads parked waiting for work; left out unless include_idle
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PATH_ROOTS = sorted(
+    {path for path in [_BACKEND_ROOT, *sysconfig.get_paths().values()] if path},
+    key=len,
+    reverse=True
+)
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+@lru_cache(maxsize=4096)
+def short_path(filename: str) -> str:
+    """Path relative to the backend, site-packages or stdlib, whichever matches"""
+    for root in _PATH_ROOTS:
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+
+def format_stack(frame, limit: int = 20) -> List[str]:
+    """Innermost ``limit`` frames of a live stack, outermost first"""
+    return [
+        f"{short_path(entry.filename)}:{entry.lineno} in {entry.name}"
+        for entry in traceback.extract_stack(frame)[-limit:]
+    ]
+
+class ProfileResult:
+    def __init__(self, seconds: float, interval_ms: float):
+        self.seconds = seconds
+        self.interval_ms = interval_ms
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.threads: Counter = Counter()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 30) -> dict:
+        """Hottest functions by self time (leaf) and total time (anywhere on the stack)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        stack_samples = sum(self.stacks.values()) or 1
+
+        def rows(counter: Counter) -> List[dict]:
+            return [
+                {"frame": frame, "samples": count, "percent": round(100 * count / stack_samples, 1)}
+                for frame, count in counter.most_common(top)
+            ]
+
+        return {
+            "seconds": round(self.seconds, 3),
+            "interval_ms": self.interval_ms,
+            "samples": self.samples,
+            "threads": dict(self.threads.most_common()),
+            "top_self": rows(own),
+            "top_total": rows(total)
+        }
+
+class SamplingProfiler:
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self.profiles = 0
+        self.last_profile_at: Optional[float] = None
+
+    def profile(self, seconds: float, interval_ms: float = 10.0, include_idle: bool = False) -> ProfileResult:
+        """Sample all threads for ``seconds``. Blocking, so call it off the event loop."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            seconds = min(seconds, self.max_seconds)
+            interval = interval_ms / 1000
+            own_thread = threading.get_ident()
+            result = ProfileResult(seconds, interval_ms)
+            started = time.perf_counter()
+            deadline = started + seconds
+            while True:
+                self._sample(result, own_thread, include_idle)
+                next_at = started + (result.samples + 1) * interval
+                if next_at >= deadline:
+                    break
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+            result.seconds = time.perf_counter() - started
+            self.profiles += 1
+            self.last_profile_at = time.time()
+            return result
+        finally:
+            self._lock.release()
+
+    def _sample(self, result: ProfileResult, own_thread: int, include_idle: bool):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        result.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == own_thread:
+                continue
+            code = frame.f_code
+            if not include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            name = names.get(ident, f"thread-{ident}")
+            labels.append(name.replace(";", ":").replace(" ", "_"))
+            labels.reverse()
+            result.stacks[";".join(labels)] += 1
+            result.threads[name] += 1
+
+    def stats(self) -> dict:
+        return {
+            "running": self._lock.locked(),
+            "profiles": self.profiles,
+            "last_profile_at": self.last_profile_at,
+            "max_seconds": self.max_seconds
+        }
+
+class LoopLagMonitor:
+    def __init__(self, threshold_ms: float = 100.0, interval_seconds: float = 0.05, history: int = 50):
+        self.threshold_ms = threshold_ms
+        self.interval_seconds = interval_seconds
+        self.recent: deque = deque(maxlen=history)
+        self.stall_count = 0
+        self.max_lag_ms = 0.0
+        self.last_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread: Optional[int] = None
+        self._last_beat = 0.0
+        # Set by the watchdog while the loop is blocked, closed by the next heartbeat
+        self._stall: Optional[dict] = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._stopping.set()
+        await asyncio.to_thread(self._watchdog.join, 1.0)
+        self._watchdog = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            now = time.perf_counter()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            self.last_lag_ms = lag * 1000
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+            event_loop_lag.observe(lag)
+            stall, self._stall = self._stall, None
+            if self.last_lag_ms < self.threshold_ms:
+                continue
+            self.stall_count += 1
+            event_loop_stalls.inc()
+            if stall is None:
+                # Shorter than a watchdog tick, so no stack was captured
+                stall = {"at": time.time(), "stack": []}
+            stall["blocked_ms"] = round(self.last_lag_ms, 1)
+            self.recent.append(stall)
+            print(f"Event loop was blocked for {self.last_lag_ms:.0f} ms")
+
+    def _watch(self):
+        while not self._stopping.wait(self.interval_seconds):
+            blocked_ms = (time.perf_counter() - self._last_beat) * 1000
+            if blocked_ms < self.threshold_ms or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = format_stack(frame) if frame is not None else []
+            self._stall = {"at": time.time(), "stack": stack}
+            print(f"Event loop blocked for {blocked_ms:.0f} ms so far, at:\n  " + "\n  ".join(stack))
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "threshold_ms": self.threshold_ms,
+            "last_lag_ms": round(self.last_lag_ms, 3),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "stalls": self.stall_count,
+            "recent_stalls": list(self.recent)
+        }
+
+sampling_profiler = SamplingProfiler(max_seconds=settings.profiler_max_seconds)
+
+loop_monitor = LoopLagMonitor(
+    threshold_ms=settings.loop_monitor_threshold_ms,
+    interval_seconds=settings.loop_monitor_interval_seconds
+)
@@ -0,0 +1,201 @@
+"""
+Per-request SQL profiling and N+1 detection (opt-in).
+
+When ``query_profiler_enabled`` is set, QueryProfilerMiddleware gives each HTTP
+request a QueryProfile. The engine's metrics hooks (``app.metrics.instrument_engine``)
+charge every statement to it through ``observe_queries``, so queries are timed
+once for both. Statements are normalized to a "shape" (literals, bind markers and IN lists
+collapsed), so the same query run once per row in a loop shows up as one shape
+with a high count. Responses carry X-DB-Query-Count, X-DB-Query-Time-Ms and,
+when a shape repeats at least ``query_profiler_n_plus_one_threshold`` times,
+X-DB-N-Plus-One. Recent profiles and per-route worst cases are served by
+``GET /api/admin/query-profile``.
+
+In strict mode the statement that crosses the N+1 threshold or the per-request
+budget raises QueryBudgetExceeded, so the request fails with a 500 and any
+test exercising it fails too. ``query_budget()`` applies the same check to a
+block of code, with or without a request around it.
+"""
+import re
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.metrics import observe_queries
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request or ``query_budget`` block runs more queries than allowed"""
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND = re.compile(r"%\(\w+\)s|%s|:\w+|\?|\$\d+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+def statement_shape(statement: str) -> str:
+    """Normalize SQL so statements that differ only in values compare equal"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _BIND.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("(?)", shape)
+
+class QueryProfile:
+    def __init__(self, label: str = "", max_queries: Optional[int] = None, n_plus_one_threshold: Optional[int] = None, strict: bool = False):
+        self.label = label
+        self.max_queries = max_queries
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.strict = strict
+        self.queries = 0
+        self.seconds = 0.0
+        # shape -> [count, seconds]
+        self.shapes: Dict[str, List[float]] = {}
+
+    def record(self, statement: str, elapsed: float):
+        self.queries += 1
+        self.seconds += elapsed
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        if not self.strict:
+            return
+        if self.max_queries is not None and self.queries > self.max_queries:
+            raise QueryBudgetExceeded(f"{self.label or 'block'} ran {self.queries} queries, budget is {self.max_queries}")
+        if self.n_plus_one_threshold and entry[0] == self.n_plus_one_threshold:
+            raise QueryBudgetExceeded(
+                f"{self.label or 'block'} repeated the same statement {entry[0]} times (N+1?): {shape[:200]}"
+            )
+
+    def repeated(self) -> List[dict]:
+        """Shapes that reached the N+1 threshold, most frequent first"""
+        threshold = self.n_plus_one_threshold
+        if not threshold:
+            return []
+        return [
+            {"statement": shape, "count": int(count), "total_ms": round(seconds * 1000, 3)}
+            for shape, (count, seconds) in sorted(self.shapes.items(), key=lambda item: -item[1][0])
+            if count >= threshold
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "label": self.label,
+            "queries": self.queries,
+            "db_ms": round(self.seconds * 1000, 3),
+            "distinct_statements": len(self.shapes),
+            "n_plus_one": self.repeated()
+        }
+
+@contextmanager
+def query_budget(max_queries: Optional[int] = None, n_plus_one_threshold: Optional[int] = None, label: str = "block"):
+    """Fail with QueryBudgetExceeded if the block exceeds its query budget.
+
+        with query_budget(max_queries=2, n_plus_one_threshold=3):
+            update_cities(db)
+
+    The budget follows the current context, so it covers code called directly.
+    It does not cover a TestClient request, which runs the app in another
+    thread. For HTTP tests, check the X-DB-Query-Count header or enable strict
+    mode.
+    """
+    profile = QueryProfile(label, max_queries, n_plus_one_threshold, strict=True)
+    with observe_queries(profile):
+        yield profile
+
+class QueryProfiler:
+    """Keeps recent request profiles and the worst profile seen per route"""
+
+    def __init__(self, history: int = 200, n_plus_one_threshold: int = 5, max_queries: int = 0, strict: bool = False):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_queries = max_queries or None
+        self.strict = strict
+        self.recent: deque = deque(maxlen=history)
+        self.routes: Dict[str, dict] = OrderedDict()
+        self.flagged_requests = 0
+
+    def new_profile(self, label: str) -> QueryProfile:
+        return QueryProfile(label, self.max_queries, self.n_plus_one_threshold, self.strict)
+
+    def finish(self, route: str, profile: QueryProfile):
+        summary = profile.summary()
+        if summary["n_plus_one"]:
+            self.flagged_requests += 1
+        self.recent.append(summary)
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = {"requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0, "worst": None}
+        stats["requests"] += 1
+        stats["queries"] += profile.queries
+        stats["db_ms"] += profile.seconds * 1000
+        if profile.queries >= stats["max_queries"]:
+            stats["max_queries"] = profile.queries
+            stats["worst"] = summary
+
+    def report(self) -> dict:
+        return {
+            "enabled": True,
+            "strict": self.strict,
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "max_queries": self.max_queries,
+            "flagged_requests": self.flagged_requests,
+            "routes": {
+                route: {
+                    "requests": stats["requests"],
+                    "avg_queries": round(stats["queries"] / stats["requests"], 2),
+                    "avg_db_ms": round(stats["db_ms"] / stats["requests"], 3),
+                    "max_queries": stats["max_queries"],
+                    "worst": stats["worst"]
+                }
+                for route, stats in sorted(self.routes.items(), key=lambda item: -item[1]["max_queries"])
+            },
+            "recent": list(self.recent)[-50:]
+        }
+
+    def reset(self):
+        self.recent.clear()
+        self.routes.clear()
+        self.flagged_requests = 0
+
+class QueryProfilerMiddleware:
+    """Profiles each HTTP request and reports it through response headers"""
+
+    def __init__(self, app, profiler: "QueryProfiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.new_profile(f"{scope['method']} {scope['path']}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(profile.queries).encode()))
+                headers.append((b"x-db-query-time-ms", f"{profile.seconds * 1000:.3f}".encode()))
+                repeated = profile.repeated()
+                if repeated:
+                    headers.append((b"x-db-n-plus-one", str(repeated[0]["count"]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            with observe_queries(profile):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            self.profiler.finish(f"{scope['method']} {template}", profile)
+
+query_profiler = QueryProfiler(
+    history=settings.query_profiler_history,
+    n_plus_one_threshold=settings.query_profiler_n_plus_one_threshold,
+    max_queries=settings.query_profiler_max_queries,
+    strict=settings.query_profiler_strict
+)
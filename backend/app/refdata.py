@@ -0,0 +1,102 @@
+"""
+Cached reference-data responses.
+
+Slowly changing lookups (cities, loyalty tiers, ...) are serialized to JSON once
+and kept as bytes along with an ETag derived from the body. The ETag is weak,
+because CompressionMiddleware may send the same entry as identity, gzip or br
+bytes. Requests whose ``If-None-Match`` matches get an empty 304. Everything
+else gets the cached bytes without querying or re-serializing. Entries rebuild when a writer calls
+``invalidate()``, or once they are older than ``max_age_seconds``, which bounds
+staleness in workers that did not see the write.
+"""
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+class RefDataEntry(NamedTuple):
+    version: int
+    etag: str
+    body: bytes
+    built_at: float
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 7232 If-None-Match check (weak comparison, as the spec requires for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag.removeprefix("W/"):
+            return True
+    return False
+
+class ReferenceData:
+    """One cached, pre-serialized reference payload"""
+
+    def __init__(self, name: str, build: Callable[[Session], Any], max_age_seconds: float = 300.0):
+        self.name = name
+        self.build = build
+        self.max_age_seconds = max_age_seconds
+        self._entry: Optional[RefDataEntry] = None
+        self._stale = True
+        self.version = 0
+        self.builds = 0
+        self.not_modified = 0
+        REGISTRY[name] = self
+
+    def invalidate(self):
+        self._stale = True
+
+    def get(self, db: Session) -> RefDataEntry:
+        entry = self._entry
+        if entry is None or self._stale or time.monotonic() - entry.built_at > self.max_age_seconds:
+            entry = self._rebuild(db)
+        return entry
+
+    def _rebuild(self, db: Session) -> RefDataEntry:
+        self._stale = False
+        body = json.dumps(jsonable_encoder(self.build(db)), separators=(",", ":")).encode()
+        self.builds += 1
+        etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        previous = self._entry
+        if previous is not None and previous.etag == etag:
+            # Same content: keep the version so clients' ETags stay valid
+            entry = previous._replace(built_at=time.monotonic())
+        else:
+            self.version += 1
+            entry = RefDataEntry(self.version, etag, body, time.monotonic())
+        self._entry = entry
+        return entry
+
+    def response(self, request: Request, db: Session) -> Response:
+        entry = self.get(db)
+        headers = {
+            "ETag": entry.etag,
+            # Clients may keep the body but must revalidate before reusing it
+            "Cache-Control": "no-cache",
+            "X-Data-Version": str(entry.version),
+            # The 200 may be compressed, so caches must key on the encoding for the 304 too
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "bytes": len(self._entry.body) if self._entry else 0,
+            "builds": self.builds,
+            "not_modified": self.not_modified
+        }
+
+REGISTRY: Dict[str, ReferenceData] = {}
@@ -0,0 +1,77 @@
+"""
+Atomic ride state transitions.
+
+Every status change is a single conditional ``UPDATE ... WHERE status = :expected
+RETURNING id`` so that concurrent requests (e.g. several drivers accepting the same
+ride) cannot both win. Callers check the return value and answer with a 409 when
+the row was changed underneath them.
+
+Ride status changes also record their hourly rollup deltas (app/analytics.py) in
+the same statement's transaction, so the analytics never count a change that
+was rolled back.
+"""
+from typing import Any, Iterable, Optional, Union
+
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.analytics import record_ride_changes, ride_deltas
+from app.models import Ride, RideStatus
+
+ExpectedStatus = Union[RideStatus, Iterable[RideStatus]]
+
+def transition(
+    db: Session,
+    model: Any,
+    row_id: int,
+    expected: ExpectedStatus,
+    *criteria: Any,
+    **values: Any
+) -> Optional[int]:
+    """Move ``model`` row ``row_id`` to new values if it is still in ``expected`` status.
+
+    Extra SQL ``criteria`` (e.g. ``Ride.driver_id == None``) are ANDed into the WHERE
+    clause. Returns the row id when the update applied, ``None`` when another request
+    got there first. The caller owns the transaction and commits.
+    """
+    if isinstance(expected, RideStatus):
+        status_clause = model.status == expected
+    else:
+        status_clause = model.status.in_(list(expected))
+
+    stmt = (
+        update(model)
+        .where(model.id == row_id, status_clause, *criteria)
+        .values(**values)
+    )
+    if model is not Ride or "status" not in values:
+        return db.execute(stmt.returning(model.id)).scalar_one_or_none()
+
+    # The rollup needs the old status, so ride status changes name exactly one
+    if not isinstance(expected, RideStatus):
+        raise ValueError("Ride status transitions must expect a single status")
+    row = db.execute(stmt.returning(
+        Ride.id, Ride.created_at, Ride.vehicle_type, Ride.distance_km, Ride.final_fare
+    )).one_or_none()
+    if row is None:
+        return None
+    ride_id, created_at, vehicle_type, distance_km, final_fare = row
+    record_ride_changes(db, ride_deltas(created_at, vehicle_type, distance_km, final_fare, expected, values["status"]))
+    return ride_id
+
+def conflict(detail: str) -> HTTPException:
+    """HTTP 409 raised when a conditional transition loses the race"""
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+def ride_request_payload(ride: Ride) -> dict:
+    """Body of the new_ride_request notification sent to drivers"""
+    return {
+        "ride_id": ride.id,
+        "pickup_address": ride.pickup_address,
+        "destination_address": ride.destination_address,
+        "distance_km": round(float(ride.distance_km or 0), 2),
+        "estimated_fare": round(float(ride.estimated_fare or 0), 2),
+        "vehicle_type": ride.vehicle_type.value if ride.vehicle_type is not None else "economy",
+        "scheduled_time": ride.scheduled_time.isoformat() if ride.scheduled_time is not None else None
+    }
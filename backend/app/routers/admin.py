@@ -1,15 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, case, select
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
 
 from app.database import get_db
-from app.models import User, Ride, DriverProfile, UserRole, RideStatus
+from app.models import User, Ride, UserRole, RideStatus, VehicleType
 from app.schemas import AdminStats, UserResponse
 from app.auth import get_current_active_user
+from app.events import dispatcher
+from app.outbox import outbox_relay
+from app.notifications import notification_service
+from app.surge import surge_engine
+from app.scheduler import ride_scheduler
+from app.loyalty import loyalty_accruer
+from app.pooling import pooling_index
+from app.config import settings
+from app.query_profiler import query_profiler
+from app.profiling import ProfilerBusy, loop_monitor, sampling_profiler
+from app.serialization import RowSerializer, stream_ndjson
+from app.exports import ExportBusy, USER_EXPORT_COLUMNS, export_limiter, export_response, ride_export_columns
+from app.analytics import GROUP_FIELDS, query_rollup, rebuild, rollup_compactor
+from app.archive import archive_totals, ride_archiver, with_archive
 
 router = APIRouter()
 
+user_serializer = RowSerializer(UserResponse, User)
+
 async def verify_admin(current_user: User = Depends(get_current_active_user)):
     """Verify user is an admin"""
     if current_user.role != UserRole.ADMIN:
@@ -25,18 +44,25 @@ async def get_admin_stats(
     db: Session = Depends(get_db)
 ):
     """Get platform statistics"""
-    total_users = db.query(User).count()
-    total_drivers = db.query(User).filter(User.role == UserRole.DRIVER).count()
-    total_riders = db.query(User).filter(User.role == UserRole.RIDER).count()
-    total_rides = db.query(Ride).count()
-    active_rides = db.query(Ride).filter(
-        Ride.status.in_([RideStatus.PENDING, RideStatus.ACCEPTED, RideStatus.IN_PROGRESS])
-    ).count()
-    completed_rides = db.query(Ride).filter(Ride.status == RideStatus.COMPLETED).count()
+    # One grouped count for users and one aggregate pass over the active rides;
+    # archived rides are added from cached totals
+    users_by_role = dict(db.query(User.role, func.count(User.id)).group_by(User.role).all())
+    total_users = sum(users_by_role.values())
+    total_drivers = users_by_role.get(UserRole.DRIVER, 0)
+    total_riders = users_by_role.get(UserRole.RIDER, 0)
     
-    total_revenue = db.query(func.sum(Ride.final_fare)).filter(
-        Ride.status == RideStatus.COMPLETED
-    ).scalar() or 0.0
+    active = Ride.status.in_([RideStatus.PENDING, RideStatus.ACCEPTED, RideStatus.IN_PROGRESS])
+    completed = Ride.status == RideStatus.COMPLETED
+    total_rides, active_rides, completed_rides, total_revenue = db.query(
+        func.count(Ride.id),
+        func.coalesce(func.sum(case((active, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((completed, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((completed, Ride.final_fare), else_=None)), 0.0)
+    ).one()
+    archived_rides, archived_completed, archived_revenue = archive_totals.get(db)
+    total_rides += archived_rides
+    completed_rides += archived_completed
+    total_revenue = float(total_revenue) + archived_revenue
     
     return {
         "total_users": total_users,
@@ -48,20 +74,197 @@ async def get_admin_stats(
         "total_revenue": float(total_revenue)
     }
 
+@router.get("/dispatcher")
+async def get_dispatcher_stats(current_user: User = Depends(verify_admin)):
+    """Get dispatcher, outbox relay, notification, ride scheduler, loyalty accrual, pooling, export, rollup and archive stats"""
+    return {
+        **dispatcher.stats(),
+        "outbox": outbox_relay.stats(),
+        "notifications": notification_service.stats(),
+        "scheduler": ride_scheduler.stats(),
+        "loyalty": loyalty_accruer.stats(),
+        "pooling": pooling_index.stats(),
+        "exports": export_limiter.stats(),
+        "analytics": rollup_compactor.stats(),
+        "archive": ride_archiver.stats()
+    }
+
+@router.get("/query-profile")
+async def get_query_profile(reset: bool = False, current_user: User = Depends(verify_admin)):
+    """Per-route SQL counts and suspected N+1 statements (query_profiler_enabled only)"""
+    if not settings.query_profiler_enabled:
+        return {"enabled": False}
+    report = query_profiler.report()
+    if reset:
+        query_profiler.reset()
+    return report
+
+@router.get("/profile")
+async def get_sampling_profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    include_idle: bool = False,
+    current_user: User = Depends(verify_admin)
+):
+    """Sample this worker's stacks for a few seconds.
+
+    ``collapsed`` returns flamegraph.pl / speedscope input; ``json`` returns the
+    hottest functions. Seconds are capped at ``profiler_max_seconds``.
+    """
+    try:
+        result = await asyncio.to_thread(sampling_profiler.profile, seconds, interval_ms, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if format == "json":
+        return result.summary()
+    return PlainTextResponse(result.collapsed())
+
+@router.get("/event-loop")
+async def get_event_loop_stats(current_user: User = Depends(verify_admin)):
+    """Get event loop lag and recent stalls with the stack that blocked the loop"""
+    return {**loop_monitor.stats(), "profiler": sampling_profiler.stats()}
+
+@router.get("/surge")
+async def get_surge_stats(current_user: User = Depends(verify_admin)):
+    """Get surge engine state: tracked drivers, surging cells and recompute cost"""
+    return surge_engine.stats()
+
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
     current_user: User = Depends(verify_admin),
     db: Session = Depends(get_db),
-    role: str = None
+    role: str = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
 ):
-    """Get all users"""
-    query = db.query(User)
+    """Get all users; format=ndjson streams one user per line"""
+    query = user_serializer.query(db)
     
     if role:
         query = query.filter(User.role == role)
     
-    users = query.all()
-    return users
+    if format == "ndjson":
+        return stream_ndjson(query.order_by(User.id).statement, user_serializer.row)
+    return user_serializer.response(query.all())
+
+def start_export(statement, name: str, format: str):
+    try:
+        return export_response(statement, name, format)
+    except ExportBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
+
+@router.get("/export/rides")
+async def export_rides(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    status: Optional[RideStatus] = None,
+    vehicle_type: Optional[VehicleType] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    rider_id: Optional[int] = None,
+    driver_id: Optional[int] = None,
+    include_archived: bool = False,
+    current_user: User = Depends(verify_admin)
+):
+    """Stream rides created in [since, until) as CSV or NDJSON, oldest id first"""
+    def rides_of(model):
+        filters = []
+        if status is not None:
+            filters.append(model.status == status)
+        if vehicle_type is not None:
+            filters.append(model.vehicle_type == vehicle_type)
+        if since is not None:
+            filters.append(model.created_at >= since)
+        if until is not None:
+            filters.append(model.created_at < until)
+        if rider_id is not None:
+            filters.append(model.rider_id == rider_id)
+        if driver_id is not None:
+            filters.append(model.driver_id == driver_id)
+        return select(*ride_export_columns(model)).where(*filters)
+    
+    statement = with_archive(rides_of) if include_archived else rides_of(Ride)
+    return start_export(statement, "rides", format)
+
+@router.get("/export/users")
+async def export_users(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(verify_admin)
+):
+    """Stream users created in [since, until) as CSV or NDJSON, without password hashes"""
+    filters = []
+    if role is not None:
+        filters.append(User.role == role)
+    if is_active is not None:
+        filters.append(User.is_active == is_active)
+    if since is not None:
+        filters.append(User.created_at >= since)
+    if until is not None:
+        filters.append(User.created_at < until)
+    return start_export(select(*USER_EXPORT_COLUMNS).where(*filters), "users", format)
+
+# Longest range one analytics request may cover, per granularity
+ANALYTICS_MAX_RANGE = {"hour": timedelta(days=31), "day": timedelta(days=366)}
+
+def analytics_range(since: Optional[datetime], until: Optional[datetime], granularity: str, group_by: List[str]):
+    """Validate the query; the range defaults to the last day (hourly) or 30 days (daily)"""
+    unknown = set(group_by) - set(GROUP_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cannot group by {', '.join(sorted(unknown))}")
+    if until is None:
+        until = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    elif until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    if since is None:
+        since = until - timedelta(days=1 if granularity == "hour" else 30)
+    elif since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be before until")
+    if until - since > ANALYTICS_MAX_RANGE[granularity]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {ANALYTICS_MAX_RANGE[granularity].days} days per request at {granularity} granularity"
+        )
+    return since, until
+
+@router.get("/analytics/rides")
+async def get_ride_analytics(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    group_by: List[str] = Query([]),
+    vehicle_type: Optional[VehicleType] = None,
+    status: Optional[RideStatus] = None,
+    current_user: User = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Rides, completed revenue and distance per UTC hour or day of ride creation.
+
+    Reads only the hourly rollup, which trails live rides by up to
+    ``rollup_compact_interval_seconds``. ``group_by`` takes vehicle_type and/or status.
+    """
+    since, until = analytics_range(since, until, granularity, group_by)
+    return query_rollup(db, since, until, granularity, group_by, vehicle_type, status)
+
+@router.post("/analytics/rebuild")
+async def rebuild_ride_analytics(current_user: User = Depends(verify_admin)):
+    """Recompute the hourly rollup from the rides table"""
+    rows = await asyncio.to_thread(rebuild)
+    return {"message": "Ride analytics rebuilt", "rollup_rows": rows}
+
+@router.post("/archive/rides")
+async def archive_rides(current_user: User = Depends(verify_admin)):
+    """Archive eligible rides now instead of waiting for the next archiver pass"""
+    archived = await ride_archiver.drain()
+    return {"message": "Rides archived", "archived": archived}
 
 @router.patch("/users/{user_id}/toggle-active")
 async def toggle_user_active(
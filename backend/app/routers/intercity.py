@@ -1,54 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from typing import List
-import math
+from typing import List, Optional
 
+from app.config import settings
 from app.database import get_db
-from app.models import User, City, IntercityRide, UserRole, RideStatus
-from app.schemas import CityCreate, CityResponse, IntercityRideCreate, IntercityRideResponse
+from app.models import User, City, IntercityRide, UserRole, RideStatus, VehicleType
+from app.schemas import (
+    CityCreate, CityResponse, IntercityRideCreate, IntercityRideResponse, IntercityQuoteResponse,
+    PooledTripResponse, PooledTripAccept
+)
 from app.auth import get_current_active_user
+from app.ride_state import transition, conflict
+from app.fares import INTERCITY_TARIFFS, INTERCITY_MULTIPLIER
+from app.city_cache import city_cache
+from app.refdata import ReferenceData
+from app.pooling import pooling_index, VEHICLE_CAPACITY
+from app.scheduler import naive_utc, utcnow
+from app.serialization import RowSerializer
 
 router = APIRouter()
 
-def calculate_intercity_price(distance_km: float, vehicle_type: str, base_multiplier: float = 1.5) -> float:
+ride_serializer = RowSerializer(IntercityRideResponse, IntercityRide)
+
+def calculate_intercity_price(distance_km: float, vehicle_type: str, base_multiplier: float = INTERCITY_MULTIPLIER) -> float:
     """Calculate intercity ride price"""
-    base_fare = {
-        "economy": 200,
-        "premium": 350,
-        "suv": 450,
-        "luxury": 700
-    }
-    
-    per_km_rate = {
-        "economy": 12,
-        "premium": 18,
-        "suv": 22,
-        "luxury": 30
-    }
-    
-    base = base_fare.get(vehicle_type, 200)
-    rate = per_km_rate.get(vehicle_type, 12)
-    
-    return (base + (distance_km * rate)) * base_multiplier
+    return INTERCITY_TARIFFS.price(distance_km, vehicle_type, base_multiplier)
 
-def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    """Calculate distance using Haversine formula"""
-    R = 6371
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
+cities_refdata = ReferenceData(
+    "cities",
+    # get_cities loads the city snapshot before this runs
+    lambda db: [city._asdict() for city in city_cache.current().active_cities()],
+    max_age_seconds=settings.city_cache_max_age_seconds
+)
 
 @router.get("/cities", response_model=List[CityResponse])
-async def get_cities(db: Session = Depends(get_db)):
-    """Get all active cities"""
-    cities = db.query(City).filter(City.is_active == True).all()
-    return cities
+async def get_cities(request: Request, db: Session = Depends(get_db)):
+    """Get all active cities (cached, supports If-None-Match)"""
+    await city_cache.get()
+    return cities_refdata.response(request, db)
+
+@router.get("/quote", response_model=IntercityQuoteResponse)
+async def quote_intercity_ride(origin_city_id: int, destination_city_id: int):
+    """Price a trip between two cities for every vehicle class"""
+    snapshot = await city_cache.get(origin_city_id, destination_city_id)
+    trip = snapshot.quote(origin_city_id, destination_city_id, VehicleType.ECONOMY)
+    if trip is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Origin or destination city not found"
+        )
+    return {
+        "origin_city_id": origin_city_id,
+        "destination_city_id": destination_city_id,
+        "distance_km": round(trip.distance_km, 2),
+        "estimated_duration_hours": round(trip.estimated_duration_hours, 2),
+        "quotes": [
+            {"vehicle_type": vehicle_type, "estimated_fare": round(price, 2)}
+            for vehicle_type, price in snapshot.quote_all(origin_city_id, destination_city_id)
+        ]
+    }
 
 @router.post("/cities", response_model=CityResponse, status_code=status.HTTP_201_CREATED)
 async def create_city(
@@ -74,6 +85,8 @@ async def create_city(
     db.add(new_city)
     db.commit()
     db.refresh(new_city)
+    city_cache.invalidate()
+    cities_refdata.invalidate()
     
     return new_city
 
@@ -90,49 +103,36 @@ async def create_intercity_ride(
             detail="Only riders can book intercity rides"
         )
     
-    # Verify cities exist
-    origin_city = db.query(City).filter(City.id == ride_data.origin_city_id).first()
-    dest_city = db.query(City).filter(City.id == ride_data.destination_city_id).first()
+    # Distance, duration and price come from the precomputed city matrix
+    snapshot = await city_cache.get(ride_data.origin_city_id, ride_data.destination_city_id)
+    trip = snapshot.quote(
+        ride_data.origin_city_id, ride_data.destination_city_id, ride_data.vehicle_type
+    )
     
-    if not origin_city or not dest_city:
+    if trip is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Origin or destination city not found"
         )
     
-    # Calculate distance if city coordinates are available
-    distance = None
-    if origin_city.lat and origin_city.lng and dest_city.lat and dest_city.lng:
-        distance = calculate_distance(
-            origin_city.lat, origin_city.lng,
-            dest_city.lat, dest_city.lng
-        )
-    else:
-        distance = 100  # Default distance
-    
-    # Calculate price
-    price = calculate_intercity_price(distance, ride_data.vehicle_type.value)
-    
-    # Estimate duration (assuming average highway speed of 80 km/h)
-    estimated_duration = distance / 80 if distance else 2
-    
     new_ride = IntercityRide(
         rider_id=current_user.id,
         origin_city_id=ride_data.origin_city_id,
         destination_city_id=ride_data.destination_city_id,
         pickup_address=ride_data.pickup_address,
         dropoff_address=ride_data.dropoff_address,
-        scheduled_date=ride_data.scheduled_date,
+        scheduled_date=naive_utc(ride_data.scheduled_date),
         vehicle_type=ride_data.vehicle_type,
-        distance_km=distance,
-        estimated_duration_hours=estimated_duration,
-        price=price,
+        distance_km=trip.distance_km,
+        estimated_duration_hours=trip.estimated_duration_hours,
+        price=trip.price,
         passengers=ride_data.passengers
     )
     
     db.add(new_ride)
     db.commit()
     db.refresh(new_ride)
+    pooling_index.add(new_ride)
     
     return new_ride
 
@@ -143,7 +143,7 @@ async def get_intercity_rides(
     db: Session = Depends(get_db)
 ):
     """Get intercity rides for current user"""
-    query = db.query(IntercityRide)
+    query = ride_serializer.query(db)
     
     if status:
         # Convert string to enum
@@ -166,25 +166,115 @@ async def get_intercity_rides(
         )
     
     rides = query.order_by(IntercityRide.scheduled_date.desc()).all()
-    return rides
+    return ride_serializer.response(rides)
+
+def require_driver(current_user: User, detail: str):
+    if current_user.role != UserRole.DRIVER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=detail
+        )
 
 @router.get("/rides/available", response_model=List[IntercityRideResponse])
 async def get_available_intercity_rides(
+    origin_city_id: Optional[int] = None,
+    destination_city_id: Optional[int] = None,
+    vehicle_type: Optional[VehicleType] = None,
+    limit: int = Query(100, ge=1, le=500),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get available intercity rides for drivers"""
-    if current_user.role != UserRole.DRIVER:
+    """Get available intercity rides for drivers, soonest departure first"""
+    require_driver(current_user, "Only drivers can view available rides")
+    
+    query = ride_serializer.query(db).filter(
+        IntercityRide.status == RideStatus.PENDING,
+        IntercityRide.driver_id == None,
+        IntercityRide.scheduled_date >= naive_utc(utcnow())
+    )
+    if origin_city_id is not None:
+        query = query.filter(IntercityRide.origin_city_id == origin_city_id)
+    if destination_city_id is not None:
+        query = query.filter(IntercityRide.destination_city_id == destination_city_id)
+    if vehicle_type is not None:
+        query = query.filter(IntercityRide.vehicle_type == vehicle_type)
+    
+    rides = query.order_by(IntercityRide.scheduled_date.asc(), IntercityRide.id).limit(limit).all()
+    return ride_serializer.response(rides)
+
+@router.get("/trips", response_model=List[PooledTripResponse])
+async def get_pooled_trips(
+    origin_city_id: Optional[int] = None,
+    destination_city_id: Optional[int] = None,
+    vehicle_type: Optional[VehicleType] = None,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Pending intercity bookings grouped into shared vehicles, soonest departure first"""
+    require_driver(current_user, "Only drivers can view pooled trips")
+    
+    trips = pooling_index.trips(
+        origin_city_id, destination_city_id, vehicle_type, since=utcnow(), limit=limit
+    )
+    return [trip._asdict() for trip in trips]
+
+@router.post("/trips/accept")
+async def accept_pooled_trip(
+    trip: PooledTripAccept,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Accept every booking of a pooled trip, or none of them (Driver only)"""
+    require_driver(current_user, "Only drivers can accept rides")
+    
+    ride_ids = sorted(set(trip.ride_ids))
+    rides = db.query(IntercityRide).filter(IntercityRide.id.in_(ride_ids)).all()
+    if len(rides) != len(ride_ids):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only drivers can view available rides"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ride not found"
         )
     
-    rides = db.query(IntercityRide).filter(
-        IntercityRide.status == RideStatus.PENDING
-    ).order_by(IntercityRide.scheduled_date.desc()).all()
+    keys = {
+        pooling_index.key_for(ride.origin_city_id, ride.destination_city_id, ride.scheduled_date, ride.vehicle_type)
+        for ride in rides
+    }
+    if len(keys) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Rides must share corridor, departure window and vehicle type"
+        )
+    capacity = VEHICLE_CAPACITY.get(next(iter(keys))[3], 4)
+    seats = sum(ride.passengers or 1 for ride in rides)
+    if len(rides) > 1 and seats > capacity:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Trip needs {seats} seats but the vehicle has {capacity}"
+        )
     
-    return rides
+    accepted = db.execute(
+        update(IntercityRide)
+        .where(
+            IntercityRide.id.in_(ride_ids),
+            IntercityRide.status == RideStatus.PENDING,
+            IntercityRide.driver_id == None
+        )
+        .values(driver_id=current_user.id, status=RideStatus.ACCEPTED)
+        .returning(IntercityRide.id)
+    ).scalars().all()
+    if len(accepted) != len(ride_ids):
+        db.rollback()
+        pooling_index.remove_many(set(ride_ids) - set(accepted))
+        raise conflict("Some rides in this trip have already been accepted by another driver")
+    
+    db.commit()
+    pooling_index.remove_many(ride_ids)
+    rides = db.query(IntercityRide).filter(IntercityRide.id.in_(ride_ids)).order_by(IntercityRide.id).all()
+    
+    return {
+        "message": f"Pooled trip of {len(rides)} rides accepted successfully",
+        "rides": [IntercityRideResponse.model_validate(ride) for ride in rides]
+    }
 
 @router.patch("/rides/{ride_id}/accept")
 async def accept_intercity_ride(
@@ -213,10 +303,19 @@ async def accept_intercity_ride(
             detail="Ride is not available"
         )
     
-    ride.driver_id = current_user.id
-    ride.status = RideStatus.ACCEPTED
+    accepted = transition(
+        db, IntercityRide, ride.id, RideStatus.PENDING,
+        IntercityRide.driver_id == None,
+        driver_id=current_user.id,
+        status=RideStatus.ACCEPTED
+    )
+    if not accepted:
+        db.rollback()
+        pooling_index.remove(ride.id)
+        raise conflict("Intercity ride has already been accepted by another driver")
     
     db.commit()
+    pooling_index.remove(ride.id)
     db.refresh(ride)
     
     return {"message": "Intercity ride accepted successfully", "ride": ride}
@@ -1,87 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, update, func, select, union_all
 from typing import List, Optional
-import math
 from datetime import datetime
 
 from app.database import get_db
-from app.models import User, Ride, DriverProfile, RideStatus, UserRole
-from app.schemas import RideCreate, RideResponse, RideUpdate, RideRating, LocationUpdate
+from app.config import settings
+from app.models import User, Ride, RideArchive, DriverProfile, RideStatus, UserRole
+from app.schemas import (
+    RideCreate, RideResponse, RideUpdate, RideRating,
+    FareQuoteRequest, FareQuoteResponse
+)
 from app.auth import get_current_active_user
-from app.websocket import manager
+from app.outbox import add_event, outbox_relay
+from app.fares import RIDE_TARIFFS, estimate_duration_minutes, quote_batch
+from app.geo import haversine_km, driver_index, bounding_box
+from app.surge import surge_engine
+from app.ride_state import transition, conflict, ride_request_payload
+from app.loyalty import record_ride_points
+from app.analytics import record_rides_created
+from app.archive import find_ride, with_archive
+from app.scheduler import ride_scheduler, as_utc, naive_utc, utcnow
+from app.metrics import ride_dispatch_duration
+from app.serialization import RowSerializer, stream_ndjson
 
 router = APIRouter()
 
-def calculate_fare(distance_km: float, vehicle_type: str) -> float:
-    """Calculate ride fare based on distance and vehicle type"""
-    base_fare = {
-        "economy": 50,
-        "premium": 100,
-        "suv": 120,
-        "luxury": 200
-    }
-    
-    per_km_rate = {
-        "economy": 10,
-        "premium": 15,
-        "suv": 18,
-        "luxury": 25
-    }
-    
-    base = base_fare.get(vehicle_type, 50)
-    rate = per_km_rate.get(vehicle_type, 10)
-    
-    return base + (distance_km * rate)
+ride_serializer = RowSerializer(RideResponse, Ride)
+
+def calculate_fare(distance_km: float, vehicle_type: str, surge_multiplier: float = 1.0) -> float:
+    """Calculate ride fare based on distance, vehicle type and current surge"""
+    return RIDE_TARIFFS.price(distance_km, vehicle_type, surge_multiplier)
 
 def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Calculate distance between two coordinates using Haversine formula"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
-
-def find_nearby_drivers(db: Session, pickup_lat: float, pickup_lng: float, max_distance_km: float = 3.0) -> List[User]:
-    """Find drivers within specified distance of pickup location"""
-    # Get all available drivers with location data
-    drivers = db.query(User).join(DriverProfile).filter(
-        and_(
-            User.role == UserRole.DRIVER,
-            User.is_active == True,
-            DriverProfile.is_available == True,
-            DriverProfile.current_lat != None,
-            DriverProfile.current_lng != None
-        )
-    ).all()
-    
-    nearby_drivers = []
-    for driver in drivers:
-        if driver.driver_profile and driver.driver_profile.current_lat is not None and driver.driver_profile.current_lng is not None:
-            try:
-                distance = calculate_distance(
-                    pickup_lat, pickup_lng,
-                    float(driver.driver_profile.current_lat),
-                    float(driver.driver_profile.current_lng)
-                )
-                if distance <= max_distance_km:
-                    nearby_drivers.append(driver)
-            except (ValueError, TypeError) as e:
-                print(f"Error calculating distance for driver {driver.id}: {e}")
-                continue
-    
-    print(f"Found {len(nearby_drivers)} nearby drivers for pickup at ({pickup_lat}, {pickup_lng})")
-    for driver in nearby_drivers:
-        print(f"  Driver {driver.id} at ({driver.driver_profile.current_lat}, {driver.driver_profile.current_lng})")
-    
-    return nearby_drivers
-
+    return haversine_km(lat1, lng1, lat2, lng2)
 
 @router.post("/", response_model=RideResponse, status_code=status.HTTP_201_CREATED)
 async def create_ride(
@@ -102,11 +55,16 @@ async def create_ride(
         float(ride_data.destination_lat), float(ride_data.destination_lng)
     )
     
-    # Calculate estimated fare
-    estimated_fare = calculate_fare(distance, ride_data.vehicle_type.value)
+    # Calculate estimated fare with the surge multiplier of the pickup area
+    surge_multiplier = surge_engine.multiplier_at(float(ride_data.pickup_lat), float(ride_data.pickup_lng))
+    estimated_fare = calculate_fare(distance, ride_data.vehicle_type.value, surge_multiplier)
     
     # Estimate duration (assuming average speed of 40 km/h)
-    duration = int((distance / 40) * 60)
+    duration = estimate_duration_minutes(distance)
+    
+    # Rides booked for later wait as SCHEDULED until the scheduler releases them
+    scheduled_time = as_utc(ride_data.scheduled_time) if ride_data.scheduled_time else None
+    is_scheduled = ride_scheduler.needs_scheduling(scheduled_time)
     
     new_ride = Ride(
         rider_id=current_user.id,
@@ -120,98 +78,115 @@ async def create_ride(
         distance_km=distance,
         duration_minutes=duration,
         estimated_fare=estimated_fare,
-        scheduled_time=ride_data.scheduled_time
+        surge_multiplier=surge_multiplier,
+        status=RideStatus.SCHEDULED if is_scheduled else RideStatus.PENDING,
+        scheduled_time=naive_utc(scheduled_time) if scheduled_time else None
     )
     
     db.add(new_ride)
-    db.commit()
-    db.refresh(new_ride)
-    
-    # Find nearby drivers within 3km
-    print(f"=== FINDING NEARBY DRIVERS FOR RIDE {new_ride.id} ===")
-    print(f"Pickup location: ({ride_data.pickup_lat}, {ride_data.pickup_lng})")
-    nearby_drivers = find_nearby_drivers(
-        db, 
-        float(ride_data.pickup_lat), 
-        float(ride_data.pickup_lng), 
-        max_distance_km=3.0
+    db.flush()
+    record_rides_created(db, [new_ride])
+    
+    if is_scheduled:
+        db.commit()
+        db.refresh(new_ride)
+        ride_scheduler.schedule(new_ride.id, scheduled_time)
+        print(f"Ride {new_ride.id} scheduled for {scheduled_time.isoformat()}")
+        return new_ride
+    
+    # Available drivers within the dispatch radius, from the in-memory location index
+    nearby_drivers = driver_index.nearby(
+        float(ride_data.pickup_lat), float(ride_data.pickup_lng), settings.ride_dispatch_radius_km
     )
-    print(f"Found {len(nearby_drivers)} nearby drivers")
     
-    # Send WebSocket notification to nearby drivers
+    # Record the notification in the same transaction as the ride; None broadcasts
+    # to everyone connected as a fallback when nobody is nearby
     if nearby_drivers:
-        print(f"Sending notifications to {len(nearby_drivers)} drivers")
-        notification_sent = False
-        for driver in nearby_drivers:
-            # Refresh the driver to get actual values
-            db.refresh(driver)
-            try:
-                print(f"Sending WebSocket message to driver {driver.id}")
-                await manager.send_personal_message({
-                    "type": "new_ride_request",
-                    "ride_id": new_ride.id,
-                    "pickup_address": new_ride.pickup_address,
-                    "destination_address": new_ride.destination_address,
-                    "distance_km": round(float(new_ride.distance_km or 0), 2),
-                    "estimated_fare": round(float(new_ride.estimated_fare or 0), 2),
-                    "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type is not None else "economy"
-                }, int(driver.id) if driver.id is not None else 0)
-                print(f"Successfully sent WebSocket message to driver {driver.id}")
-                notification_sent = True
-            except Exception as e:
-                print(f"Failed to send WebSocket message to driver {driver.id}: {e}")
-        
-        if not notification_sent:
-            print("WARNING: No notifications were successfully sent to drivers!")
+        print(f"Queueing ride {new_ride.id} for {len(nearby_drivers)} nearby drivers")
+        driver_ids = [driver.driver_id for driver in nearby_drivers]
     else:
-        print("No nearby drivers found to notify")
-        # As a fallback, let's also broadcast to all connected drivers
-        try:
-            print("Broadcasting ride request to all connected drivers as fallback")
-            await manager.broadcast({
-                "type": "new_ride_request",
-                "ride_id": new_ride.id,
-                "pickup_address": new_ride.pickup_address,
-                "destination_address": new_ride.destination_address,
-                "distance_km": round(float(new_ride.distance_km or 0), 2),
-                "estimated_fare": round(float(new_ride.estimated_fare or 0), 2),
-                "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type is not None else "economy"
-            })
-            print("Broadcast message sent to all connected drivers")
-        except Exception as e:
-            print(f"Failed to broadcast ride request: {e}")
+        print("No nearby drivers found, queueing broadcast to all connected drivers")
+        driver_ids = None
+    add_event(db, "new_ride_request", ride_request_payload(new_ride), driver_ids)
+    
+    db.commit()
+    db.refresh(new_ride)
+    outbox_relay.wake()
+    surge_engine.ride_requested(new_ride.pickup_lat, new_ride.pickup_lng)
     
     return new_ride
 
+@router.post("/quote", response_model=FareQuoteResponse)
+async def quote_rides(
+    quote_request: FareQuoteRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Price many trips at once without creating rides.
+
+    Items without a vehicle_type are quoted for every vehicle class, so the booking
+    screen can show all options with one request.
+    """
+    multipliers = [
+        surge_engine.multiplier_at(item.pickup_lat, item.pickup_lng)
+        for item in quote_request.items
+    ]
+    quotes = quote_batch([
+        (item.pickup_lat, item.pickup_lng, item.destination_lat, item.destination_lng, item.vehicle_type)
+        for item in quote_request.items
+    ], multipliers=multipliers)
+    return {
+        "results": [
+            {
+                "distance_km": round(quote.distance_km, 2),
+                "duration_minutes": quote.duration_minutes,
+                "surge_multiplier": multiplier,
+                "quotes": [
+                    {"vehicle_type": vehicle_type, "estimated_fare": round(fare, 2)}
+                    for vehicle_type, fare in quote.fares
+                ]
+            }
+            for quote, multiplier in zip(quotes, multipliers)
+        ]
+    }
+
 @router.get("/", response_model=List[RideResponse])
 async def get_rides(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    include_archived: bool = False
 ):
-    """Get rides for current user"""
-    query = db.query(Ride)
-    
-    if current_user.role.value == UserRole.RIDER.value:
-        query = query.filter(Ride.rider_id == current_user.id)
-    elif current_user.role.value == UserRole.DRIVER.value:
-        # For drivers, show their assigned rides (accepted, in_progress, completed)
-        # and pending rides that they can accept
-        query = query.filter(
-            or_(
-                Ride.driver_id == current_user.id,
-                and_(
-                    Ride.status == RideStatus.PENDING,
-                    Ride.driver_id == None
+    """Get rides for current user; format=ndjson streams one ride per line.
+
+    Completed and cancelled rides unchanged for ``ride_archive_after_days`` are only
+    listed with include_archived=true.
+    """
+    def rides_of(model):
+        statement = select(*ride_serializer.columns(model))
+        if current_user.role.value == UserRole.RIDER.value:
+            statement = statement.where(model.rider_id == current_user.id)
+        elif current_user.role.value == UserRole.DRIVER.value:
+            # For drivers, show their assigned rides (accepted, in_progress, completed)
+            # and pending rides that they can accept
+            statement = statement.where(
+                or_(
+                    model.driver_id == current_user.id,
+                    and_(
+                        model.status == RideStatus.PENDING,
+                        model.driver_id == None
+                    )
                 )
             )
-        )
-    
-    if status:
-        query = query.filter(Ride.status == status)
-    
-    rides = query.order_by(Ride.created_at.desc()).all()
-    return rides
+        if status:
+            statement = statement.where(model.status == status)
+        return statement
+    
+    statement = with_archive(rides_of) if include_archived else rides_of(Ride)
+    statement = statement.order_by(statement.selected_columns.created_at.desc())
+    if format == "ndjson":
+        return stream_ndjson(statement, ride_serializer.row)
+    return ride_serializer.response(db.execute(statement).all())
 
 @router.get("/available", response_model=List[RideResponse])
 async def get_available_rides(
@@ -275,35 +250,23 @@ async def get_available_rides(
         print(f"Current lng: {driver_profile.current_lng}")
         return []  # Return empty list if driver location is not set
     
-    # Get rides within 3km of driver's current location
-    rides_query = db.query(Ride).filter(
+    # Pending rides within the dispatch radius; the bounding box keeps the scan to nearby rows
+    driver_lat, driver_lng = float(driver_profile.current_lat), float(driver_profile.current_lng)
+    radius_km = settings.ride_dispatch_radius_km
+    min_lat, max_lat, min_lng, max_lng = bounding_box(driver_lat, driver_lng, radius_km)
+    candidates = db.query(Ride).filter(
         Ride.status == RideStatus.PENDING,
-        Ride.driver_id == None
-    )
-    
-    print(f"Total pending rides in system: {rides_query.count()}")
+        Ride.driver_id == None,
+        Ride.pickup_lat.between(min_lat, max_lat),
+        Ride.pickup_lng.between(min_lng, max_lng)
+    ).all()
+    rides = [
+        ride for ride in candidates
+        if calculate_distance(float(ride.pickup_lat), float(ride.pickup_lng), driver_lat, driver_lng) <= radius_km
+    ]
     
-    rides = []
-    for ride in rides_query.all():
-        try:
-            print(f"Checking ride {ride.id}: pickup ({ride.pickup_lat}, {ride.pickup_lng})")
-            distance = calculate_distance(
-                float(ride.pickup_lat), float(ride.pickup_lng),
-                float(driver_profile.current_lat), float(driver_profile.current_lng)
-            )
-            print(f"Distance to ride {ride.id}: {distance} km")
-            if distance <= 3.0:  # Within 3km
-                rides.append(ride)
-                print(f"Ride {ride.id} added to available list")
-        except Exception as e:
-            print(f"Error calculating distance for ride {ride.id}: {e}")
-            continue
-    
-    print(f"Found {len(rides)} available rides within 3km")
-    for ride in rides:
-        print(f"  Ride {ride.id}: {ride.pickup_address} -> {ride.destination_address}")
-    print("=== END GET AVAILABLE RIDES DEBUG ===")
-    return rides
+    print(f"Found {len(rides)} available rides within {radius_km} km")
+    return ride_serializer.response(rides)
 
 @router.get("/{ride_id}", response_model=RideResponse)
 async def get_ride(
@@ -311,8 +274,8 @@ async def get_ride(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get a specific ride"""
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
+    """Get a specific ride, archived or not"""
+    ride = find_ride(db, ride_id)
     
     if not ride:
         raise HTTPException(
@@ -351,6 +314,10 @@ async def update_ride(
             detail="Ride not found"
         )
     
+    other_driver_ids = []
+    previous_status = ride.status
+    new_status = None
+    
     # Handle driver accepting ride
     print(f"=== DEBUG RIDE UPDATE ===")
     print(f"Ride update status: {ride_update.status}")
@@ -369,9 +336,24 @@ async def update_ride(
             print("User is a driver")
             if ride.status == RideStatus.PENDING:
                 print("Ride is pending, accepting ride")
-                ride.driver_id = current_user.id
-                ride.status = RideStatus.ACCEPTED
-                print(f"Ride accepted. Driver ID: {ride.driver_id}, Status: {ride.status}")
+                accepted = transition(
+                    db, Ride, ride.id, RideStatus.PENDING,
+                    Ride.driver_id == None,
+                    driver_id=current_user.id,
+                    status=RideStatus.ACCEPTED
+                )
+                if not accepted:
+                    db.rollback()
+                    raise conflict("Ride has already been accepted by another driver")
+                print(f"Ride accepted. Driver ID: {current_user.id}")
+                new_status = RideStatus.ACCEPTED
+                if ride.created_at is not None and ride.scheduled_time is None:
+                    ride_dispatch_duration.observe(
+                        max((utcnow() - as_utc(ride.created_at)).total_seconds(), 0.0), "accepted"
+                    )
+            elif ride.status == RideStatus.ACCEPTED and ride.driver_id != current_user.id:
+                # Lost the race before even reading the ride: same answer as losing it in the UPDATE
+                raise conflict("Ride has already been accepted by another driver")
             else:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -390,9 +372,17 @@ async def update_ride(
             print("User is the assigned driver")
             if ride.status == RideStatus.ACCEPTED:
                 print("Ride is accepted, starting ride")
-                ride.status = RideStatus.IN_PROGRESS
-                ride.started_at = datetime.utcnow()
-                print(f"Ride started. Status: {ride.status}")
+                started = transition(
+                    db, Ride, ride.id, RideStatus.ACCEPTED,
+                    Ride.driver_id == current_user.id,
+                    status=RideStatus.IN_PROGRESS,
+                    started_at=datetime.utcnow()
+                )
+                if not started:
+                    db.rollback()
+                    raise conflict("Ride status changed before it could be started")
+                print("Ride started")
+                new_status = RideStatus.IN_PROGRESS
             else:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -411,20 +401,31 @@ async def update_ride(
             print("User is the assigned driver")
             if ride.status == RideStatus.IN_PROGRESS:
                 print("Ride is in progress, completing ride")
-                ride.status = RideStatus.COMPLETED
-                ride.completed_at = datetime.utcnow()
                 if ride_update.final_fare:
-                    ride.final_fare = float(ride_update.final_fare)
+                    final_fare = float(ride_update.final_fare)
                 else:
-                    ride.final_fare = float(ride.estimated_fare)
+                    final_fare = float(ride.estimated_fare)
+                completed = transition(
+                    db, Ride, ride.id, RideStatus.IN_PROGRESS,
+                    Ride.driver_id == current_user.id,
+                    status=RideStatus.COMPLETED,
+                    completed_at=datetime.utcnow(),
+                    final_fare=final_fare
+                )
+                if not completed:
+                    db.rollback()
+                    raise conflict("Ride status changed before it could be completed")
                 
-                # Update driver stats
-                driver_profile = db.query(DriverProfile).filter(
-                    DriverProfile.user_id == current_user.id
-                ).first()
-                if driver_profile:
-                    driver_profile.total_rides = int(driver_profile.total_rides) + 1
-                print(f"Ride completed. Status: {ride.status}")
+                # Update driver stats in the same transaction, without a read-modify-write
+                db.execute(
+                    update(DriverProfile)
+                    .where(DriverProfile.user_id == current_user.id)
+                    .values(total_rides=func.coalesce(DriverProfile.total_rides, 0) + 1)
+                )
+                # Rider loyalty points are applied later in batches from the ledger
+                record_ride_points(db, ride.id, int(ride.rider_id), final_fare)
+                print("Ride completed")
+                new_status = RideStatus.COMPLETED
             else:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -441,10 +442,17 @@ async def update_ride(
         print("Processing ride cancellation/rejection")
         if current_user.role == UserRole.RIDER and str(ride.rider_id) == str(current_user.id):
             print("User is the rider")
-            if ride.status in [RideStatus.PENDING, RideStatus.ACCEPTED]:
+            if ride.status in [RideStatus.SCHEDULED, RideStatus.PENDING, RideStatus.ACCEPTED]:
                 print("Ride can be cancelled")
-                ride.status = RideStatus.CANCELLED
-                print(f"Ride cancelled. Status: {ride.status}")
+                cancelled = transition(
+                    db, Ride, ride.id, ride.status,
+                    status=RideStatus.CANCELLED
+                )
+                if not cancelled:
+                    db.rollback()
+                    raise conflict("Ride status changed before it could be cancelled")
+                print("Ride cancelled")
+                new_status = RideStatus.CANCELLED
             else:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -454,32 +462,27 @@ async def update_ride(
             print("User is the driver")
             if ride.status == RideStatus.ACCEPTED:
                 print("Driver rejecting ride")
-                ride.status = RideStatus.PENDING
-                ride.driver_id = None
-                print(f"Ride rejected. Status: {ride.status}, Driver ID: {ride.driver_id}")
+                rejected = transition(
+                    db, Ride, ride.id, RideStatus.ACCEPTED,
+                    Ride.driver_id == current_user.id,
+                    status=RideStatus.PENDING,
+                    driver_id=None
+                )
+                if not rejected:
+                    db.rollback()
+                    raise conflict("Ride status changed before it could be rejected")
+                print("Ride rejected and returned to the pending pool")
+                new_status = RideStatus.PENDING
                 
                 # Notify other nearby drivers about the ride becoming available again
-                nearby_drivers = find_nearby_drivers(
-                    db, 
-                    float(ride.pickup_lat), 
-                    float(ride.pickup_lng), 
-                    max_distance_km=3.0
+                nearby_drivers = driver_index.nearby(
+                    float(ride.pickup_lat), float(ride.pickup_lng), settings.ride_dispatch_radius_km
                 )
                 
-                for driver in nearby_drivers:
-                    if str(driver.id) != str(current_user.id):  # Don't notify the rejecting driver
-                        try:
-                            await manager.send_personal_message({
-                                "type": "new_ride_request",
-                                "ride_id": ride.id,
-                                "pickup_address": ride.pickup_address,
-                                "destination_address": ride.destination_address,
-                                "distance_km": round(float(ride.distance_km or 0), 2),
-                                "estimated_fare": round(float(ride.estimated_fare or 0), 2),
-                                "vehicle_type": ride.vehicle_type.value if ride.vehicle_type is not None else "economy"
-                            }, int(driver.id) if driver.id is not None else 0)
-                        except Exception as e:
-                            print(f"Failed to send WebSocket message to driver {driver.id}: {e}")
+                other_driver_ids = [
+                    driver.driver_id for driver in nearby_drivers
+                    if driver.driver_id != current_user.id  # Don't notify the rejecting driver
+                ]
             else:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -491,16 +494,24 @@ async def update_ride(
                 detail="Not authorized to cancel/reject this ride"
             )
     
+    # Record notifications in the same transaction as the transition
+    if other_driver_ids:
+        add_event(db, "new_ride_request", ride_request_payload(ride), other_driver_ids)
+    if new_status is not None:
+        add_event(db, "ride_status_update", {
+            "ride_id": ride.id,
+            "status": new_status.value
+        }, [int(ride.rider_id)], notify_email=ride.rider.email)
+    
     db.commit()
     db.refresh(ride)
+    outbox_relay.wake()
     
-    # Send WebSocket notification to rider
-    if ride_update.status in [RideStatus.ACCEPTED, RideStatus.IN_PROGRESS, RideStatus.COMPLETED, RideStatus.CANCELLED]:
-        await manager.send_personal_message({
-            "type": "ride_status_update",
-            "ride_id": ride.id,
-            "status": str(ride.status)
-        }, int(ride.rider_id) if ride.rider_id is not None else 0)
+    # Keep the surge engine's pending-ride counts in step
+    if previous_status == RideStatus.PENDING and new_status in [RideStatus.ACCEPTED, RideStatus.CANCELLED]:
+        surge_engine.ride_resolved(ride.pickup_lat, ride.pickup_lng)
+    elif new_status == RideStatus.PENDING:
+        surge_engine.ride_pending(ride.pickup_lat, ride.pickup_lng)
     
     return ride
 
@@ -515,6 +526,11 @@ async def rate_ride(
     ride = db.query(Ride).filter(Ride.id == ride_id).first()
     
     if not ride:
+        if db.get(RideArchive, ride_id) is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Archived rides can no longer be rated"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ride not found"
@@ -526,7 +542,7 @@ async def rate_ride(
             detail="Not authorized to rate this ride"
         )
     
-    if str(ride.status) != RideStatus.COMPLETED.value:
+    if ride.status != RideStatus.COMPLETED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Can only rate completed rides"
@@ -535,25 +551,22 @@ async def rate_ride(
     ride.rating = int(str(rating_data.rating))
     ride.feedback = rating_data.feedback
     
-    # Update driver rating
+    # Update driver rating: the average over live and archived rides is computed
+    # in the database, in the same UPDATE
     if ride.driver_id is not None:
-        driver_profile = db.query(DriverProfile).filter(
-            DriverProfile.user_id == ride.driver_id
-        ).first()
-        if driver_profile:
-            # Calculate new average rating
-            total_rated_rides = db.query(Ride).filter(
-                Ride.driver_id == ride.driver_id,
-                Ride.rating != None
-            ).count()
-            
-            total_rating = db.query(Ride).filter(
-                Ride.driver_id == ride.driver_id,
-                Ride.rating != None
-            ).with_entities(Ride.rating).all()
-            
-            avg_rating = sum([int(str(r[0])) for r in total_rating]) / total_rated_rides if total_rated_rides > 0 else 5.0
-            driver_profile.rating = float(str(round(avg_rating, 2)))
+        db.flush()
+        ratings = union_all(*[
+            select(model.rating).where(model.driver_id == ride.driver_id, model.rating != None)
+            for model in (Ride, RideArchive)
+        ]).subquery()
+        average = select(
+            func.coalesce(func.round(func.avg(ratings.c.rating), 2), 5.0)
+        ).scalar_subquery()
+        db.execute(
+            update(DriverProfile)
+            .where(DriverProfile.user_id == ride.driver_id)
+            .values(rating=average)
+        )
     
     db.commit()
     db.refresh(ride)
@@ -583,15 +596,25 @@ async def cancel_ride(
         )
     
     # Check if the ride is in a cancellable state
-    if str(ride.status) in [RideStatus.COMPLETED.value, RideStatus.CANCELLED.value]:
+    if ride.status in [RideStatus.COMPLETED, RideStatus.CANCELLED]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot cancel this ride"
         )
     
-    # Cancel the ride
-    ride.status = RideStatus.CANCELLED.value
+    # Cancel the ride; the UPDATE syncs ride.status, so read the old one first
+    previous_status = ride.status
+    cancelled = transition(
+        db, Ride, ride.id, previous_status,
+        status=RideStatus.CANCELLED
+    )
+    if not cancelled:
+        db.rollback()
+        raise conflict("Ride status changed before it could be cancelled")
     db.commit()
+    
+    if previous_status == RideStatus.PENDING:
+        surge_engine.ride_resolved(ride.pickup_lat, ride.pickup_lng)
 
     return None
 
@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, or_, update
 from typing import List
 
 from app.database import get_db
 from app.models import User, DriverProfile, UserRole, Ride, RideStatus
 from app.schemas import UserResponse, DriverProfileResponse, DriverWithProfile, LocationUpdate
 from app.auth import get_current_active_user
-from app.websocket import manager
+from app.events import dispatcher, DomainEvent
+from app.surge import surge_engine
+from app.serialization import RowSerializer, dumps, json_response
 
 router = APIRouter()
 
+user_serializer = RowSerializer(UserResponse, User)
+profile_serializer = RowSerializer(DriverProfileResponse, DriverProfile)
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     """Get current user information"""
@@ -51,26 +56,21 @@ async def get_drivers(
     available_only: bool = False
 ):
     """Get list of drivers"""
-    query = db.query(User).filter(User.role == UserRole.DRIVER)
-    drivers = query.all()
+    # One outer join instead of a profile query per driver
+    query = db.query(User, DriverProfile).outerjoin(
+        DriverProfile, DriverProfile.user_id == User.id
+    ).filter(User.role == UserRole.DRIVER)
+    if available_only:
+        # Drivers without a profile have always been listed
+        query = query.filter(or_(DriverProfile.id == None, DriverProfile.is_available == True))
     
     result = []
-    for driver in drivers:
-        driver_profile = db.query(DriverProfile).filter(
-            DriverProfile.user_id == driver.id
-        ).first()
-        
-        if available_only and driver_profile and not driver_profile.is_available:
-            continue
-        
-        driver_dict = UserResponse.from_orm(driver).dict()
-        if driver_profile:
-            driver_dict['driver_profile'] = DriverProfileResponse.from_orm(driver_profile).dict()
-        else:
-            driver_dict['driver_profile'] = None
+    for driver, driver_profile in query.order_by(User.id).all():
+        driver_dict = user_serializer.row(driver)
+        driver_dict['driver_profile'] = profile_serializer.row(driver_profile) if driver_profile else None
         result.append(driver_dict)
     
-    return result
+    return json_response(dumps(result))
 
 @router.patch("/driver/location", response_model=UserResponse)
 async def update_driver_location(
@@ -85,43 +85,45 @@ async def update_driver_location(
             detail="Only drivers can update their location"
         )
     
-    # Get or create driver profile
-    driver_profile = db.query(DriverProfile).filter(
-        DriverProfile.user_id == current_user.id
+    # Update the position in place and read back what the surge engine needs
+    profile = db.execute(
+        update(DriverProfile)
+        .where(DriverProfile.user_id == current_user.id)
+        .values(current_lat=location_data.lat, current_lng=location_data.lng)
+        .returning(DriverProfile.is_available, DriverProfile.rating)
     ).first()
     
-    if not driver_profile:
+    if profile is None:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Driver profile not found"
         )
     
-    # Update location
-    driver_profile.current_lat = location_data.lat
-    driver_profile.current_lng = location_data.lng
-    
-    db.commit()
-    db.refresh(driver_profile)
-    db.refresh(current_user)
-    
-    # Send WebSocket update to all riders with active rides with this driver
-    active_rides = db.query(Ride).filter(
+    # Riders of this driver's active rides get the new position
+    active_rides = db.query(Ride.id, Ride.rider_id).filter(
         and_(
             Ride.driver_id == current_user.id,
             Ride.status.in_([RideStatus.ACCEPTED, RideStatus.IN_PROGRESS])
         )
     ).all()
     
-    for ride in active_rides:
-        # Send location update to rider
-        await manager.send_personal_message({
-            "type": "driver_location_update",
-            "ride_id": ride.id,
+    # Serialize before the commit expires current_user, instead of reloading it
+    response = UserResponse.model_validate(current_user)
+    db.commit()
+    
+    if profile.is_available:
+        surge_engine.driver_moved(current_user.id, location_data.lat, location_data.lng, profile.rating)
+    
+    for ride_id, rider_id in active_rides:
+        # Queue location update for the rider
+        dispatcher.publish(DomainEvent("driver_location_update", {
+            "ride_id": ride_id,
             "lat": location_data.lat,
             "lng": location_data.lng
-        }, int(ride.rider_id))
+        }, [int(rider_id)]))
     
-    return current_user
+    return response
 
 @router.patch("/driver/availability", response_model=UserResponse)
 async def toggle_driver_availability(
@@ -168,6 +170,12 @@ async def toggle_driver_availability(
         db.refresh(driver_profile)
         db.refresh(current_user)
         print(f"Driver {current_user.id} availability toggled to: {driver_profile.is_available}")
+        if driver_profile.is_available and driver_profile.current_lat is not None and driver_profile.current_lng is not None:
+            surge_engine.driver_moved(
+                current_user.id, driver_profile.current_lat, driver_profile.current_lng, driver_profile.rating
+            )
+        else:
+            surge_engine.driver_offline(current_user.id, driver_profile.current_lat, driver_profile.current_lng)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List
+from sqlalchemy.orm.exc import StaleDataError
+from typing import List, Tuple
 import random
 import string
 from datetime import datetime
 
 from app.database import get_db
-from app.models import User, Vacation, LoyaltyPoints, UserRole, DriverProfile
+from app.config import settings
+from app.models import User, Vacation, LoyaltyPoints, UserRole, Ride, RideStatus
 from app.schemas import VacationCreate, VacationResponse
 from app.auth import get_current_active_user
+from app.outbox import add_event, outbox_relay
+from app.geo import driver_index, best_drivers
+from app.loyalty import accrue, points_for, tier_for, tier_table, TIER_BENEFITS, CURRENCY_PER_POINT
+from app.refdata import ReferenceData
+from app.ride_state import conflict
+from app.vacation_plans import vacation_response, vacation_columns, vacation_item, vacations_response, to_json
+from app.serialization import stream_ndjson
 
 router = APIRouter()
 
@@ -47,6 +55,19 @@ def calculate_vacation_price(
     
     return total
 
+# Where vacation trips start when the rider has no ride history (Bangalore)
+DEFAULT_PICKUP = (12.9716, 77.5946)
+
+def vacation_pickup_point(db: Session, user_id: int) -> Tuple[float, float]:
+    """The rider's most recent pickup location, or the default city"""
+    last_pickup = db.query(Ride.pickup_lat, Ride.pickup_lng).filter(
+        Ride.rider_id == user_id,
+        Ride.status != RideStatus.SCHEDULED  # booked ahead, not where the rider is now
+    ).order_by(Ride.created_at.desc()).first()
+    if last_pickup and last_pickup[0] is not None and last_pickup[1] is not None:
+        return float(last_pickup[0]), float(last_pickup[1])
+    return DEFAULT_PICKUP
+
 @router.post("/", response_model=VacationResponse, status_code=status.HTTP_201_CREATED)
 async def create_vacation(
     vacation_data: VacationCreate,
@@ -111,14 +132,43 @@ async def create_vacation(
         booking_reference=booking_ref,
         status="pending",
         # New fields for automated schedule-based trip planner
-        schedule=vacation_data.schedule,
-        flight_details=vacation_data.flight_details,
-        activities=vacation_data.activities,
-        meal_preferences=vacation_data.meal_preferences
+        schedule=to_json(vacation_data.schedule),
+        flight_details=to_json(vacation_data.flight_details),
+        activities=to_json(vacation_data.activities),
+        meal_preferences=to_json(vacation_data.meal_preferences)
     )
     
     try:
         db.add(new_vacation)
+        db.flush()
+        
+        # Offer the booking to the best drivers around where the trip starts
+        pickup_lat, pickup_lng = vacation_pickup_point(db, current_user.id)
+        drivers = best_drivers(
+            driver_index.nearby(pickup_lat, pickup_lng, settings.vacation_notify_radius_km),
+            settings.vacation_notify_top_k,
+            settings.vacation_notify_radius_km,
+            settings.vacation_notify_rating_weight
+        )
+        print(f"Notifying {len(drivers)} drivers near ({pickup_lat}, {pickup_lng})")
+        
+        # The notification is committed together with the booking
+        if drivers:
+            add_event(db, "new_vacation_request", {
+                "vacation_id": new_vacation.id,
+                "destination": new_vacation.destination,
+                "hotel_name": new_vacation.hotel_name,
+                "start_date": new_vacation.start_date.isoformat(),
+                "end_date": new_vacation.end_date.isoformat(),
+                "total_price": float(new_vacation.total_price),
+                "passengers": new_vacation.passengers
+            }, [driver.driver_id for driver in drivers])
+        
+        # Loyalty points are earned atomically with the booking
+        points_earned = points_for(total_price)
+        if accrue(db, current_user.id, points_earned):
+            print(f"Added {points_earned} loyalty points for user {current_user.id}")
+        
         db.commit()
         db.refresh(new_vacation)
         print(f"Vacation booking created successfully with ID: {new_vacation.id}")
@@ -129,80 +179,19 @@ async def create_vacation(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create vacation booking: {str(e)}"
         )
+    outbox_relay.wake()
     
-    # Add loyalty points
-    try:
-        loyalty = db.query(LoyaltyPoints).filter(LoyaltyPoints.user_id == current_user.id).first()
-        if loyalty:
-            points_earned = int(total_price / 100)  # 1 point per 100 currency
-            loyalty.total_points = loyalty.total_points + points_earned
-            
-            # Update tier
-            if loyalty.total_points >= 10000:
-                loyalty.tier = "platinum"
-            elif loyalty.total_points >= 5000:
-                loyalty.tier = "gold"
-            elif loyalty.total_points >= 1000:
-                loyalty.tier = "silver"
-            
-            db.commit()
-            print(f"Loyalty points updated. New total: {loyalty.total_points}")
-    except Exception as e:
-        print(f"Failed to update loyalty points: {e}")
-        # Don't fail the booking if loyalty points can't be updated
-        pass
-    
-    # Send WebSocket notification to nearby drivers
-    try:
-        from app.websocket import manager
-        from app.routers.rides import find_nearby_drivers
-        # For simplicity, we'll notify all available drivers
-        # Get the user's location from their profile or first ride
-        default_lat = 12.9716  # Bangalore
-        default_lng = 77.5946
-        
-        # Try to get user's location from their profile or first ride
-        drivers = db.query(User).join(DriverProfile).filter(
-            and_(
-                User.role == UserRole.DRIVER,
-                User.is_active == True,
-                DriverProfile.is_available == True,
-                DriverProfile.current_lat != None,
-                DriverProfile.current_lng != None
-            )
-        ).all()
-        
-        print(f"Found {len(drivers)} available drivers to notify")
-        
-        # Send WebSocket notification to nearby drivers
-        for driver in drivers:
-            try:
-                await manager.send_personal_message({
-                    "type": "new_vacation_request",
-                    "vacation_id": new_vacation.id,
-                    "destination": new_vacation.destination,
-                    "hotel_name": new_vacation.hotel_name,
-                    "start_date": new_vacation.start_date.isoformat(),
-                    "end_date": new_vacation.end_date.isoformat(),
-                    "total_price": float(new_vacation.total_price),
-                    "passengers": new_vacation.passengers
-                }, int(driver.id) if driver.id is not None else 0)
-                print(f"Sent vacation request notification to driver {driver.id}")
-            except Exception as e:
-                print(f"Failed to send WebSocket message to driver {driver.id}: {e}")
-    except Exception as e:
-        print(f"Failed to send WebSocket notifications: {e}")
-    
-    return new_vacation
+    return vacation_response(new_vacation)
 
 @router.get("/", response_model=List[VacationResponse])
 async def get_vacations(
     status: str = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get user's vacation bookings"""
-    query = db.query(Vacation)
+    """Get user's vacation bookings; format=ndjson streams one booking per line"""
+    query = db.query(*vacation_columns())
     
     if status:
         query = query.filter(Vacation.status == status)
@@ -217,8 +206,10 @@ async def get_vacations(
         # Regular users see their own bookings
         query = query.filter(Vacation.user_id == current_user.id)
     
-    vacations = query.order_by(Vacation.created_at.desc()).all()
-    return vacations
+    query = query.order_by(Vacation.created_at.desc())
+    if format == "ndjson":
+        return stream_ndjson(query.statement, vacation_item)
+    return vacations_response(query.all())
 
 @router.get("/available", response_model=List[VacationResponse])
 async def get_available_vacations(
@@ -232,11 +223,11 @@ async def get_available_vacations(
             detail="Only drivers can view available vacation bookings"
         )
     
-    vacations = db.query(Vacation).filter(
+    vacations = db.query(*vacation_columns()).filter(
         Vacation.status == "pending"
     ).order_by(Vacation.created_at.desc()).all()
     
-    return vacations
+    return vacations_response(vacations)
 
 @router.get("/{vacation_id}", response_model=VacationResponse)
 async def get_vacation(
@@ -259,7 +250,7 @@ async def get_vacation(
             detail="Not authorized to view this booking"
         )
     
-    return vacation
+    return vacation_response(vacation)
 
 @router.delete("/{vacation_id}")
 async def cancel_vacation(
@@ -289,7 +280,11 @@ async def cancel_vacation(
         )
     
     vacation.status = "cancelled"
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise conflict("Vacation booking was changed by another request")
     
     return {"message": "Vacation booking cancelled successfully"}
 
@@ -301,7 +296,7 @@ async def confirm_vacation(
 ):
     """Confirm a vacation booking (driver action)"""
     # Only drivers and admins can confirm bookings
-    if str(current_user.role) not in [UserRole.DRIVER.value, UserRole.ADMIN.value]:
+    if current_user.role not in (UserRole.DRIVER, UserRole.ADMIN):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only drivers and admins can confirm vacation bookings"
@@ -322,21 +317,22 @@ async def confirm_vacation(
         )
     
     vacation.status = "confirmed"
-    db.commit()
-    db.refresh(vacation)
-    
-    # Send WebSocket notification to rider
+    # Notify the rider through the outbox, in the same transaction
+    add_event(db, "vacation_status_update", {
+        "vacation_id": vacation.id,
+        "booking_reference": vacation.booking_reference,
+        "status": "confirmed"
+    }, [int(vacation.user_id)], notify_email=vacation.user.email)
     try:
-        from app.websocket import manager
-        await manager.send_personal_message({
-            "type": "vacation_status_update",
-            "vacation_id": vacation.id,
-            "status": "confirmed"
-        }, int(vacation.user_id) if vacation.user_id is not None else 0)
-    except Exception as e:
-        print(f"Failed to send WebSocket notification to rider: {e}")
+        db.commit()
+    except StaleDataError:
+        # Another driver confirmed or rejected it first (version check failed)
+        db.rollback()
+        raise conflict("Vacation booking was changed by another request")
+    db.refresh(vacation)
+    outbox_relay.wake()
     
-    return {"message": "Vacation booking confirmed successfully", "vacation": vacation}
+    return {"message": "Vacation booking confirmed successfully", "vacation": vacation_response(vacation)}
 
 @router.patch("/{vacation_id}/reject")
 async def reject_vacation(
@@ -346,7 +342,7 @@ async def reject_vacation(
 ):
     """Reject a vacation booking (driver action)"""
     # Only drivers and admins can reject bookings
-    if str(current_user.role) not in [UserRole.DRIVER.value, UserRole.ADMIN.value]:
+    if current_user.role not in (UserRole.DRIVER, UserRole.ADMIN):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only drivers and admins can reject vacation bookings"
@@ -368,21 +364,31 @@ async def reject_vacation(
     
     # Set status to rejected
     vacation.status = "rejected"
-    db.commit()
-    db.refresh(vacation)
-    
-    # Send WebSocket notification to rider
+    # Notify the rider through the outbox, in the same transaction
+    add_event(db, "vacation_status_update", {
+        "vacation_id": vacation.id,
+        "status": "rejected"
+    }, [int(vacation.user_id)])
     try:
-        from app.websocket import manager
-        await manager.send_personal_message({
-            "type": "vacation_status_update",
-            "vacation_id": vacation.id,
-            "status": "rejected"
-        }, int(vacation.user_id) if vacation.user_id is not None else 0)
-    except Exception as e:
-        print(f"Failed to send WebSocket notification to rider: {e}")
+        db.commit()
+    except StaleDataError:
+        # Another driver confirmed or rejected it first (version check failed)
+        db.rollback()
+        raise conflict("Vacation booking was changed by another request")
+    db.refresh(vacation)
+    outbox_relay.wake()
     
-    return {"message": "Vacation booking rejected successfully", "vacation": vacation}
+    return {"message": "Vacation booking rejected successfully", "vacation": vacation_response(vacation)}
+
+loyalty_tiers_refdata = ReferenceData("loyalty_tiers", lambda db: {
+    "points_per_currency": 1 / CURRENCY_PER_POINT,
+    "tiers": tier_table()
+})
+
+@router.get("/loyalty/tiers")
+async def get_loyalty_tiers(request: Request, db: Session = Depends(get_db)):
+    """Loyalty tier thresholds and benefits (cached, supports If-None-Match)"""
+    return loyalty_tiers_refdata.response(request, db)
 
 @router.get("/loyalty/points")
 async def get_loyalty_points(
@@ -395,17 +401,12 @@ async def get_loyalty_points(
     if not loyalty:
         return {
             "total_points": 0,
-            "tier": "bronze",
+            "tier": tier_for(0),
             "message": "No loyalty points yet"
         }
     
     return {
         "total_points": loyalty.total_points,
         "tier": loyalty.tier,
-        "benefits": {
-            "bronze": "Basic rewards",
-            "silver": "5% discount on rides",
-            "gold": "10% discount + priority booking",
-            "platinum": "15% discount + free upgrades"
-        }.get(loyalty.tier, "Basic rewards")
+        "benefits": TIER_BENEFITS.get(loyalty.tier, TIER_BENEFITS["bronze"])
     }
@@ -1,168 +1,128 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import insert
 from typing import List
-import json
 from datetime import datetime, timedelta
 
 from app.database import get_db
 from app.models import User, Vacation, Ride, DriverProfile, RideStatus, UserRole, VehicleType
-from app.schemas import RideCreate
+from app.schemas import RideCreate, FlightDetails
 from app.auth import get_current_active_user
 from app.routers.rides import calculate_fare, calculate_distance
+from app.fares import estimate_duration_minutes
+from app.scheduler import ride_scheduler, naive_utc
+from app.analytics import record_rides_created
+from app.vacation_plans import vacation_plan
 
 router = APIRouter()
 
-def parse_schedule(vacation: Vacation) -> dict:
-    """Parse the vacation schedule JSON data"""
-    try:
-        if vacation.schedule:
-            return json.loads(vacation.schedule)
-        return {}
-    except json.JSONDecodeError:
-        return {}
+def ride_row(
+    user: User,
+    vehicle_type: VehicleType,
+    pickup_address: str,
+    pickup_lat: float,
+    pickup_lng: float,
+    destination_address: str,
+    destination_lat: float,
+    destination_lng: float,
+    scheduled_time: datetime
+) -> dict:
+    """Column values for one automated ride"""
+    distance = calculate_distance(pickup_lat, pickup_lng, destination_lat, destination_lng)
+    return {
+        "rider_id": user.id,
+        "pickup_address": pickup_address,
+        "pickup_lat": pickup_lat,
+        "pickup_lng": pickup_lng,
+        "destination_address": destination_address,
+        "destination_lat": destination_lat,
+        "destination_lng": destination_lng,
+        "vehicle_type": vehicle_type,
+        "distance_km": distance,
+        "duration_minutes": estimate_duration_minutes(distance),
+        "estimated_fare": calculate_fare(distance, vehicle_type.value),
+        "surge_multiplier": 1.0,
+        # Every automated ride goes through the scheduler, which releases it into dispatch
+        "status": RideStatus.SCHEDULED,
+        "scheduled_time": naive_utc(scheduled_time)
+    }
 
 def create_automated_rides_for_vacation(db: Session, vacation: Vacation, user: User):
-    """Create automated rides based on vacation schedule"""
-    schedule = parse_schedule(vacation)
+    """Create automated rides based on vacation schedule.
+
+    The planner data comes from the parsed plan cache, all rides are inserted with a single
+    INSERT ... RETURNING and committed together, then handed to the ride
+    scheduler in one call.
+    """
+    plan = vacation_plan(vacation)
     
-    if not schedule:
+    if not plan.schedule:
         return []
     
-    # Get flight details
-    flight_details = {}
-    if vacation.flight_details:
-        try:
-            flight_details = json.loads(vacation.flight_details)
-        except json.JSONDecodeError:
-            pass
-    
-    # Get activities
-    activities = []
-    if vacation.activities:
-        try:
-            activities = json.loads(vacation.activities)
-        except json.JSONDecodeError:
-            pass
-    
-    # Create rides based on schedule
-    rides = []
+    flight_details = plan.flight_details or FlightDetails()
+    activities = plan.activities or []
+    vehicle_type = vacation.vehicle_type or VehicleType.ECONOMY
+    rows = []
     
     # Create airport pickup ride (30 minutes before flight departure)
-    if flight_details.get('departureTime'):
+    if flight_details.departureTime:
         try:
-            departure_time = datetime.fromisoformat(flight_details['departureTime'])
-            pickup_time = departure_time - timedelta(minutes=30)
-            
-            # Create ride from user's location to airport
-            # For simplicity, we'll use default coordinates
-            pickup_lat = 12.9716  # Bangalore
-            pickup_lng = 77.5946
-            airport_lat = 13.1986  # Bangalore Airport
-            airport_lng = 77.7066
-            
-            distance = calculate_distance(pickup_lat, pickup_lng, airport_lat, airport_lng)
-            estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-            
-            ride = Ride(
-                rider_id=user.id,
-                pickup_address="Home",
-                pickup_lat=pickup_lat,
-                pickup_lng=pickup_lng,
-                destination_address=f"{flight_details.get('departureCity', 'Airport')} Airport",
-                destination_lat=airport_lat,
-                destination_lng=airport_lng,
-                vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                distance_km=distance,
-                duration_minutes=int((distance / 40) * 60),  # Assuming 40 km/h average speed
-                estimated_fare=estimated_fare,
-                scheduled_time=pickup_time
-            )
-            
-            db.add(ride)
-            rides.append(ride)
+            departure_time = datetime.fromisoformat(flight_details.departureTime)
+            # Ride from user's location (default: Bangalore) to Bangalore Airport
+            rows.append(ride_row(
+                user, vehicle_type,
+                "Home", 12.9716, 77.5946,
+                f"{flight_details.departureCity or 'Airport'} Airport", 13.1986, 77.7066,
+                departure_time - timedelta(minutes=30)
+            ))
         except Exception as e:
             print(f"Failed to create airport pickup ride: {e}")
     
     # Create airport dropoff ride (30 minutes after flight arrival)
-    if flight_details.get('arrivalTime'):
+    if flight_details.arrivalTime:
         try:
-            arrival_time = datetime.fromisoformat(flight_details['arrivalTime'])
-            dropoff_time = arrival_time + timedelta(minutes=30)
-            
-            # Create ride from airport to hotel
-            airport_lat = 15.3808  # Goa Airport
-            airport_lng = 73.8380
-            hotel_lat = 15.2993  # Goa city center
-            hotel_lng = 74.1240
-            
-            distance = calculate_distance(airport_lat, airport_lng, hotel_lat, hotel_lng)
-            estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-            
-            ride = Ride(
-                rider_id=user.id,
-                pickup_address=f"{flight_details.get('arrivalCity', 'Destination')} Airport",
-                pickup_lat=airport_lat,
-                pickup_lng=airport_lng,
-                destination_address=vacation.hotel_name or "Hotel",
-                destination_lat=hotel_lat,
-                destination_lng=hotel_lng,
-                vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                distance_km=distance,
-                duration_minutes=int((distance / 40) * 60),  # Assuming 40 km/h average speed
-                estimated_fare=estimated_fare,
-                scheduled_time=dropoff_time
-            )
-            
-            db.add(ride)
-            rides.append(ride)
+            arrival_time = datetime.fromisoformat(flight_details.arrivalTime)
+            # Ride from Goa Airport to the hotel (Goa city center)
+            rows.append(ride_row(
+                user, vehicle_type,
+                f"{flight_details.arrivalCity or 'Destination'} Airport", 15.3808, 73.8380,
+                vacation.hotel_name or "Hotel", 15.2993, 74.1240,
+                arrival_time + timedelta(minutes=30)
+            ))
         except Exception as e:
             print(f"Failed to create airport dropoff ride: {e}")
     
     # Create rides for activities
+    # For simplicity, rides go from the hotel to a default activity location
+    # (would be parsed from activity data in a real implementation)
+    activity_time = datetime.utcnow() + timedelta(hours=2)  # Placeholder time
     for activity in activities:
         try:
-            # For simplicity, we'll create rides between hotel and activity locations
-            # In a real implementation, this would be more sophisticated
-            hotel_lat = 15.2993  # Goa city center
-            hotel_lng = 74.1240
-            
-            # Default activity location (would be parsed from activity data in real implementation)
-            activity_lat = 15.3000
-            activity_lng = 74.1250
-            
-            # Create ride from hotel to activity
-            distance = calculate_distance(hotel_lat, hotel_lng, activity_lat, activity_lng)
-            estimated_fare = calculate_fare(distance, vacation.vehicle_type.value if vacation.vehicle_type else "economy")
-            
-            ride = Ride(
-                rider_id=user.id,
-                pickup_address=vacation.hotel_name or "Hotel",
-                pickup_lat=hotel_lat,
-                pickup_lng=hotel_lng,
-                destination_address=activity.get('location', 'Activity Location'),
-                destination_lat=activity_lat,
-                destination_lng=activity_lng,
-                vehicle_type=vacation.vehicle_type or VehicleType.ECONOMY,
-                distance_km=distance,
-                duration_minutes=int((distance / 40) * 60),  # Assuming 40 km/h average speed
-                estimated_fare=estimated_fare,
-                scheduled_time=datetime.now() + timedelta(hours=2)  # Placeholder time
-            )
-            
-            db.add(ride)
-            rides.append(ride)
+            rows.append(ride_row(
+                user, vehicle_type,
+                vacation.hotel_name or "Hotel", 15.2993, 74.1240,
+                activity.location or 'Activity Location', 15.3000, 74.1250,
+                activity_time
+            ))
         except Exception as e:
             print(f"Failed to create activity ride: {e}")
     
+    if not rows:
+        return []
+    
     try:
+        rides = list(db.scalars(insert(Ride).returning(Ride, sort_by_parameter_order=True), rows))
+        record_rides_created(db, rides)
+        scheduled = [(ride.id, row["scheduled_time"]) for ride, row in zip(rides, rows)]
         db.commit()
-        for ride in rides:
-            db.refresh(ride)
-        return rides
     except Exception as e:
         db.rollback()
         print(f"Failed to commit rides: {e}")
         return []
+    
+    ride_scheduler.schedule_many(scheduled)
+    # Commit expired the instances; reload them with one SELECT instead of a refresh per ride
+    return db.query(Ride).filter(Ride.id.in_([ride_id for ride_id, _ in scheduled])).order_by(Ride.id).all()
 
 @router.post("/vacation/{vacation_id}/schedule-rides")
 async def schedule_vacation_rides(
@@ -0,0 +1,244 @@
+"""
+Release scheduled rides into dispatch.
+
+Rides booked for later are stored as SCHEDULED, which keeps them out of the
+pending pool that drivers scan. RideScheduler keeps a min-heap of
+(release_at, ride_id) for rides due within the next ``horizon`` and sleeps until
+the earliest one is due. Rides further out stay in the database until a periodic
+refill loads them, so memory is bounded by the horizon and not by the total
+number of future rides.
+
+A release is the conditional SCHEDULED -> PENDING update plus a new_ride_request
+outbox event in the same transaction. If several workers each run a scheduler,
+only one of them notifies drivers for a given ride. On start the heap is rebuilt
+from the database.
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.geo import driver_index
+from app.models import Ride, RideStatus
+from app.outbox import add_event, outbox_relay
+from app.analytics import record_ride_changes, ride_deltas
+from app.ride_state import ride_request_payload
+from app.surge import surge_engine
+
+def as_utc(value: datetime) -> datetime:
+    """Aware UTC datetime; naive values are taken to already be UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def naive_utc(value: datetime) -> datetime:
+    """Naive UTC, the form the rest of the app binds to timestamp columns"""
+    return as_utc(value).replace(tzinfo=None)
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+# (ride_id, rider_id, pickup_lat, pickup_lng, new_ride_request payload)
+DueRide = Tuple[int, int, float, float, dict]
+
+class RideScheduler:
+    def __init__(
+        self,
+        lead_minutes: int = 15,
+        horizon_hours: float = 6.0,
+        dispatch_radius_km: float = 3.0,
+        refill_seconds: float = 300.0,
+        release_batch_size: int = 500
+    ):
+        self.lead = timedelta(minutes=lead_minutes)
+        self.horizon = timedelta(hours=horizon_hours)
+        self.dispatch_radius_km = dispatch_radius_km
+        self.refill_seconds = refill_seconds
+        self.release_batch_size = release_batch_size
+
+        self._heap: List[Tuple[float, int]] = []
+        self._queued: Set[int] = set()
+        # Rides with pickup up to here are in the heap; later ones wait for a refill
+        self._loaded_until: Optional[datetime] = None
+        # Refill on the task's first pass
+        self._last_refill = float("-inf")
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.released = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def needs_scheduling(self, scheduled_time: Optional[datetime]) -> bool:
+        """True when a ride for ``scheduled_time`` should wait before entering dispatch"""
+        return scheduled_time is not None and as_utc(scheduled_time) - self.lead > utcnow()
+
+    def schedule(self, ride_id: int, scheduled_time: datetime):
+        self.schedule_many([(ride_id, scheduled_time)])
+
+    def schedule_many(self, rides: Iterable[Tuple[int, datetime]]):
+        """Queue committed SCHEDULED rides as (ride_id, scheduled_time) pairs"""
+        earliest = self._heap[0][0] if self._heap else None
+        for ride_id, scheduled_time in rides:
+            pickup = as_utc(scheduled_time)
+            if self._loaded_until is not None and pickup > self._loaded_until:
+                continue
+            self._push(ride_id, pickup)
+        if self._heap and (earliest is None or self._heap[0][0] < earliest):
+            self._wake.set()
+
+    def _push(self, ride_id: int, pickup: datetime):
+        if ride_id in self._queued:
+            return
+        heapq.heappush(self._heap, ((pickup - self.lead).timestamp(), ride_id))
+        self._queued.add(ride_id)
+
+    async def start(self):
+        if self._task is None:
+            # The first refill runs in the task, so startup does not wait on the database
+            self._task = asyncio.create_task(self._run(), name="ride-scheduler")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                if time.monotonic() - self._last_refill >= self.refill_seconds:
+                    await self.refill()
+                await self.release_due()
+            except Exception as e:
+                self.errors += 1
+                print(f"Ride scheduler error: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._seconds_until_next())
+            except asyncio.TimeoutError:
+                pass
+
+    def _seconds_until_next(self) -> float:
+        until_refill = self.refill_seconds - (time.monotonic() - self._last_refill)
+        if self._heap:
+            until_refill = min(until_refill, self._heap[0][0] - time.time())
+        return max(until_refill, 0.0)
+
+    async def refill(self):
+        """Load SCHEDULED rides with pickup inside the horizon (including overdue ones)"""
+        until = utcnow() + self.horizon
+        rows = await asyncio.to_thread(self._load_window, until)
+        self._loaded_until = until
+        self._last_refill = time.monotonic()
+        self.schedule_many(rows)
+
+    def _load_window(self, until: datetime) -> List[Tuple[int, datetime]]:
+        db = SessionLocal()
+        try:
+            return [
+                (ride_id, scheduled_time)
+                for ride_id, scheduled_time in db.query(Ride.id, Ride.scheduled_time).filter(
+                    Ride.status == RideStatus.SCHEDULED,
+                    Ride.scheduled_time != None,
+                    Ride.scheduled_time <= naive_utc(until)
+                ).order_by(Ride.scheduled_time)
+            ]
+        finally:
+            db.close()
+
+    async def release_due(self):
+        """Move every ride whose release time has passed into the pending pool"""
+        while self._heap and self._heap[0][0] <= time.time():
+            due_ids = []
+            while self._heap and self._heap[0][0] <= time.time() and len(due_ids) < self.release_batch_size:
+                _, ride_id = heapq.heappop(self._heap)
+                self._queued.discard(ride_id)
+                due_ids.append(ride_id)
+
+            due = await asyncio.to_thread(self._load_due, due_ids)
+            # The location index is owned by the event loop, so look drivers up here
+            recipients = {
+                ride_id: [driver.driver_id for driver in driver_index.nearby(lat, lng, self.dispatch_radius_km)]
+                for ride_id, _, lat, lng, _ in due
+            }
+            released = await asyncio.to_thread(self._release, due, recipients)
+
+            self.released += len(released)
+            self.skipped += len(due_ids) - len(released)
+            if released:
+                outbox_relay.wake()
+            for ride_id, _, lat, lng, _ in due:
+                if ride_id in released:
+                    surge_engine.ride_requested(lat, lng)
+
+    def _load_due(self, ride_ids: List[int]) -> List[DueRide]:
+        db = SessionLocal()
+        try:
+            rides = db.query(Ride).filter(
+                Ride.id.in_(ride_ids),
+                Ride.status == RideStatus.SCHEDULED
+            ).all()
+            return [
+                (ride.id, ride.rider_id, float(ride.pickup_lat), float(ride.pickup_lng), ride_request_payload(ride))
+                for ride in rides
+            ]
+        finally:
+            db.close()
+
+    def _release(self, due: List[DueRide], recipients: Dict[int, List[int]]) -> Set[int]:
+        if not due:
+            return set()
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                update(Ride)
+                .where(Ride.id.in_([ride_id for ride_id, _, _, _, _ in due]), Ride.status == RideStatus.SCHEDULED)
+                .values(status=RideStatus.PENDING)
+                .returning(Ride.id, Ride.created_at, Ride.vehicle_type, Ride.distance_km, Ride.final_fare)
+            ).all()
+            released = {row[0] for row in rows}
+            record_ride_changes(db, [
+                delta
+                for _, created_at, vehicle_type, distance_km, final_fare in rows
+                for delta in ride_deltas(
+                    created_at, vehicle_type, distance_km, final_fare, RideStatus.SCHEDULED, RideStatus.PENDING
+                )
+            ])
+            for ride_id, rider_id, _, _, payload in due:
+                if ride_id not in released:
+                    # Cancelled meanwhile, or another worker released it first
+                    continue
+                add_event(db, "new_ride_request", payload, recipients[ride_id] or None)
+                add_event(db, "ride_status_update", {
+                    "ride_id": ride_id,
+                    "status": RideStatus.PENDING.value
+                }, [int(rider_id)])
+            db.commit()
+            return released
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "queued": len(self._heap),
+            "next_release_in_seconds": round(self._heap[0][0] - time.time(), 1) if self._heap else None,
+            "loaded_until": self._loaded_until.isoformat() if self._loaded_until else None,
+            "released": self.released,
+            "skipped": self.skipped,
+            "errors": self.errors
+        }
+
+ride_scheduler = RideScheduler(
+    lead_minutes=settings.ride_release_lead_minutes,
+    horizon_hours=settings.ride_scheduler_horizon_hours,
+    dispatch_radius_km=settings.ride_dispatch_radius_km
+)
@@ -0,0 +1,64 @@
+"""
+Schema version management.
+
+Migrations live in ``backend/migrations`` and are applied with ``alembic upgrade
+head`` as a deploy step, never by the web workers. At startup each worker only
+compares the database's alembic revision with HEAD_REVISION, a constant shipped
+with the code, so booting reads one row and never parses the migration scripts.
+"""
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+# Latest revision in migrations/versions; bump it with each new migration
+# (tests/test_schema.py fails until it matches the scripts)
+HEAD_REVISION = "0009"
+
+class SchemaVersionError(RuntimeError):
+    """Raised when the database is not at the revision this code expects"""
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    return config
+
+def head_revision() -> str:
+    """Latest revision according to the migration scripts (parses every script)"""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+def current_revision(engine: Engine) -> Optional[str]:
+    """Revision recorded in the database, or None if it was never migrated"""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except SQLAlchemyError:
+        return None
+
+def check_schema_version(engine: Engine):
+    """Fail fast if the database needs ``alembic upgrade head``"""
+    expected = HEAD_REVISION
+    found = current_revision(engine)
+    if found != expected:
+        raise SchemaVersionError(
+            f"Database schema is at revision {found or 'none'}, expected {expected}. "
+            f"Run 'alembic upgrade head' from the backend directory."
+        )
+
+def upgrade_to_head(engine: Engine):
+    """Apply all pending migrations (used by scripts and benchmarks, not at startup)"""
+    from alembic import command
+
+    config = _alembic_config()
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+        connection.commit()
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, Optional, List
 from datetime import datetime
+import json
 from app.models import UserRole, RideStatus, VehicleType
 
 # User Schemas
@@ -87,6 +88,7 @@ class RideResponse(BaseModel):
     distance_km: Optional[float]
     duration_minutes: Optional[int]
     estimated_fare: Optional[float]
+    surge_multiplier: Optional[float] = 1.0
     final_fare: Optional[float]
     rating: Optional[int]
     scheduled_time: Optional[datetime]
@@ -106,6 +108,30 @@ class RideRating(BaseModel):
     rating: int = Field(ge=1, le=5)
     feedback: Optional[str] = None
 
+# Fare Quote Schemas
+class FareQuoteItem(BaseModel):
+    pickup_lat: float
+    pickup_lng: float
+    destination_lat: float
+    destination_lng: float
+    vehicle_type: Optional[VehicleType] = None  # None quotes every vehicle class
+
+class FareQuoteRequest(BaseModel):
+    items: List[FareQuoteItem] = Field(min_length=1, max_length=100)
+
+class FareQuote(BaseModel):
+    vehicle_type: VehicleType
+    estimated_fare: float
+
+class FareQuoteResult(BaseModel):
+    distance_km: float
+    duration_minutes: int
+    surge_multiplier: float
+    quotes: List[FareQuote]
+
+class FareQuoteResponse(BaseModel):
+    results: List[FareQuoteResult]
+
 # Location Update Schema
 class LocationUpdate(BaseModel):
     lat: float
@@ -141,6 +167,27 @@ class IntercityRideResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class IntercityQuoteResponse(BaseModel):
+    origin_city_id: int
+    destination_city_id: int
+    distance_km: float
+    estimated_duration_hours: float
+    quotes: List[FareQuote]
+
+class PooledTripResponse(BaseModel):
+    origin_city_id: int
+    destination_city_id: int
+    window_start: datetime
+    departure: datetime
+    vehicle_type: VehicleType
+    capacity: int
+    seats_booked: int
+    total_price: float
+    ride_ids: List[int]
+
+class PooledTripAccept(BaseModel):
+    ride_ids: List[int] = Field(min_length=1, max_length=20)
+
 # City Schemas
 class CityCreate(BaseModel):
     name: str
@@ -162,6 +209,53 @@ class CityResponse(BaseModel):
         from_attributes = True
 
 # Vacation Schemas
+# Vacation planner data, stored in JSON columns. Unknown keys are kept as-is.
+class FlightDetails(BaseModel):
+    flightNumber: Optional[str] = None
+    departureCity: Optional[str] = None
+    arrivalCity: Optional[str] = None
+    departureTime: Optional[str] = None
+    arrivalTime: Optional[str] = None
+    
+    class Config:
+        extra = "allow"
+
+class VacationActivity(BaseModel):
+    time: Optional[str] = None
+    location: Optional[str] = None
+    description: Optional[str] = None
+    
+    class Config:
+        extra = "allow"
+
+class MealPreferences(BaseModel):
+    breakfast: Optional[str] = None
+    lunch: Optional[str] = None
+    dinner: Optional[str] = None
+    
+    class Config:
+        extra = "allow"
+
+class VacationSchedule(BaseModel):
+    # Trip planner summary
+    flightDetails: Optional[Any] = None
+    mealTimings: Optional[Any] = None
+    activities: Optional[Any] = None
+    # Fixed vacation packages
+    packageName: Optional[str] = None
+    itinerary: Optional[List[Any]] = None
+    includes: Optional[List[Any]] = None
+    excludes: Optional[List[Any]] = None
+    
+    class Config:
+        extra = "allow"
+
+def parse_json_text(value: Any) -> Any:
+    """Accept planner data as a JSON string (what the web client sends) or as JSON"""
+    if isinstance(value, str):
+        return json.loads(value) if value.strip() else None
+    return value
+
 class VacationCreate(BaseModel):
     destination: str
     hotel_name: Optional[str] = None
@@ -173,10 +267,15 @@ class VacationCreate(BaseModel):
     ride_included: bool = True
     hotel_included: bool = True
     # New fields for automated schedule-based trip planner
-    schedule: Optional[str] = None  # JSON string containing the full trip schedule
-    flight_details: Optional[str] = None  # JSON string containing flight/train details
-    activities: Optional[str] = None  # JSON string containing activities schedule
-    meal_preferences: Optional[str] = None  # JSON string containing meal timings
+    schedule: Optional[VacationSchedule] = None  # the full trip schedule
+    flight_details: Optional[FlightDetails] = None  # flight/train details
+    activities: Optional[List[VacationActivity]] = None  # activities schedule
+    meal_preferences: Optional[MealPreferences] = None  # meal timings
+    
+    @field_validator("schedule", "flight_details", "activities", "meal_preferences", mode="before")
+    @classmethod
+    def parse_planner_json(cls, value):
+        return parse_json_text(value)
 
 class VacationResponse(BaseModel):
     id: int
@@ -195,10 +294,16 @@ class VacationResponse(BaseModel):
     booking_reference: Optional[str]
     created_at: datetime
     # New fields for automated schedule-based trip planner
-    schedule: Optional[str] = None  # JSON string containing the full trip schedule
-    flight_details: Optional[str] = None  # JSON string containing flight/train details
-    activities: Optional[str] = None  # JSON string containing activities schedule
-    meal_preferences: Optional[str] = None  # JSON string containing meal timings
+    schedule: Optional[VacationSchedule] = None  # the full trip schedule
+    flight_details: Optional[FlightDetails] = None  # flight/train details
+    activities: Optional[List[VacationActivity]] = None  # activities schedule
+    meal_preferences: Optional[MealPreferences] = None  # meal timings
+    version: int = 1
+    
+    @field_validator("schedule", "flight_details", "activities", "meal_preferences", mode="before")
+    @classmethod
+    def parse_planner_json(cls, value):
+        return parse_json_text(value)
     
     class Config:
         from_attributes = True
@@ -0,0 +1,211 @@
+"""
+Real-time surge pricing per geo cell.
+
+Demand per cell is the number of pending rides plus ride requests seen in a
+rolling window; supply is the number of available drivers in the cell and its
+eight neighbours (from the shared DriverLocationIndex). Request handlers feed
+the engine incrementally, a background task recomputes the multipliers of the
+cells that changed every few seconds, and pricing reads them with one dict
+lookup.
+
+Each worker only sees its own requests, so the engine periodically reconciles
+driver positions and pending-ride counts from the database.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.geo import Cell, DriverLocationIndex, cell_for, driver_index, load_available_drivers
+from app.models import Ride, RideStatus
+
+NEIGHBOURHOOD = [(d_lat, d_lng) for d_lat in (-1, 0, 1) for d_lng in (-1, 0, 1)]
+
+class SurgeEngine:
+    def __init__(
+        self,
+        driver_index: DriverLocationIndex,
+        recompute_seconds: float = 5.0,
+        window_seconds: float = 600.0,
+        reconcile_seconds: float = 60.0,
+        sensitivity: float = 0.5,
+        max_multiplier: float = 3.0
+    ):
+        self.driver_index = driver_index
+        self.cell_size = driver_index.cell_size
+        self.recompute_seconds = recompute_seconds
+        self.window_seconds = window_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self.sensitivity = sensitivity
+        self.max_multiplier = max_multiplier
+
+        self._pending: Dict[Cell, int] = {}
+        self._requests: Dict[Cell, Deque[float]] = {}
+        self._multipliers: Dict[Cell, float] = {}
+        self._dirty: Set[Cell] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_reconcile = 0.0
+        self.last_recompute_ms = 0.0
+
+    # --- Feeds from request handlers -------------------------------------
+
+    def _touch(self, cell: Cell):
+        # Supply counts neighbours, so a change affects the surrounding cells too
+        for d_lat, d_lng in NEIGHBOURHOOD:
+            self._dirty.add((cell[0] + d_lat, cell[1] + d_lng))
+
+    def ride_requested(self, lat: float, lng: float):
+        """A new ride entered the pending pool"""
+        cell = cell_for(lat, lng, self.cell_size)
+        self._requests.setdefault(cell, deque()).append(time.monotonic())
+        self._pending[cell] = self._pending.get(cell, 0) + 1
+        self._touch(cell)
+
+    def ride_pending(self, lat: float, lng: float):
+        """A ride went back to the pending pool (driver rejected it)"""
+        cell = cell_for(lat, lng, self.cell_size)
+        self._pending[cell] = self._pending.get(cell, 0) + 1
+        self._touch(cell)
+
+    def ride_resolved(self, lat: float, lng: float):
+        """A pending ride was accepted or cancelled"""
+        cell = cell_for(lat, lng, self.cell_size)
+        remaining = self._pending.get(cell, 0) - 1
+        if remaining > 0:
+            self._pending[cell] = remaining
+        else:
+            self._pending.pop(cell, None)
+        self._touch(cell)
+
+    def driver_moved(self, driver_id: int, lat: float, lng: float, rating: Optional[float] = None):
+        """An available driver reported a position"""
+        self.driver_index.update(driver_id, lat, lng, rating)
+        self._touch(cell_for(lat, lng, self.cell_size))
+
+    def driver_offline(self, driver_id: int, lat: Optional[float] = None, lng: Optional[float] = None):
+        """A driver became unavailable"""
+        self.driver_index.remove(driver_id)
+        if lat is not None and lng is not None:
+            self._touch(cell_for(lat, lng, self.cell_size))
+
+    # --- Pricing ----------------------------------------------------------
+
+    def multiplier_at(self, lat: float, lng: float) -> float:
+        return self._multipliers.get(cell_for(lat, lng, self.cell_size), 1.0)
+
+    def _demand(self, cell: Cell, cutoff: float) -> int:
+        window = self._requests.get(cell)
+        if window:
+            while window and window[0] < cutoff:
+                window.popleft()
+            if not window:
+                del self._requests[cell]
+        recent = len(window) if window else 0
+        return max(self._pending.get(cell, 0), recent)
+
+    def _supply(self, cell: Cell) -> int:
+        return sum(
+            self.driver_index.count_in_cell((cell[0] + d_lat, cell[1] + d_lng))
+            for d_lat, d_lng in NEIGHBOURHOOD
+        )
+
+    def _multiplier(self, demand: int, supply: int) -> float:
+        ratio = demand / max(supply, 1)
+        if ratio <= 1:
+            return 1.0
+        multiplier = 1.0 + (ratio - 1.0) * self.sensitivity
+        return round(min(multiplier, self.max_multiplier), 1)
+
+    def recompute(self):
+        """Refresh multipliers for cells whose supply or demand changed"""
+        started = time.perf_counter()
+        cutoff = time.monotonic() - self.window_seconds
+        # Surging cells are always revisited so they decay as the window slides
+        cells = self._dirty | set(self._multipliers)
+        self._dirty = set()
+        for cell in cells:
+            multiplier = self._multiplier(self._demand(cell, cutoff), self._supply(cell))
+            if multiplier > 1.0:
+                self._multipliers[cell] = multiplier
+            else:
+                self._multipliers.pop(cell, None)
+        self.last_recompute_ms = (time.perf_counter() - started) * 1000
+
+    # --- Background task --------------------------------------------------
+
+    async def start(self):
+        if self._task is None:
+            # The first reconcile runs in the task, so startup does not wait on the database
+            self._task = asyncio.create_task(self._run(), name="surge-engine")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        try:
+            await self.reconcile()
+        except Exception as e:
+            print(f"Surge engine warm-up error: {e}")
+        while True:
+            await asyncio.sleep(self.recompute_seconds)
+            try:
+                if time.monotonic() - self._last_reconcile >= self.reconcile_seconds:
+                    await self.reconcile()
+                self.recompute()
+            except Exception as e:
+                print(f"Surge engine error: {e}")
+
+    async def reconcile(self):
+        """Resync drivers and pending rides with the database"""
+        drivers, pending = await asyncio.to_thread(self._load_from_db)
+        self.driver_index.replace_all(drivers)
+        counts: Dict[Cell, int] = {}
+        for lat, lng in pending:
+            cell = cell_for(lat, lng, self.cell_size)
+            counts[cell] = counts.get(cell, 0) + 1
+        for cell in set(self._pending) | set(counts):
+            self._touch(cell)
+        self._pending = counts
+        for cell in self.driver_index.cells():
+            self._touch(cell)
+        self._last_reconcile = time.monotonic()
+
+    def _load_from_db(self) -> Tuple[List[Tuple[int, float, float, float]], List[Tuple[float, float]]]:
+        db = SessionLocal()
+        try:
+            # Only recent pending rides count as live demand
+            since = datetime.utcnow() - timedelta(seconds=self.window_seconds * 6)
+            pending = db.query(Ride.pickup_lat, Ride.pickup_lng).filter(
+                Ride.status == RideStatus.PENDING,
+                Ride.driver_id == None,
+                Ride.created_at >= since
+            ).all()
+            return load_available_drivers(db), [(float(lat), float(lng)) for lat, lng in pending]
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "available_drivers": len(self.driver_index),
+            "cells_with_pending_rides": len(self._pending),
+            "surging_cells": len(self._multipliers),
+            "max_multiplier": max(self._multipliers.values(), default=1.0),
+            "last_recompute_ms": round(self.last_recompute_ms, 3)
+        }
+
+surge_engine = SurgeEngine(
+    driver_index,
+    recompute_seconds=settings.surge_recompute_seconds,
+    window_seconds=settings.surge_window_seconds,
+    reconcile_seconds=settings.surge_reconcile_seconds,
+    sensitivity=settings.surge_sensitivity,
+    max_multiplier=settings.surge_max_multiplier
+)
@@ -0,0 +1,161 @@
+"""
+Parsed vacation planner data.
+
+``schedule``, ``flight_details``, ``activities`` and ``meal_preferences`` are JSON
+columns that can hold large itineraries, and validating them into the typed
+schema models costs a full pass over every value. Parsed plans are cached per
+vacation together with the row's ``version``. The ORM bumps the version on every
+update, so a changed row never serves a stale entry and nothing has to
+invalidate the cache explicitly.
+
+List endpoints also reuse each plan's JSON-mode dump, so a cached vacation's
+itinerary is serialized by pydantic once per version, not once per request.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel, ValidationError
+
+from app.config import settings
+from app.models import Vacation
+from app.serialization import RowSerializer, dumps, json_response
+from app.schemas import (
+    VacationSchedule, FlightDetails, VacationActivity, MealPreferences, VacationResponse, parse_json_text
+)
+
+class VacationPlan(NamedTuple):
+    schedule: Optional[VacationSchedule]
+    flight_details: Optional[FlightDetails]
+    activities: Optional[List[VacationActivity]]
+    meal_preferences: Optional[MealPreferences]
+
+PLAN_FIELDS = VacationPlan._fields
+
+def _parse(model, value) -> Optional[BaseModel]:
+    try:
+        value = parse_json_text(value)
+        return model.model_validate(value) if value is not None else None
+    except (ValueError, ValidationError) as e:
+        print(f"Ignoring malformed vacation planner data: {e}")
+        return None
+
+def _parse_activities(value) -> Optional[List[VacationActivity]]:
+    try:
+        value = parse_json_text(value)
+    except ValueError:
+        return None
+    if not isinstance(value, list):
+        return None
+    activities = []
+    for item in value:
+        activity = _parse(VacationActivity, item)
+        if activity is not None:
+            activities.append(activity)
+    return activities
+
+def _dump(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [item.model_dump(mode="json") for item in value]
+    return value.model_dump(mode="json")
+
+def parse_plan(vacation: Vacation) -> VacationPlan:
+    return VacationPlan(
+        _parse(VacationSchedule, vacation.schedule),
+        _parse(FlightDetails, vacation.flight_details),
+        _parse_activities(vacation.activities),
+        _parse(MealPreferences, vacation.meal_preferences)
+    )
+
+class PlanCache:
+    """LRU of vacation id -> [version, VacationPlan, JSON-mode dump or None]"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, list]" = OrderedDict()
+        # NDJSON streams read the cache from threadpool threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, vacation: Vacation) -> list:
+        vacation_id, version = vacation.id, vacation.version
+        with self._lock:
+            entry = self._entries.get(vacation_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(vacation_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = [version, parse_plan(vacation), None]
+        with self._lock:
+            self._entries[vacation_id] = entry
+            self._entries.move_to_end(vacation_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get(self, vacation: Vacation) -> VacationPlan:
+        return self._entry(vacation)[1]
+
+    def get_json(self, vacation: Vacation) -> dict:
+        """The plan fields as VacationResponse serializes them, dumped once per version"""
+        entry = self._entry(vacation)
+        if entry[2] is None:
+            entry[2] = {name: _dump(value) for name, value in entry[1]._asdict().items()}
+        return entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+plan_cache = PlanCache(max_entries=settings.vacation_plan_cache_size)
+
+def vacation_plan(vacation: Vacation) -> VacationPlan:
+    return plan_cache.get(vacation)
+
+def to_json(value):
+    """Plain JSON value of a planner model, or list of models, for a JSON column"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [to_json(item) for item in value]
+    return value.model_dump(exclude_unset=True)
+
+def vacation_response(vacation: Vacation) -> VacationResponse:
+    """VacationResponse built from the cached plan instead of re-validating the JSON columns"""
+    data = {
+        name: getattr(vacation, name)
+        for name in VacationResponse.model_fields
+        if name not in PLAN_FIELDS
+    }
+    data.update(vacation_plan(vacation)._asdict())
+    return VacationResponse.model_validate(data)
+
+vacation_serializer = RowSerializer(VacationResponse, Vacation, exclude=PLAN_FIELDS)
+
+def vacation_columns() -> list:
+    """Columns for a list query: the response fields plus the raw planner data"""
+    return vacation_serializer.columns() + [getattr(Vacation, name) for name in PLAN_FIELDS]
+
+def vacation_item(row) -> dict:
+    """VacationResponse as a plain dict from a row of ``vacation_columns()``"""
+    item = vacation_serializer.row(row)
+    item.update(plan_cache.get_json(row))
+    return item
+
+def vacations_response(rows) -> Response:
+    """JSON list of VacationResponse from rows of ``vacation_columns()``, without pydantic"""
+    return json_response(dumps([vacation_item(row) for row in rows]))
@@ -2,6 +2,7 @@ from fastapi import WebSocket, WebSocketDisconnect, Depends
 from typing import Dict, Set
 import json
 from app.auth import decode_access_token
+from app.metrics import ws_connections, ws_disconnects, ws_active_connections, ws_messages_sent
 
 class ConnectionManager:
     def __init__(self):
@@ -13,6 +14,7 @@ class ConnectionManager:
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
         self.active_connections[user_id].add(websocket)
+        ws_connections.inc()
         print(f"WebSocket connected for user {user_id}. Total connections: {len(self.active_connections[user_id])}")
     
     def disconnect(self, websocket: WebSocket, user_id: int):
@@ -20,17 +22,23 @@ class ConnectionManager:
             self.active_connections[user_id].discard(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+            ws_disconnects.inc()
             print(f"WebSocket disconnected for user {user_id}")
     
-    async def send_personal_message(self, message: dict, user_id: int):
+    async def send_personal_message(self, message: dict, user_id: int) -> int:
+        """Send to every connection of one user; returns how many sends succeeded"""
         print(f"Attempting to send message to user {user_id}: {message}")
+        sent = 0
         if user_id in self.active_connections:
             connections_to_remove = []
-            for connection in self.active_connections[user_id]:
+            for connection in list(self.active_connections[user_id]):
                 try:
                     await connection.send_json(message)
+                    sent += 1
+                    ws_messages_sent.inc("ok")
                     print(f"Successfully sent message to user {user_id}")
                 except Exception as e:
+                    ws_messages_sent.inc("error")
                     print(f"Failed to send message to user {user_id}: {e}")
                     connections_to_remove.append(connection)
             
@@ -41,16 +49,21 @@ class ConnectionManager:
                     del self.active_connections[user_id]
         else:
             print(f"No active connections for user {user_id}")
+        return sent
 
-    async def broadcast(self, message: dict):
+    async def broadcast(self, message: dict) -> int:
         print(f"Broadcasting message to all users: {message}")
+        sent = 0
         users_to_remove = []
-        for user_id, connections in self.active_connections.items():
+        for user_id, connections in list(self.active_connections.items()):
             connections_to_remove = []
-            for connection in connections:
+            for connection in list(connections):
                 try:
                     await connection.send_json(message)
+                    sent += 1
+                    ws_messages_sent.inc("ok")
                 except Exception as e:
+                    ws_messages_sent.inc("error")
                     print(f"Failed to broadcast to user {user_id}: {e}")
                     connections_to_remove.append(connection)
             
@@ -62,6 +75,8 @@ class ConnectionManager:
         
         # Remove users with no connections
         for user_id in users_to_remove:
-            del self.active_connections[user_id]
+            self.active_connections.pop(user_id, None)
+        return sent
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
+ws_active_connections.set_function(lambda: sum(len(connections) for connections in manager.active_connections.values()))
\ No newline at end of file
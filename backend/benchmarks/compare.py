@@ -0,0 +1,69 @@
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--metric p95_ms] [--threshold 10]
+
+Prints per-endpoint latency and throughput deltas. Exits with status 1 when any
+endpoint's ``--metric`` got worse by more than ``--threshold`` percent, so the
+script can gate CI.
+"""
+import argparse
+import json
+import sys
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def change(before: float, after: float) -> float:
+    """Percent change from before to after"""
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+def compare(baseline: dict, candidate: dict, metric: str, threshold: float) -> list:
+    """Print the comparison table and return the endpoints that regressed"""
+    print(f"baseline:  {baseline['label']} ({baseline['database']}, commit {baseline['git_commit']})")
+    print(f"candidate: {candidate['label']} ({candidate['database']}, commit {candidate['git_commit']})")
+    if baseline.get("config", {}).get("mix") != candidate.get("config", {}).get("mix"):
+        print("warning: runs used different traffic mixes")
+    print(
+        f"overall throughput: {baseline['throughput_rps']} -> {candidate['throughput_rps']} req/s "
+        f"({change(baseline['throughput_rps'], candidate['throughput_rps']):+.1f}%)\n"
+    )
+
+    print(f"{'endpoint':<48} {metric + ' before':>14} {metric + ' after':>14} {'change':>9} {'rps change':>11}")
+    regressions = []
+    for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"])):
+        before = baseline["endpoints"].get(name)
+        after = candidate["endpoints"].get(name)
+        if before is None or after is None:
+            print(f"{name:<48} {'only in ' + ('candidate' if before is None else 'baseline'):>14}")
+            continue
+        latency_change = change(before[metric], after[metric])
+        flag = ""
+        if latency_change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<48} {before[metric]:>14} {after[metric]:>14} {latency_change:>+8.1f}% "
+            f"{change(before['throughput_rps'], after['throughput_rps']):>+10.1f}%{flag}"
+        )
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms", choices=["mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    regressions = compare(load(args.baseline), load(args.candidate), args.metric, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} endpoint(s) regressed by more than {args.threshold}% on {args.metric}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Timing and reporting for benchmark runs.
+"""
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class Recorder:
+    """Latencies and status codes per endpoint name"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, name: str, elapsed_ms: float, status_code: int):
+        self.latencies[name].append(elapsed_ms)
+        self.statuses[name][status_code] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> dict:
+        wall = self.wall_seconds
+        endpoints = {}
+        for name in sorted(self.latencies):
+            values = sorted(self.latencies[name])
+            statuses = self.statuses[name]
+            endpoints[name] = {
+                "count": len(values),
+                "errors": sum(count for code, count in statuses.items() if code >= 500),
+                "statuses": {str(code): count for code, count in sorted(statuses.items())},
+                "throughput_rps": round(len(values) / wall, 2) if wall else 0.0,
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+                "max_ms": round(values[-1], 3),
+            }
+        total = sum(stats["count"] for stats in endpoints.values())
+        return {
+            "wall_seconds": round(wall, 3),
+            "requests": total,
+            "throughput_rps": round(total / wall, 2) if wall else 0.0,
+            "endpoints": endpoints,
+        }
+
+class BenchClient:
+    """httpx client bound to the ASGI app that times every request under a fixed name.
+
+    At most ``concurrency`` requests are in flight, like a load generator with a
+    fixed connection pool. Time spent waiting for a slot is not counted.
+    """
+
+    def __init__(self, app, recorder: Recorder, concurrency: int = 8):
+        self.recorder = recorder
+        self.slots = asyncio.Semaphore(concurrency)
+        self.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    async def request(self, name: str, method: str, url: str, token: Optional[str] = None, **kwargs) -> httpx.Response:
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        async with self.slots:
+            started = time.perf_counter()
+            response = await self.http.request(method, url, headers=headers, **kwargs)
+            self.recorder.record(name, (time.perf_counter() - started) * 1000, response.status_code)
+        return response
+
+    async def aclose(self):
+        await self.http.aclose()
@@ -0,0 +1,160 @@
+"""
+Run a load benchmark and store the results as JSON.
+
+    python -m benchmarks.run [--database-url URL] [--mix lifecycle|browse|rush]
+                             [--riders N] [--drivers N] [--duration SECONDS]
+                             [--concurrency N]
+                             [--seed N] [--label NAME] [--output PATH]
+
+Without ``--database-url`` the run uses a fresh SQLite file in a temp directory.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ride lifecycle load benchmark")
+    parser.add_argument("--database-url", help="Scratch database to run against (default: temporary SQLite file)")
+    parser.add_argument("--mix", default="lifecycle", help="Traffic mix: lifecycle, browse or rush")
+    parser.add_argument("--riders", type=int, default=20)
+    parser.add_argument("--drivers", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for")
+    parser.add_argument(
+        "--concurrency", type=int, default=8,
+        help="Max requests in flight; keep below the app's DB pool size (15 by default)"
+    )
+    parser.add_argument("--hotspots", type=int, default=3, help="Number of seeded cities users cluster around")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default=None, help="Name stored in the results (default: database dialect)")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/<label>-<timestamp>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the application's console output")
+    return parser.parse_args(argv)
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def run(args: argparse.Namespace) -> dict:
+    # The app reads its settings at import time, so these imports wait for the environment
+    from app.database import engine, SessionLocal
+    from app.schema import upgrade_to_head
+    import main as application
+    from benchmarks.harness import BenchClient, Recorder
+    from benchmarks.users import MIXES, driver, load_hotspots, rider, sign_up
+
+    if args.mix not in MIXES:
+        raise SystemExit(f"Unknown mix '{args.mix}', choose from: {', '.join(MIXES)}")
+    mix = MIXES[args.mix]
+
+    upgrade_to_head(engine)
+    db = SessionLocal()
+    try:
+        hotspots = load_hotspots(db, args.hotspots)
+    finally:
+        db.close()
+
+    # Unique emails so repeated runs against the same database do not collide
+    run_id = uuid.uuid4().hex[:8]
+    setup = Recorder()
+    recorder = Recorder()
+    quiet = open(os.devnull, "w") if not args.verbose else None
+    try:
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            async with application.app.router.lifespan_context(application.app):
+                # Sign-up (register, login, go online) is timed separately from the mix
+                setup_client = BenchClient(application.app, setup, args.concurrency)
+                try:
+                    tokens = await asyncio.gather(
+                        *[sign_up(setup_client, f"bench-rider-{run_id}-{i}@example.com", "rider") for i in range(args.riders)],
+                        *[sign_up(setup_client, f"bench-driver-{run_id}-{i}@example.com", "driver") for i in range(args.drivers)]
+                    )
+                    setup.stop()
+                finally:
+                    await setup_client.aclose()
+
+                client = BenchClient(application.app, recorder, args.concurrency)
+                try:
+                    recorder.started = time.perf_counter()
+                    deadline = recorder.started + args.duration
+                    await asyncio.gather(
+                        *[rider(client, tokens[i], i, mix, hotspots, args.seed, deadline) for i in range(args.riders)],
+                        *[driver(client, tokens[args.riders + i], i, mix, hotspots, args.seed, deadline) for i in range(args.drivers)]
+                    )
+                    recorder.stop()
+                finally:
+                    await client.aclose()
+    finally:
+        if quiet:
+            quiet.close()
+
+    return {
+        "label": args.label or engine.dialect.name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "config": {
+            "mix": args.mix,
+            **mix._asdict(),
+            "riders": args.riders,
+            "drivers": args.drivers,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "hotspots": [spot.name for spot in hotspots],
+            "seed": args.seed,
+        },
+        **recorder.summary(),
+        "setup": setup.summary(),
+    }
+
+def print_summary(result: dict):
+    print(f"\n{result['label']} ({result['database']}, {result['config']['mix']} mix, commit {result['git_commit']})")
+    print(f"{result['requests']} requests in {result['wall_seconds']}s = {result['throughput_rps']} req/s\n")
+    print(f"{'endpoint':<48} {'count':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'5xx':>5}")
+    for name, stats in result["endpoints"].items():
+        print(
+            f"{name:<48} {stats['count']:>7} {stats['throughput_rps']:>8} "
+            f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>5}"
+        )
+
+def main(argv=None):
+    args = parse_args(argv)
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='uber-bench-'), 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    # Keep notification output off the console and out of the timings
+    os.environ.setdefault("NOTIFICATION_EMAIL_BACKEND", "memory")
+    os.environ.setdefault("NOTIFICATION_SMS_BACKEND", "memory")
+
+    result = asyncio.run(run(args))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{result['label']}-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print_summary(result)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    sys.exit(main())
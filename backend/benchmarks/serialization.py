@@ -0,0 +1,154 @@
+"""
+Before/after benchmark for list response serialization.
+
+    python -m benchmarks.serialization [--rows 10000] [--repeat 5] [--database-url URL]
+
+Fills a scratch database with generate_dataset.py, then times each list
+endpoint's response both ways:
+
+    before  ORM objects -> response_model validation -> stdlib JSON
+            (what FastAPI did for these endpoints before RowSerializer)
+    after   column rows -> RowSerializer -> orjson
+
+The two payloads are decoded and compared, so a difference in output fails the
+run instead of showing up as a speedup.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="List response serialization benchmark")
+    parser.add_argument("--database-url", help="Scratch database to fill (default: temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows per response")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-generate", action="store_true", help="Reuse data already in --database-url")
+    return parser.parse_args(argv)
+
+def generate(rows: int):
+    subprocess.run(
+        [sys.executable, "generate_dataset.py", "--riders", str(rows), "--drivers", "50",
+         "--rides", str(rows), "--vacations", str(rows), "--end", "2026-10-01", "--prefix", "serialization"],
+        cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL
+    )
+
+def timed(function: Callable, repeat: int) -> dict:
+    """Run ``function`` repeat times; first run reported separately as the cold run"""
+    timings: List[float] = []
+    body = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "cold_ms": round(timings[0], 1),
+        "median_ms": round(statistics.median(timings), 1),
+        "bytes": len(body),
+        "body": body,
+    }
+
+def run(args: argparse.Namespace) -> list:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+
+    from app.database import SessionLocal
+    from app.models import Ride, User, Vacation
+    from app.routers.admin import user_serializer
+    from app.routers.rides import ride_serializer
+    from app.schemas import RideResponse, UserResponse, VacationResponse
+    from app.vacation_plans import plan_cache, vacation_columns, vacation_response, vacations_response
+
+    def before(response_model, load: Callable) -> Callable:
+        field = create_model_field(name="benchmark", type_=List[response_model], mode="serialization")
+
+        def render() -> bytes:
+            db = SessionLocal()
+            try:
+                content = load(db)
+                return JSONResponse(asyncio.run(serialize_response(field=field, response_content=content))).body
+            finally:
+                db.close()
+        return render
+
+    def after(load: Callable) -> Callable:
+        def render() -> bytes:
+            db = SessionLocal()
+            try:
+                return load(db)
+            finally:
+                db.close()
+        return render
+
+    limit = args.rows
+    cases = [
+        (
+            "GET /api/rides/",
+            before(RideResponse, lambda db: db.query(Ride).order_by(Ride.id).limit(limit).all()),
+            after(lambda db: ride_serializer.dumps(ride_serializer.query(db).order_by(Ride.id).limit(limit).all())),
+        ),
+        (
+            "GET /api/vacation/",
+            before(VacationResponse, lambda db: [
+                vacation_response(vacation)
+                for vacation in db.query(Vacation).order_by(Vacation.id).limit(limit).all()
+            ]),
+            after(lambda db: vacations_response(
+                db.query(*vacation_columns()).order_by(Vacation.id).limit(limit).all()
+            ).body),
+        ),
+        (
+            "GET /api/admin/users",
+            before(UserResponse, lambda db: db.query(User).order_by(User.id).limit(limit).all()),
+            after(lambda db: user_serializer.dumps(user_serializer.query(db).order_by(User.id).limit(limit).all())),
+        ),
+    ]
+
+    results = []
+    for name, old, new in cases:
+        plan_cache.clear()
+        old_result = timed(old, args.repeat)
+        plan_cache.clear()
+        new_result = timed(new, args.repeat)
+        old_rows, new_rows = json.loads(old_result.pop("body")), json.loads(new_result.pop("body"))
+        if old_rows != new_rows:
+            raise SystemExit(f"{name}: payloads differ, the serializer is not a drop-in replacement")
+        results.append({
+            "endpoint": name,
+            "rows": len(new_rows),
+            "before": old_result,
+            "after": new_result,
+            "speedup": round(old_result["median_ms"] / new_result["median_ms"], 2) if new_result["median_ms"] else None,
+        })
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='uber-serialization-'), 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    if not args.skip_generate:
+        generate(args.rows)
+
+    results = run(args)
+    print(f"\n{'endpoint':<24} {'rows':>7} {'before ms':>10} {'after ms':>10} {'cold before':>12} {'cold after':>11} {'speedup':>8}")
+    for result in results:
+        print(
+            f"{result['endpoint']:<24} {result['rows']:>7} {result['before']['median_ms']:>10} "
+            f"{result['after']['median_ms']:>10} {result['before']['cold_ms']:>12} "
+            f"{result['after']['cold_ms']:>11} {result['speedup']:>7}x"
+        )
+
+if __name__ == "__main__":
+    sys.exit(main())
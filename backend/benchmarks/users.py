@@ -0,0 +1,150 @@
+"""
+Synthetic riders and drivers.
+
+Users cluster around a few seeded cities ("hotspots") so drivers actually see
+the rides riders book. Each virtual user draws from its own ``random.Random``
+seeded from the run seed and its role/index, so a given seed and mix always
+produce the same sequence of requests.
+"""
+import asyncio
+import math
+import random
+import time
+from typing import List, NamedTuple, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import City
+from seed_database import seed_cities
+from benchmarks.harness import BenchClient
+
+class Hotspot(NamedTuple):
+    name: str
+    lat: float
+    lng: float
+
+class Mix(NamedTuple):
+    rider_think_ms: float  # pause between a rider's requests
+    rider_polls: int  # status polls before a rider cancels a ride nobody took
+    driver_think_ms: float  # pause between a driver's requests
+    pings_per_poll: int  # location pings between /available polls
+    accept_rate: float  # chance a driver takes a ride they see
+    trip_ms: float  # time between accept, start and complete
+
+MIXES = {
+    # Steady state: most rides get picked up and completed
+    "lifecycle": Mix(rider_think_ms=500, rider_polls=10, driver_think_ms=300, pings_per_poll=2, accept_rate=0.8, trip_ms=1000),
+    # Drivers mostly browse and ping, few rides complete
+    "browse": Mix(rider_think_ms=1000, rider_polls=5, driver_think_ms=100, pings_per_poll=3, accept_rate=0.1, trip_ms=1000),
+    # Riders book back to back, drivers accept everything quickly
+    "rush": Mix(rider_think_ms=100, rider_polls=5, driver_think_ms=100, pings_per_poll=1, accept_rate=1.0, trip_ms=200),
+}
+
+PASSWORD = "bench-password"
+
+def load_hotspots(db: Session, count: int) -> List[Hotspot]:
+    """Seed the city table if needed and return the first ``count`` cities with coordinates"""
+    seed_cities(db)
+    rows = db.query(City.name, City.lat, City.lng).filter(
+        City.lat != None, City.lng != None
+    ).order_by(City.id).limit(count).all()
+    return [Hotspot(name, float(lat), float(lng)) for name, lat, lng in rows]
+
+def jitter(rng: random.Random, lat: float, lng: float, radius_km: float) -> Tuple[float, float]:
+    """Uniform random point within ``radius_km`` of (lat, lng)"""
+    distance = radius_km * math.sqrt(rng.random())
+    bearing = rng.uniform(0, 2 * math.pi)
+    dlat = distance * math.cos(bearing) / 111.32
+    dlng = distance * math.sin(bearing) / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+    return round(lat + dlat, 6), round(lng + dlng, 6)
+
+async def think(rng: random.Random, ms: float):
+    await asyncio.sleep(rng.uniform(0.5, 1.5) * ms / 1000)
+
+async def sign_up(client: BenchClient, email: str, role: str) -> str:
+    """Register, then log in like a returning user would; returns the access token.
+
+    Drivers also go online. Password hashing makes this far slower than the rest
+    of the mix, so runs do it for everyone before the measured window starts.
+    """
+    response = await client.request(
+        "POST /api/auth/register", "POST", "/api/auth/register",
+        json={"email": email, "name": email.split("@")[0], "password": PASSWORD, "role": role}
+    )
+    response.raise_for_status()
+    response = await client.request(
+        "POST /api/auth/login", "POST", "/api/auth/login",
+        data={"username": email, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    if role == "driver":
+        await client.request("PATCH /api/users/driver/availability", "PATCH", "/api/users/driver/availability", token)
+    return token
+
+async def rider(client: BenchClient, token: str, index: int, mix: Mix, hotspots: List[Hotspot], seed: int, deadline: float):
+    rng = random.Random(f"{seed}:rider:{index}")
+    while time.perf_counter() < deadline:
+        spot = rng.choice(hotspots)
+        pickup = jitter(rng, spot.lat, spot.lng, 1.5)
+        destination = jitter(rng, spot.lat, spot.lng, 10.0)
+        response = await client.request("POST /api/rides", "POST", "/api/rides/", token, json={
+            "pickup_address": f"{spot.name} pickup",
+            "pickup_lat": pickup[0],
+            "pickup_lng": pickup[1],
+            "destination_address": f"{spot.name} drop",
+            "destination_lat": destination[0],
+            "destination_lng": destination[1],
+            "vehicle_type": "economy",
+        })
+        if response.status_code != 201:
+            await think(rng, mix.rider_think_ms)
+            continue
+
+        ride_id = response.json()["id"]
+        ride_status = "pending"
+        for _ in range(mix.rider_polls):
+            await think(rng, mix.rider_think_ms)
+            if time.perf_counter() >= deadline:
+                break
+            response = await client.request("GET /api/rides/{ride_id}", "GET", f"/api/rides/{ride_id}", token)
+            ride_status = response.json().get("status", ride_status)
+            if ride_status in ("completed", "cancelled"):
+                break
+        if ride_status == "pending":
+            await client.request("DELETE /api/rides/{ride_id}", "DELETE", f"/api/rides/{ride_id}", token)
+        await think(rng, mix.rider_think_ms)
+
+async def driver(client: BenchClient, token: str, index: int, mix: Mix, hotspots: List[Hotspot], seed: int, deadline: float):
+    rng = random.Random(f"{seed}:driver:{index}")
+    spot = hotspots[index % len(hotspots)]
+    lat, lng = jitter(rng, spot.lat, spot.lng, 1.0)
+
+    async def update_ride(ride_id: int, new_status: str):
+        return await client.request(
+            f"PATCH /api/rides/{{ride_id}} ({new_status})", "PATCH", f"/api/rides/{ride_id}", token,
+            json={"status": new_status}
+        )
+
+    while time.perf_counter() < deadline:
+        for _ in range(mix.pings_per_poll):
+            # Drift around the hotspot
+            lat, lng = jitter(rng, (lat + spot.lat) / 2, (lng + spot.lng) / 2, 0.3)
+            await client.request(
+                "PATCH /api/users/driver/location", "PATCH", "/api/users/driver/location", token,
+                json={"lat": lat, "lng": lng}
+            )
+            await think(rng, mix.driver_think_ms)
+
+        response = await client.request("GET /api/rides/available", "GET", "/api/rides/available", token)
+        rides = response.json() if response.status_code == 200 else []
+        if not rides or rng.random() >= mix.accept_rate:
+            continue
+
+        ride_id = rng.choice(rides[:5])["id"]
+        if (await update_ride(ride_id, "accepted")).status_code != 200:
+            continue  # another driver got there first
+        await think(rng, mix.trip_ms)
+        await update_ride(ride_id, "in_progress")
+        await think(rng, mix.trip_ms)
+        await update_ride(ride_id, "completed")
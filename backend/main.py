@@ -1,28 +1,70 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 import uvicorn
 
-from app.database import engine, Base, get_db
+from app.config import settings
+from app.database import engine, get_db
+from app.schema import check_schema_version
 from app.models import User, UserRole
-from app.routers import auth, rides, users, admin, vacation, vacation_scheduler
+from app.routers import auth, rides, users, admin, vacation, vacation_scheduler, intercity
 from app.websocket import manager
+from app.events import dispatcher
+from app.outbox import outbox_relay
+from app.notifications import notification_service
+from app.surge import surge_engine
+from app.scheduler import ride_scheduler
+from app.loyalty import loyalty_accruer
+from app.pooling import pooling_index
+from app.analytics import rollup_compactor
+from app.archive import ride_archiver
 from app.auth import decode_access_token, get_current_active_user
+from app.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware, instrument_engine, ws_messages_received
+from app.profiling import loop_monitor
+from app.compression import CompressionMiddleware
+from app.query_profiler import QueryProfilerMiddleware, query_profiler
 from sqlalchemy.orm import Session
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    Base.metadata.create_all(bind=engine)
+    # Startup: schema changes are applied with `alembic upgrade head`, we only verify.
+    # Everything below only creates tasks; engines load their state from the
+    # database in the background, after the worker is already serving.
+    check_schema_version(engine)
+    if settings.loop_monitor_enabled:
+        await loop_monitor.start()
+    await notification_service.start()
+    await dispatcher.start()
+    await outbox_relay.start()
+    await surge_engine.start()
+    await ride_scheduler.start()
+    await loyalty_accruer.start()
+    await pooling_index.start()
+    if settings.singleton_jobs_enabled:
+        # Safe to run concurrently, but one copy is enough
+        await rollup_compactor.start()
+        if settings.ride_archive_enabled:
+            await ride_archiver.start()
     yield
     # Shutdown
-    pass
+    await ride_archiver.stop()
+    await rollup_compactor.stop()
+    await pooling_index.stop()
+    await loyalty_accruer.stop()
+    await ride_scheduler.stop()
+    await surge_engine.stop()
+    await outbox_relay.stop()
+    await dispatcher.stop()
+    await notification_service.stop()
+    await loop_monitor.stop()
 
 app = FastAPI(
     title="Uber Clone API",
     description="Comprehensive ride-hailing and vacation platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware - Updated to allow all frontend ports
@@ -40,6 +82,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality
+    )
+
+if settings.query_profiler_enabled:
+    # Inside the metrics middleware, so both count the same statements
+    app.add_middleware(QueryProfilerMiddleware, profiler=query_profiler)
+
+if settings.metrics_enabled:
+    # Added after compression so it wraps it and times everything below it
+    app.add_middleware(MetricsMiddleware)
+
+if settings.metrics_enabled or settings.query_profiler_enabled:
+    # One pair of cursor hooks feeds both the metrics and the query profiler
+    instrument_engine(engine)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(rides.router, prefix="/api/rides", tags=["Rides"])
@@ -47,6 +109,7 @@ app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(vacation.router, prefix="/api/vacation", tags=["Vacation"])
 app.include_router(vacation_scheduler.router, prefix="/api/scheduler", tags=["Vacation Scheduler"])
+app.include_router(intercity.router, prefix="/api/intercity", tags=["Intercity"])
 
 @app.get("/")
 async def root():
@@ -60,6 +123,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of the worker's metrics"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.get("/test-db")
 async def test_db(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
     try:
@@ -107,6 +175,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Dep
     try:
         while True:
             data = await websocket.receive_text()
+            ws_messages_received.inc()
             # Echo back or process messages
             await manager.send_personal_message(
                 {"type": "message", "data": data},
@@ -0,0 +1,206 @@
+"""Baseline schema
+
+Creates every table that ``Base.metadata.create_all`` used to create at startup.
+Databases that were already bootstrapped by create_all are adopted in place:
+existing tables are left alone and only missing tables and the vacation
+trip-planner columns (formerly added by update_vacation_schema.py) are created.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _enum(name, *values):
+    # Enum types are shared between tables, so create them once up front
+    return sa.Enum(*values, name=name).with_variant(
+        postgresql.ENUM(*values, name=name, create_type=False), "postgresql"
+    )
+
+USER_ROLE = ("RIDER", "DRIVER", "ADMIN")
+RIDE_STATUS = ("PENDING", "ACCEPTED", "IN_PROGRESS", "COMPLETED", "CANCELLED")
+VEHICLE_TYPE = ("ECONOMY", "PREMIUM", "SUV", "LUXURY")
+
+VACATION_PLANNER_COLUMNS = ("schedule", "flight_details", "activities", "meal_preferences")
+
+def upgrade():
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+
+    if bind.dialect.name == "postgresql":
+        for name, values in (("userrole", USER_ROLE), ("ridestatus", RIDE_STATUS), ("vehicletype", VEHICLE_TYPE)):
+            postgresql.ENUM(*values, name=name).create(bind, checkfirst=True)
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("phone", sa.String(), nullable=True),
+            sa.Column("password", sa.String(), nullable=False),
+            sa.Column("role", _enum("userrole", *USER_ROLE), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("is_verified", sa.Boolean(), nullable=True),
+            sa.Column("profile_picture", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "driver_profiles" not in existing:
+        op.create_table(
+            "driver_profiles",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True, unique=True),
+            sa.Column("license_number", sa.String(), nullable=False, unique=True),
+            sa.Column("vehicle_type", _enum("vehicletype", *VEHICLE_TYPE), nullable=True),
+            sa.Column("vehicle_model", sa.String(), nullable=True),
+            sa.Column("vehicle_plate", sa.String(), nullable=True),
+            sa.Column("vehicle_color", sa.String(), nullable=True),
+            sa.Column("rating", sa.Float(), nullable=True),
+            sa.Column("total_rides", sa.Integer(), nullable=True),
+            sa.Column("is_available", sa.Boolean(), nullable=True),
+            sa.Column("current_lat", sa.Float(), nullable=True),
+            sa.Column("current_lng", sa.Float(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        )
+        op.create_index("ix_driver_profiles_id", "driver_profiles", ["id"])
+
+    if "rides" not in existing:
+        op.create_table(
+            "rides",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("rider_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("driver_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("pickup_address", sa.String(), nullable=False),
+            sa.Column("pickup_lat", sa.Float(), nullable=False),
+            sa.Column("pickup_lng", sa.Float(), nullable=False),
+            sa.Column("destination_address", sa.String(), nullable=False),
+            sa.Column("destination_lat", sa.Float(), nullable=False),
+            sa.Column("destination_lng", sa.Float(), nullable=False),
+            sa.Column("status", _enum("ridestatus", *RIDE_STATUS), nullable=True),
+            sa.Column("vehicle_type", _enum("vehicletype", *VEHICLE_TYPE), nullable=True),
+            sa.Column("distance_km", sa.Float(), nullable=True),
+            sa.Column("duration_minutes", sa.Integer(), nullable=True),
+            sa.Column("estimated_fare", sa.Float(), nullable=True),
+            sa.Column("final_fare", sa.Float(), nullable=True),
+            sa.Column("rating", sa.Integer(), nullable=True),
+            sa.Column("feedback", sa.Text(), nullable=True),
+            sa.Column("scheduled_time", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_rides_id", "rides", ["id"])
+
+    if "cities" not in existing:
+        op.create_table(
+            "cities",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False, unique=True),
+            sa.Column("state", sa.String(), nullable=True),
+            sa.Column("country", sa.String(), nullable=True),
+            sa.Column("lat", sa.Float(), nullable=True),
+            sa.Column("lng", sa.Float(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+        )
+        op.create_index("ix_cities_id", "cities", ["id"])
+
+    if "intercity_rides" not in existing:
+        op.create_table(
+            "intercity_rides",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("rider_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("driver_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("origin_city_id", sa.Integer(), sa.ForeignKey("cities.id"), nullable=False),
+            sa.Column("destination_city_id", sa.Integer(), sa.ForeignKey("cities.id"), nullable=False),
+            sa.Column("pickup_address", sa.String(), nullable=False),
+            sa.Column("dropoff_address", sa.String(), nullable=False),
+            sa.Column("scheduled_date", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("status", _enum("ridestatus", *RIDE_STATUS), nullable=True),
+            sa.Column("vehicle_type", _enum("vehicletype", *VEHICLE_TYPE), nullable=True),
+            sa.Column("distance_km", sa.Float(), nullable=True),
+            sa.Column("estimated_duration_hours", sa.Float(), nullable=True),
+            sa.Column("price", sa.Float(), nullable=False),
+            sa.Column("passengers", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        )
+        op.create_index("ix_intercity_rides_id", "intercity_rides", ["id"])
+
+    if "vacations" not in existing:
+        op.create_table(
+            "vacations",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("destination", sa.String(), nullable=False),
+            sa.Column("hotel_name", sa.String(), nullable=True),
+            sa.Column("hotel_address", sa.String(), nullable=True),
+            sa.Column("start_date", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("end_date", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("total_price", sa.Float(), nullable=False),
+            sa.Column("ride_included", sa.Boolean(), nullable=True),
+            sa.Column("hotel_included", sa.Boolean(), nullable=True),
+            sa.Column("vehicle_type", _enum("vehicletype", *VEHICLE_TYPE), nullable=True),
+            sa.Column("passengers", sa.Integer(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("booking_reference", sa.String(), nullable=True, unique=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("schedule", sa.Text(), nullable=True),
+            sa.Column("flight_details", sa.Text(), nullable=True),
+            sa.Column("activities", sa.Text(), nullable=True),
+            sa.Column("meal_preferences", sa.Text(), nullable=True),
+        )
+        op.create_index("ix_vacations_id", "vacations", ["id"])
+    else:
+        columns = {column["name"] for column in sa.inspect(bind).get_columns("vacations")}
+        for name in VACATION_PLANNER_COLUMNS:
+            if name not in columns:
+                op.add_column("vacations", sa.Column(name, sa.Text(), nullable=True))
+
+    if "loyalty_points" not in existing:
+        op.create_table(
+            "loyalty_points",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False, unique=True),
+            sa.Column("total_points", sa.Integer(), nullable=True),
+            sa.Column("tier", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_loyalty_points_id", "loyalty_points", ["id"])
+
+    if "outbox_events" not in existing:
+        op.create_table(
+            "outbox_events",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("event_type", sa.String(), nullable=False),
+            sa.Column("payload", sa.Text(), nullable=False),
+            sa.Column("user_ids", sa.Text(), nullable=True),
+            sa.Column("notify_email", sa.String(), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=True),
+            sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("dispatched_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_outbox_events_id", "outbox_events", ["id"])
+        op.create_index("ix_outbox_events_dispatched_at", "outbox_events", ["dispatched_at"])
+
+def downgrade():
+    for table in (
+        "outbox_events", "loyalty_points", "vacations", "intercity_rides",
+        "cities", "rides", "driver_profiles", "users",
+    ):
+        op.drop_table(table)
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for name in ("vehicletype", "ridestatus", "userrole"):
+            postgresql.ENUM(name=name).drop(bind, checkfirst=True)
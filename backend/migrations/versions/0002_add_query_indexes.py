@@ -0,0 +1,40 @@
+"""Add indexes for the hot query paths
+
+Covers the driver /available scan, per-user ride and vacation history, the
+intercity pending list and available-driver lookups. On PostgreSQL the indexes
+are built CONCURRENTLY so the migration does not lock writes on large tables.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_rides_status_driver_id", "rides", ["status", "driver_id"]),
+    ("ix_rides_rider_id_created_at", "rides", ["rider_id", "created_at"]),
+    ("ix_rides_driver_id_status", "rides", ["driver_id", "status"]),
+    ("ix_intercity_rides_status_scheduled_date", "intercity_rides", ["status", "scheduled_date"]),
+    ("ix_intercity_rides_rider_id", "intercity_rides", ["rider_id"]),
+    ("ix_vacations_user_id_created_at", "vacations", ["user_id", "created_at"]),
+    ("ix_vacations_status_created_at", "vacations", ["status", "created_at"]),
+    ("ix_driver_profiles_is_available", "driver_profiles", ["is_available"]),
+)
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,20 @@
+"""Record the surge multiplier applied to each ride
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("rides", sa.Column("surge_multiplier", sa.Float(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table("rides") as batch_op:
+        batch_op.drop_column("surge_multiplier")
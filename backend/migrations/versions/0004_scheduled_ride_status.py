@@ -0,0 +1,40 @@
+"""Add the SCHEDULED ride status
+
+Future rides are held as SCHEDULED until the ride scheduler releases them into
+the pending pool shortly before pickup. Existing pending rides with a future
+scheduled_time are moved over; the scheduler releases the ones that are already
+due on its first pass.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        # A new enum value must be committed before it can be used
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE ridestatus ADD VALUE IF NOT EXISTS 'SCHEDULED' BEFORE 'PENDING'")
+            op.create_index(
+                "ix_rides_status_scheduled_time", "rides", ["status", "scheduled_time"],
+                postgresql_concurrently=True, if_not_exists=True
+            )
+    else:
+        op.create_index("ix_rides_status_scheduled_time", "rides", ["status", "scheduled_time"], if_not_exists=True)
+
+    op.execute(sa.text(
+        "UPDATE rides SET status = 'SCHEDULED' "
+        "WHERE status = 'PENDING' AND driver_id IS NULL AND scheduled_time > CURRENT_TIMESTAMP"
+    ))
+
+def downgrade():
+    # PostgreSQL cannot drop an enum value; put the rides back in the pending pool
+    op.execute(sa.text("UPDATE rides SET status = 'PENDING' WHERE status = 'SCHEDULED'"))
+    op.drop_index("ix_rides_status_scheduled_time", table_name="rides")
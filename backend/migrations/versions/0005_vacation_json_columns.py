@@ -0,0 +1,55 @@
+"""Store vacation planner data as JSON and add a row version
+
+schedule, flight_details, activities and meal_preferences become JSONB on
+PostgreSQL. Text that is not valid JSON is kept as a JSON string rather than
+failing the migration. SQLite has no separate JSON storage type, so only such
+values are rewritten there. vacations.version backs optimistic locking and the
+parsed planner data cache.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("schedule", "flight_details", "activities", "meal_preferences")
+
+TRY_JSONB = """
+CREATE FUNCTION pg_temp.try_jsonb(value text) RETURNS jsonb AS $$
+BEGIN
+    RETURN value::jsonb;
+EXCEPTION WHEN others THEN
+    RETURN to_jsonb(value);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE
+"""
+
+def upgrade():
+    op.add_column("vacations", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(TRY_JSONB)
+        for column in COLUMNS:
+            op.alter_column(
+                "vacations", column,
+                type_=postgresql.JSONB(),
+                postgresql_using=f"pg_temp.try_jsonb(NULLIF({column}, ''))"
+            )
+    else:
+        for column in COLUMNS:
+            op.execute(f"UPDATE vacations SET {column} = NULL WHERE {column} = ''")
+            op.execute(f"UPDATE vacations SET {column} = json_quote({column}) WHERE {column} IS NOT NULL AND json_valid({column}) = 0")
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        for column in COLUMNS:
+            op.alter_column("vacations", column, type_=sa.Text(), postgresql_using=f"{column}::text")
+    with op.batch_alter_table("vacations") as batch_op:
+        batch_op.drop_column("version")
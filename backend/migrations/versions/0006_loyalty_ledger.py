@@ -0,0 +1,31 @@
+"""Add the loyalty points ledger
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "loyalty_ledger",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=False),
+        sa.Column("points", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("applied_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("source", "source_id", name="uq_loyalty_ledger_source"),
+    )
+    op.create_index("ix_loyalty_ledger_id", "loyalty_ledger", ["id"])
+    op.create_index("ix_loyalty_ledger_applied_at", "loyalty_ledger", ["applied_at"])
+
+def downgrade():
+    op.drop_table("loyalty_ledger")
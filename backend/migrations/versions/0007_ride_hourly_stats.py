@@ -0,0 +1,76 @@
+"""Add hourly ride rollups
+
+ride_hourly_stats holds ride counts, completed revenue and distance per UTC
+hour of creation, vehicle type and current status. Ride changes append to
+ride_stat_deltas in their own transaction, and the rollup compactor folds the
+deltas in. Existing rides are backfilled here.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+RIDE_STATUS = ("SCHEDULED", "PENDING", "ACCEPTED", "IN_PROGRESS", "COMPLETED", "CANCELLED")
+VEHICLE_TYPE = ("ECONOMY", "PREMIUM", "SUV", "LUXURY")
+
+def _enum(name, *values):
+    # The types already exist from the baseline
+    return sa.Enum(*values, name=name).with_variant(
+        postgresql.ENUM(*values, name=name, create_type=False), "postgresql"
+    )
+
+# Same bucket format the application writes, so backfilled keys match on upsert
+HOUR_BUCKET = {
+    "postgresql": "timezone('UTC', date_trunc('hour', timezone('UTC', created_at)))",
+    "sqlite": "strftime('%Y-%m-%d %H:00:00.000000', created_at)",
+}
+
+def _measures():
+    return [
+        sa.Column("rides", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.Column("distance_km", sa.Float(), nullable=False),
+    ]
+
+def upgrade():
+    op.create_table(
+        "ride_hourly_stats",
+        sa.Column("bucket_start", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("vehicle_type", _enum("vehicletype", *VEHICLE_TYPE), primary_key=True),
+        sa.Column("status", _enum("ridestatus", *RIDE_STATUS), primary_key=True),
+        *_measures(),
+    )
+    op.create_table(
+        "ride_stat_deltas",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("vehicle_type", _enum("vehicletype", *VEHICLE_TYPE), nullable=False),
+        sa.Column("status", _enum("ridestatus", *RIDE_STATUS), nullable=False),
+        *_measures(),
+    )
+
+    bucket = HOUR_BUCKET.get(op.get_bind().dialect.name)
+    if bucket is None:
+        print("No hour bucket expression for this database; rebuild the rollups from the admin API")
+        return
+    op.execute(sa.text(f"""
+        INSERT INTO ride_hourly_stats (bucket_start, vehicle_type, status, rides, revenue, distance_km)
+        SELECT {bucket}, COALESCE(vehicle_type, 'ECONOMY'), COALESCE(status, 'PENDING'), COUNT(*),
+               COALESCE(SUM(CASE WHEN status = 'COMPLETED' THEN final_fare END), 0),
+               COALESCE(SUM(distance_km), 0)
+        FROM rides
+        WHERE created_at IS NOT NULL
+        GROUP BY 1, 2, 3
+    """))
+
+def downgrade():
+    op.drop_table("ride_stat_deltas")
+    op.drop_table("ride_hourly_stats")
@@ -0,0 +1,74 @@
+"""Add the rides archive
+
+Completed and cancelled rides older than ``ride_archive_after_days`` are moved
+from rides to rides_archive by the ride archiver, so queries on rides only see
+the active set. The status/created_at index serves the archiver's scan.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+RIDE_STATUS = ("SCHEDULED", "PENDING", "ACCEPTED", "IN_PROGRESS", "COMPLETED", "CANCELLED")
+VEHICLE_TYPE = ("ECONOMY", "PREMIUM", "SUV", "LUXURY")
+
+def _enum(name, *values):
+    # The types already exist from the baseline
+    return sa.Enum(*values, name=name).with_variant(
+        postgresql.ENUM(*values, name=name, create_type=False), "postgresql"
+    )
+
+def upgrade():
+    op.create_table(
+        "rides_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("rider_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("driver_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("pickup_address", sa.String(), nullable=False),
+        sa.Column("pickup_lat", sa.Float(), nullable=False),
+        sa.Column("pickup_lng", sa.Float(), nullable=False),
+        sa.Column("destination_address", sa.String(), nullable=False),
+        sa.Column("destination_lat", sa.Float(), nullable=False),
+        sa.Column("destination_lng", sa.Float(), nullable=False),
+        sa.Column("status", _enum("ridestatus", *RIDE_STATUS), nullable=False),
+        sa.Column("vehicle_type", _enum("vehicletype", *VEHICLE_TYPE), nullable=True),
+        sa.Column("distance_km", sa.Float(), nullable=True),
+        sa.Column("duration_minutes", sa.Integer(), nullable=True),
+        sa.Column("estimated_fare", sa.Float(), nullable=True),
+        sa.Column("surge_multiplier", sa.Float(), nullable=True),
+        sa.Column("final_fare", sa.Float(), nullable=True),
+        sa.Column("rating", sa.Integer(), nullable=True),
+        sa.Column("feedback", sa.Text(), nullable=True),
+        sa.Column("scheduled_time", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_rides_archive_rider_id_created_at", "rides_archive", ["rider_id", "created_at"])
+    op.create_index("ix_rides_archive_driver_id_created_at", "rides_archive", ["driver_id", "created_at"])
+    op.create_index("ix_rides_status_created_at", "rides", ["status", "created_at"])
+
+def downgrade():
+    # Move archived rides back first, so downgrading loses no history
+    op.execute(sa.text("""
+        INSERT INTO rides (id, rider_id, driver_id, pickup_address, pickup_lat, pickup_lng, destination_address,
+                           destination_lat, destination_lng, status, vehicle_type, distance_km, duration_minutes,
+                           estimated_fare, surge_multiplier, final_fare, rating, feedback, scheduled_time,
+                           created_at, started_at, completed_at)
+        SELECT id, rider_id, driver_id, pickup_address, pickup_lat, pickup_lng, destination_address,
+               destination_lat, destination_lng, status, vehicle_type, distance_km, duration_minutes,
+               estimated_fare, surge_multiplier, final_fare, rating, feedback, scheduled_time,
+               created_at, started_at, completed_at
+        FROM rides_archive
+    """))
+    op.drop_index("ix_rides_status_created_at", table_name="rides")
+    op.drop_table("rides_archive")
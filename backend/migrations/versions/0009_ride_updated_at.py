@@ -0,0 +1,33 @@
+"""Record when each ride last changed
+
+The ride archiver keys eligibility on updated_at rather than created_at, so a
+ride booked long ago but only finished or cancelled recently stays in rides
+for the full ``ride_archive_after_days``. Existing rows are backfilled from
+completed_at, or created_at when there is none.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # SQLite cannot ADD COLUMN with a now() default; batch mode rebuilds the table there
+    with op.batch_alter_table("rides") as batch_op:
+        batch_op.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True))
+    op.add_column("rides_archive", sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+    for table in ("rides", "rides_archive"):
+        op.execute(sa.text(f"UPDATE {table} SET updated_at = COALESCE(completed_at, created_at)"))
+    op.create_index("ix_rides_status_updated_at", "rides", ["status", "updated_at"])
+
+def downgrade():
+    op.drop_index("ix_rides_status_updated_at", table_name="rides")
+    for table in ("rides", "rides_archive"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("updated_at")
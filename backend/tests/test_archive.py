@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.archive import RideArchiver
+from app.database import SessionLocal
+from app.models import Ride, RideArchive, RideStatus
+from tests.conftest import ride_request
+
+def book(client, rider: dict, lat: float, lng: float) -> int:
+    response = client.post("/api/rides/", headers=rider, json=ride_request(lat, lng))
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def age(ride_id: int, status: RideStatus, created_days_ago: int, updated_days_ago: int):
+    """Backdate a ride, as if it was booked and last changed that many days ago"""
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        db.execute(update(Ride).where(Ride.id == ride_id).values(
+            status=status,
+            created_at=now - timedelta(days=created_days_ago),
+            updated_at=now - timedelta(days=updated_days_ago)
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+def archive():
+    asyncio.run(RideArchiver(after_days=30, batch_size=2).drain())
+
+def location(ride_id: int) -> str:
+    db = SessionLocal()
+    try:
+        if db.get(Ride, ride_id) is not None:
+            return "rides"
+        return "archive" if db.get(RideArchive, ride_id) is not None else "missing"
+    finally:
+        db.close()
+
+def test_archiver_moves_rides_that_finished_long_ago(client, register):
+    rider = register("rider")
+    finished, cancelled, finished_late, pending = (book(client, rider, 13.431, 77.631) for _ in range(4))
+    age(finished, RideStatus.COMPLETED, 60, 45)
+    age(cancelled, RideStatus.CANCELLED, 40, 40)
+    # Booked two months ago but only completed yesterday
+    age(finished_late, RideStatus.COMPLETED, 60, 1)
+    age(pending, RideStatus.PENDING, 60, 60)
+
+    archive()
+    assert [location(ride_id) for ride_id in (finished, cancelled, finished_late, pending)] == [
+        "archive", "archive", "rides", "rides"
+    ]
+
+def test_ride_updates_refresh_updated_at(client, register):
+    rider = register("rider")
+    ride_id = book(client, rider, 13.441, 77.641)
+    age(ride_id, RideStatus.PENDING, 60, 60)
+
+    response = client.patch(f"/api/rides/{ride_id}", headers=rider, json={"status": "cancelled"})
+    assert response.status_code == 200, response.text
+    archive()
+    assert location(ride_id) == "rides"
+
+def test_history_includes_the_archive_on_request(client, register):
+    rider = register("rider")
+    old, recent = book(client, rider, 13.451, 77.651), book(client, rider, 13.451, 77.651)
+    age(old, RideStatus.COMPLETED, 50, 50)
+    archive()
+    assert location(old) == "archive"
+
+    listed = client.get("/api/rides/", headers=rider).json()
+    assert [ride["id"] for ride in listed] == [recent]
+    listed = client.get("/api/rides/", headers=rider, params={"include_archived": "true"}).json()
+    # UNION ALL of both tables, newest first
+    assert [(ride["id"], ride["status"]) for ride in listed] == [(recent, "pending"), (old, "completed")]
+
+    response = client.get(f"/api/rides/{old}", headers=rider)
+    assert response.status_code == 200 and response.json()["id"] == old
+
+def test_archived_rides_can_no_longer_be_rated(client, register):
+    rider = register("rider")
+    ride_id = book(client, rider, 13.461, 77.661)
+    age(ride_id, RideStatus.COMPLETED, 35, 35)
+    archive()
+
+    response = client.post(f"/api/rides/{ride_id}/rate", headers=rider, json={"rating": 5})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Archived rides can no longer be rated"
+    assert client.post("/api/rides/999999/rate", headers=rider, json={"rating": 5}).status_code == 404
@@ -0,0 +1,73 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, brotli, choose_encoding
+
+BIG = json.dumps([{"id": i, "name": f"item {i}"} for i in range(200)]).encode()
+
+def make_client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return Response(BIG, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"ok":true}', media_type="application/json")
+
+    @app.get("/image")
+    def image():
+        return Response(BIG, media_type="image/png")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f'{{"n":{i}}}\n' for i in range(50)), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    return TestClient(app)
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0.5, br;q=0.4") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*") == ("br" if brotli is not None else "gzip")
+
+def test_large_body_is_gzipped_with_a_weak_etag():
+    response = make_client().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) < len(BIG)
+    assert response.content == BIG
+
+    response = make_client().get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_brotli_wins_ties():
+    response = make_client().get("/big", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.content == BIG
+
+def test_small_and_binary_bodies_pass_through():
+    client = make_client()
+    for path in ("/small", "/image"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+def test_stream_is_compressed_chunk_by_chunk():
+    client = make_client()
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert [json.loads(line)["n"] for line in lines] == list(range(50))
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+
+from app.exports import RIDE_EXPORT_FIELDS, ExportLimiter
+from tests.conftest import ride_request
+
+USER_FIELDS = ["id", "name", "email", "phone", "role", "is_active", "is_verified", "created_at", "updated_at"]
+
+def user_id(client, headers: dict) -> int:
+    return client.get("/api/users/me", headers=headers).json()["id"]
+
+def test_rides_export_as_csv(client, register):
+    admin, rider = register("admin"), register("rider")
+    ride_id = client.post("/api/rides/", headers=rider, json=ride_request(13.401, 77.601)).json()["id"]
+
+    response = client.get("/api/admin/export/rides", headers=admin, params={"rider_id": user_id(client, rider)})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"].startswith('attachment; filename="rides-')
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == RIDE_EXPORT_FIELDS
+    assert [int(row[0]) for row in rows[1:]] == [ride_id]
+    assert dict(zip(rows[0], rows[1]))["status"] == "pending"
+
+def test_users_export_as_ndjson_without_password_hashes(client, register):
+    admin = register("admin")
+    rider = register("rider")
+    response = client.get("/api/admin/export/users", headers=admin, params={"format": "ndjson", "role": "rider"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert user_id(client, rider) in [user["id"] for user in users]
+    assert all(list(user) == USER_FIELDS and user["role"] == "rider" for user in users)
+    assert all("password" not in user for user in users)
+    # bcrypt hashes start with $2b$
+    assert "$2b$" not in response.text
+
+    response = client.get("/api/admin/export/users", headers=admin)
+    header = next(csv.reader(io.StringIO(response.text)))
+    assert header == USER_FIELDS
+    assert "$2b$" not in response.text
+
+def test_exports_past_the_limit_get_429_with_retry_after(client, register, monkeypatch):
+    limiter = ExportLimiter(max_concurrent=1)
+    monkeypatch.setattr("app.exports.export_limiter", limiter)
+    admin = register("admin")
+
+    release = limiter.acquire()
+    response = client.get("/api/admin/export/users", headers=admin)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "30"
+    assert limiter.rejected == 1
+
+    release()
+    assert client.get("/api/admin/export/users", headers=admin).status_code == 200
+    # The finished stream gave its slot back
+    assert limiter.running == 0 and limiter.started == 2
+
+def test_exports_are_admin_only(client, register):
+    assert client.get("/api/admin/export/rides", headers=register("rider")).status_code == 403
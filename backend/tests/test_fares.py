@@ -0,0 +1,21 @@
+import pytest
+
+from app.fares import RIDE_TARIFFS, haversine_many, quote_batch
+from app.geo import haversine_km
+from app.models import VehicleType
+from app.routers.rides import calculate_distance
+
+BANGALORE = (12.9716, 77.5946)
+CHENNAI = (13.0827, 80.2707)
+
+def test_distance_helpers_agree():
+    expected = haversine_km(*BANGALORE, *CHENNAI)
+    assert expected == pytest.approx(290, abs=5)
+    assert calculate_distance(*BANGALORE, *CHENNAI) == expected
+    assert haversine_many([(*BANGALORE, *CHENNAI), (*CHENNAI, *CHENNAI)]) == [expected, 0.0]
+
+def test_quote_batch_prices_every_class_from_one_distance():
+    (quote,) = quote_batch([(*BANGALORE, *CHENNAI, None)], multipliers=[1.5])
+    assert [vehicle_type for vehicle_type, _ in quote.fares] == list(RIDE_TARIFFS.vehicle_types)
+    fares = dict(quote.fares)
+    assert fares[VehicleType.ECONOMY] == pytest.approx(RIDE_TARIFFS.price(quote.distance_km, VehicleType.ECONOMY, 1.5))
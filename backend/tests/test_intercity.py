@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+
+from app.city_cache import CityCache
+from app.database import SessionLocal
+from app.fares import INTERCITY_MULTIPLIER, INTERCITY_TARIFFS
+from app.geo import haversine_km
+from app.models import City
+
+def add_city(lat: float, lng: float) -> int:
+    """Insert a city behind the API's back, as another worker or a seed script would"""
+    db = SessionLocal()
+    try:
+        city = City(name=f"City {uuid.uuid4().hex[:8]}", state="Test", lat=lat, lng=lng)
+        db.add(city)
+        db.commit()
+        return city.id
+    finally:
+        db.close()
+
+def quote(client, origin: int, destination: int):
+    return client.get("/api/intercity/quote", params={"origin_city_id": origin, "destination_city_id": destination})
+
+def test_quote_finds_cities_added_after_the_snapshot_loaded(client):
+    origin = add_city(12.97, 77.59)
+    assert quote(client, origin, origin).status_code == 200  # snapshot is loaded now
+
+    destination = add_city(13.08, 80.27)
+    response = quote(client, origin, destination)
+    assert response.status_code == 200, response.text
+    assert response.json()["distance_km"] > 250
+
+def test_quote_for_unknown_city_is_404(client):
+    origin = add_city(18.52, 73.85)
+    assert quote(client, origin, 10 ** 6).status_code == 404
+
+def test_same_city_trip_keeps_default_duration(client):
+    city = add_city(19.07, 72.87)
+    body = quote(client, city, city).json()
+    assert body["distance_km"] == 0
+    assert body["estimated_duration_hours"] == 2.0
+
+def test_quote_prices_every_class_from_the_distance(client):
+    origin, destination = add_city(22.57, 88.36), add_city(26.14, 91.74)
+    body = quote(client, origin, destination).json()
+    fares = {item["vehicle_type"]: item["estimated_fare"] for item in body["quotes"]}
+    assert set(fares) == {vehicle_type.value for vehicle_type in INTERCITY_TARIFFS.vehicle_types}
+    for vehicle_type in INTERCITY_TARIFFS.vehicle_types:
+        expected = INTERCITY_TARIFFS.price(haversine_km(22.57, 88.36, 26.14, 91.74), vehicle_type, INTERCITY_MULTIPLIER)
+        assert fares[vehicle_type.value] == round(expected, 2)
+
+def test_expired_snapshot_is_served_while_it_reloads(app):
+    cache = CityCache(max_age_seconds=0)
+    city = add_city(23.02, 72.57)
+
+    async def scenario():
+        snapshot = await cache.get(city)
+        assert cache.loads == 1
+        # Past its age: the same snapshot comes back and a reload runs behind it
+        assert await cache.get(city) is snapshot
+        await cache._background
+        assert cache.loads == 2 and cache.current() is not snapshot
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+import asyncio
+import itertools
+
+from app.database import SessionLocal
+from app.loyalty import LoyaltyAccruer, record_ride_points
+from app.models import LoyaltyLedger, LoyaltyPoints
+
+# Ledger source ids that no real ride uses
+source_ids = itertools.count(10_000_000)
+
+def user_id(client, headers: dict) -> int:
+    return client.get("/api/users/me", headers=headers).json()["id"]
+
+def points(user_id: int):
+    db = SessionLocal()
+    try:
+        account = db.query(LoyaltyPoints).filter(LoyaltyPoints.user_id == user_id).first()
+        return (account.total_points, account.tier) if account else None
+    finally:
+        db.close()
+
+def record(user_id: int, ride_id: int, fare: float):
+    db = SessionLocal()
+    try:
+        record_ride_points(db, ride_id, user_id, fare)
+        db.commit()
+    finally:
+        db.close()
+
+def test_recording_a_ride_twice_makes_one_ledger_entry(client, register):
+    rider = user_id(client, register("rider"))
+    ride_id = next(source_ids)
+    record(rider, ride_id, 500)
+    record(rider, ride_id, 500)
+
+    db = SessionLocal()
+    try:
+        entries = db.query(LoyaltyLedger).filter(
+            LoyaltyLedger.source == "ride", LoyaltyLedger.source_id == ride_id
+        ).all()
+    finally:
+        db.close()
+    assert [(entry.user_id, entry.points) for entry in entries] == [(rider, 5)]
+
+def test_accruer_applies_every_entry_once(client, register):
+    rider = user_id(client, register("rider"))
+    # Drivers get no loyalty account at registration; the accruer creates one
+    driver = user_id(client, register("driver"))
+    assert points(rider) == (0, "bronze") and points(driver) is None
+
+    for fare in (60_000, 50_000):
+        record(rider, next(source_ids), fare)
+    record(driver, next(source_ids), 30_000)
+
+    accruer = LoyaltyAccruer(batch_size=2)
+    asyncio.run(accruer.drain())
+    assert points(rider) == (1100, "silver")
+    assert points(driver) == (300, "bronze")
+
+    db = SessionLocal()
+    try:
+        assert db.query(LoyaltyLedger).filter(
+            LoyaltyLedger.user_id.in_([rider, driver]), LoyaltyLedger.applied_at == None
+        ).count() == 0
+    finally:
+        db.close()
+
+    asyncio.run(accruer.drain())
+    assert points(rider) == (1100, "silver")
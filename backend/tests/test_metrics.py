@@ -0,0 +1,43 @@
+import asyncio
+
+from app.events import DomainEvent, EventDispatcher
+from app.metrics import ride_dispatch_duration
+
+def test_metrics_are_labelled_by_route_template(client, register):
+    rider = register("rider")
+    for ride_id in (987654, 987655):
+        assert client.get(f"/api/rides/{ride_id}", headers=rider).status_code == 404
+    client.get("/no/such/path/4711")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE http_requests_total counter" in body
+    assert 'http_requests_total{method="GET",route="/api/rides/{ride_id}",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/rides/{ride_id}",le="+Inf"}' in body
+    assert 'route="unmatched"' in body
+    assert "987654" not in body and "4711" not in body
+
+class FakeManager:
+    async def send_personal_message(self, message: dict, user_id: int) -> int:
+        return 1
+
+    async def broadcast(self, message: dict) -> int:
+        return 1
+
+def test_notified_counts_the_first_offer_of_on_demand_rides_only(monkeypatch):
+    monkeypatch.setattr("app.events.manager", FakeManager())
+    dispatcher = EventDispatcher()
+
+    def offer(ride_id: int, scheduled_time=None):
+        payload = {"ride_id": ride_id, "scheduled_time": scheduled_time}
+        asyncio.run(dispatcher._deliver(DomainEvent("new_ride_request", payload, [1])))
+
+    before = ride_dispatch_duration.count("notified")
+    offer(-1)
+    assert ride_dispatch_duration.count("notified") == before + 1
+    # Re-offered after a reject, and a released scheduled ride
+    offer(-1)
+    offer(-2, "2030-01-01T09:00:00")
+    assert ride_dispatch_duration.count("notified") == before + 1
@@ -0,0 +1,45 @@
+import asyncio
+import smtplib
+import time
+from unittest import mock
+
+from app.notifications import MemorySink, Notification, NotificationService, RateLimiter, SMTPChannel
+
+def test_rate_limiter_charges_batches_larger_than_capacity_in_full():
+    async def run():
+        limiter = RateLimiter(rate_per_second=100.0)
+        started = time.monotonic()
+        await limiter.acquire(100)  # the full bucket
+        await limiter.acquire(250)  # 2.5 more seconds of tokens
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 2.4
+
+def test_refused_recipient_is_not_retried():
+    channel = SMTPChannel("localhost", 25, "noreply@example.com")
+    smtp = mock.MagicMock()
+    smtp.__enter__.return_value = smtp
+    smtp.sendmail.side_effect = smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"No such user")})
+    message = Notification("email", "bad@example.com", "Subject", "Body")
+
+    with mock.patch("smtplib.SMTP", return_value=smtp):
+        failed = channel._send_sync([message])
+
+    assert failed == [message] and not message.retryable
+    service = NotificationService({"email": MemorySink("email")}, max_retries=5)
+    service._retry_later(message)
+    assert service.stats()["email"]["failed"] == 1
+    assert service.stats()["email"]["retried"] == 0
+
+def test_enqueue_drops_instead_of_waiting_when_the_queue_is_full():
+    async def run():
+        service = NotificationService({"email": MemorySink("email")}, max_queue_size=2)
+        results = [
+            service.enqueue(Notification("email", f"user{i}@example.com", "S", "B"))
+            for i in range(3)
+        ]
+        return results, service.stats()["email"]
+
+    results, stats = asyncio.run(run())
+    assert results == [True, True, False]
+    assert stats["queued"] == 2 and stats["dropped"] == 1
@@ -0,0 +1,41 @@
+import asyncio
+
+from app.database import SessionLocal
+from app.events import EventDispatcher
+from app.models import OutboxEvent
+from app.outbox import OutboxRelay, add_event
+
+def dispatched_at(event_id: int):
+    db = SessionLocal()
+    try:
+        return db.get(OutboxEvent, event_id).dispatched_at
+    finally:
+        db.close()
+
+def test_row_is_marked_dispatched_only_after_a_worker_takes_the_event(app, monkeypatch):
+    # Workers are started inside the test, so events sit in the queue until then
+    stalled = EventDispatcher(worker_count=1)
+    monkeypatch.setattr("app.outbox.dispatcher", stalled)
+    relay = OutboxRelay(lease_seconds=0.2)
+
+    db = SessionLocal()
+    try:
+        event = add_event(db, "outbox_test", {"n": 1}, [0])
+        db.commit()
+        event_id = event.id
+    finally:
+        db.close()
+
+    async def scenario():
+        await relay.drain()
+        assert dispatched_at(event_id) is None
+        assert relay.deferred >= 1
+
+        await stalled.start()
+        # The queued copy is delivered now; the row is claimed again once its lease expires
+        await asyncio.sleep(0.25)
+        await relay.drain()
+        await stalled.stop()
+
+    asyncio.run(scenario())
+    assert dispatched_at(event_id) is not None
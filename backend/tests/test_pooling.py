@@ -0,0 +1,114 @@
+import itertools
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models import City, IntercityRide, RideStatus
+from app.pooling import PendingSeat, pack
+
+# Each test books into its own departure window, days ahead
+windows = itertools.count(8)
+
+def add_corridor() -> tuple:
+    db = SessionLocal()
+    try:
+        cities = [City(name=f"City {uuid.uuid4().hex[:8]}", state="Test", lat=lat, lng=77.0) for lat in (10.0, 11.0)]
+        db.add_all(cities)
+        db.commit()
+        return cities[0].id, cities[1].id
+    finally:
+        db.close()
+
+def departure() -> datetime:
+    """Half an hour into a pooling window (3 h by default) well in the future"""
+    window = 3 * 3600
+    start = (int(time.time() // window) + next(windows)) * window
+    return datetime.fromtimestamp(start + 1800, tz=timezone.utc)
+
+def book(client, rider: dict, corridor: tuple, when: datetime, passengers: int, vehicle_type: str = "economy") -> int:
+    response = client.post("/api/intercity/rides", headers=rider, json={
+        "origin_city_id": corridor[0], "destination_city_id": corridor[1],
+        "pickup_address": "A", "dropoff_address": "B",
+        "scheduled_date": when.isoformat(), "vehicle_type": vehicle_type, "passengers": passengers
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def trips(client, driver: dict, corridor: tuple) -> list:
+    response = client.get("/api/intercity/trips", headers=driver, params={
+        "origin_city_id": corridor[0], "destination_city_id": corridor[1]
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def accept(client, driver: dict, ride_ids: list):
+    return client.post("/api/intercity/trips/accept", headers=driver, json={"ride_ids": ride_ids})
+
+def ride_state(ride_id: int) -> tuple:
+    db = SessionLocal()
+    try:
+        ride = db.get(IntercityRide, ride_id)
+        return ride.status, ride.driver_id
+    finally:
+        db.close()
+
+def seat(ride_id: int, passengers: int) -> PendingSeat:
+    return PendingSeat(ride_id, passengers, datetime(2030, 1, 1, tzinfo=timezone.utc), 100.0)
+
+def test_pack_is_first_fit_decreasing():
+    seats = [seat(1, 1), seat(2, 2), seat(3, 3), seat(4, 2), seat(5, 1)]
+    bins = pack(seats, capacity=4)
+    assert [[s.ride_id for s in vehicle] for vehicle in bins] == [[3, 1], [2, 4], [5]]
+
+def test_pack_gives_oversized_parties_their_own_vehicle():
+    bins = pack([seat(1, 6), seat(2, 1)], capacity=4)
+    assert [[s.ride_id for s in vehicle] for vehicle in bins] == [[1], [2]]
+
+def test_pooled_trip_is_accepted_as_a_whole(client, register):
+    corridor, when = add_corridor(), departure()
+    rider, driver = register("rider"), register("driver")
+    ride_ids = sorted(book(client, rider, corridor, when, passengers) for passengers in (2, 1, 1))
+
+    [trip] = trips(client, driver, corridor)
+    assert trip["ride_ids"] == ride_ids
+    assert trip["seats_booked"] == 4 and trip["capacity"] == 4
+
+    response = accept(client, driver, ride_ids)
+    assert response.status_code == 200, response.text
+    driver_id = client.get("/api/users/me", headers=driver).json()["id"]
+    assert {ride_state(ride_id) for ride_id in ride_ids} == {(RideStatus.ACCEPTED, driver_id)}
+    assert trips(client, driver, corridor) == []
+
+def test_accept_checks_capacity_and_pool_key(client, register):
+    corridor, when = add_corridor(), departure()
+    rider, driver = register("rider"), register("driver")
+    big = [book(client, rider, corridor, when, passengers) for passengers in (3, 2)]
+    response = accept(client, driver, big)
+    assert response.status_code == 400
+    assert "5 seats" in response.json()["detail"]
+
+    suv = book(client, rider, corridor, when, 1, vehicle_type="suv")
+    assert accept(client, driver, [big[0], suv]).status_code == 400
+    assert {ride_state(ride_id) for ride_id in big + [suv]} == {(RideStatus.PENDING, None)}
+
+def test_partial_accept_rolls_back_the_whole_trip(client, register):
+    corridor, when = add_corridor(), departure()
+    rider, driver = register("rider"), register("driver")
+    taken, free = sorted(book(client, rider, corridor, when, 1) for _ in range(2))
+
+    # Accepted through another worker, whose index this one has not seen
+    db = SessionLocal()
+    try:
+        db.execute(update(IntercityRide).where(IntercityRide.id == taken).values(status=RideStatus.ACCEPTED))
+        db.commit()
+    finally:
+        db.close()
+
+    response = accept(client, driver, [taken, free])
+    assert response.status_code == 409, response.text
+    assert ride_state(free) == (RideStatus.PENDING, None)
+    # The stale ride leaves the index; the free one can still be pooled
+    assert [trip["ride_ids"] for trip in trips(client, driver, corridor)] == [[free]]
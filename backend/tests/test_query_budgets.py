@@ -0,0 +1,71 @@
+"""
+Query budgets for hot endpoints.
+
+The profiler runs in strict mode (see conftest), so a request that repeats one
+statement per row already fails. These tests also pin the number of statements
+each endpoint runs, read from the X-DB-Query-Count header.
+"""
+import pytest
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import User
+from app.query_profiler import QueryBudgetExceeded, query_budget
+from tests.conftest import ride_request
+
+def query_count(response) -> int:
+    assert response.status_code == 200, response.text
+    assert "x-db-n-plus-one" not in response.headers
+    return int(response.headers["x-db-query-count"])
+
+def completed_ride(client, register, driver: dict, lat: float, lng: float) -> tuple:
+    rider = register("rider")
+    response = client.post("/api/rides/", headers=rider, json=ride_request(lat, lng))
+    assert response.status_code == 201, response.text
+    ride_id = response.json()["id"]
+    for status in ("accepted", "in_progress", "completed"):
+        response = client.patch(f"/api/rides/{ride_id}", headers=driver, json={"status": status})
+        assert response.status_code == 200, response.text
+    return rider, ride_id
+
+def test_driver_list_is_one_query_however_many_drivers(client, online_driver):
+    before = query_count(client.get("/api/users/drivers"))
+    for i in range(6):
+        online_driver(13.201 + i * 0.001, 77.301)
+    assert query_count(client.get("/api/users/drivers")) == before == 1
+    assert query_count(client.get("/api/users/drivers", params={"available_only": True})) == 1
+
+def test_driver_location_update_budget(client, online_driver):
+    driver = online_driver(13.221, 77.321)
+    response = client.patch("/api/users/driver/location", headers=driver, json={"lat": 13.222, "lng": 77.322})
+    assert query_count(response) <= 4
+
+def test_rate_ride_budget(client, register, online_driver):
+    lat, lng = 13.241, 77.341
+    for i in range(5):
+        online_driver(lat + i * 0.001, lng)
+    rider, ride_id = completed_ride(client, register, online_driver(lat, lng), lat, lng)
+    response = client.post(f"/api/rides/{ride_id}/rate", headers=rider, json={"rating": 5})
+    assert query_count(response) <= 5
+
+def test_admin_stats_budget(client, register, online_driver):
+    admin = register("admin")
+    # The first call may load the cached archive totals
+    client.get("/api/admin/stats", headers=admin)
+    before = query_count(client.get("/api/admin/stats", headers=admin))
+    completed_ride(client, register, online_driver(13.261, 77.361), 13.261, 77.361)
+    assert query_count(client.get("/api/admin/stats", headers=admin)) == before <= 3
+
+def test_query_budget_sees_direct_queries(app):
+    db = SessionLocal()
+    try:
+        with query_budget(max_queries=1) as profile:
+            db.execute(select(User.id).limit(1)).all()
+        assert profile.queries == 1
+
+        with pytest.raises(QueryBudgetExceeded):
+            with query_budget(max_queries=5, n_plus_one_threshold=3):
+                for user_id in range(3):
+                    db.execute(select(User).where(User.id == user_id)).all()
+    finally:
+        db.close()
@@ -0,0 +1,53 @@
+import uuid
+
+from app.database import SessionLocal
+from app.models import City
+
+def add_city(client, admin: dict, lat: float, lng: float):
+    response = client.post("/api/intercity/cities", headers=admin, json={
+        "name": f"City {uuid.uuid4().hex[:8]}", "state": "Test", "lat": lat, "lng": lng
+    })
+    assert response.status_code == 201, response.text
+
+def test_cities_revalidate_with_a_weak_etag(client, register):
+    response = client.get("/api/intercity/cities")
+    assert response.status_code == 200, response.text
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    for if_none_match in (etag, etag[2:], f'"other", {etag}'):
+        response = client.get("/api/intercity/cities", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    # A new city changes the body, so the old ETag no longer matches
+    add_city(client, register("admin"), 21.17, 72.83)
+    response = client.get("/api/intercity/cities", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_compressed_and_identity_bodies_share_the_etag(client, register):
+    # Enough cities that the list is over the compression threshold
+    db = SessionLocal()
+    try:
+        db.add_all([City(name=f"City {uuid.uuid4().hex[:8]}", state="Test", lat=20.0 + i, lng=75.0) for i in range(12)])
+        db.commit()
+    finally:
+        db.close()
+    add_city(client, register("admin"), 21.25, 81.63)
+
+    identity = client.get("/api/intercity/cities", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/api/intercity/cities", headers={"Accept-Encoding": "gzip"})
+    assert identity.status_code == gzipped.status_code == 200
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert identity.content == gzipped.content
+    assert identity.headers["etag"] == gzipped.headers["etag"]
+
+    response = client.get("/api/intercity/cities", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]
+    })
+    assert response.status_code == 304
+    assert response.headers["vary"] == "Accept-Encoding"
@@ -0,0 +1,68 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.models import Ride, RideStatus
+from tests.conftest import ride_request
+
+DRIVERS = 12
+
+def test_concurrent_accepts_have_exactly_one_winner(app, client, register, online_driver):
+    lat, lng = 13.101, 77.451
+    rider = register("rider")
+    drivers = [online_driver(lat, lng) for _ in range(DRIVERS)]
+    response = client.post("/api/rides/", headers=rider, json=ride_request(lat, lng))
+    assert response.status_code == 201, response.text
+    ride_id = response.json()["id"]
+
+    # One client per driver; outside a ``with`` block each request gets its own
+    # event loop thread, so the handlers really run at the same time
+    barrier = threading.Barrier(DRIVERS)
+    results = [None] * DRIVERS
+
+    def accept(index: int):
+        driver_client = TestClient(app)
+        barrier.wait()
+        results[index] = driver_client.patch(
+            f"/api/rides/{ride_id}", headers=drivers[index], json={"status": "accepted"}
+        )
+
+    threads = [threading.Thread(target=accept, args=(index,)) for index in range(DRIVERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    codes = sorted(response.status_code for response in results)
+    assert codes == [200] + [409] * (DRIVERS - 1), [(r.status_code, r.text) for r in results]
+    winner = next(response for response in results if response.status_code == 200)
+
+    db = SessionLocal()
+    try:
+        ride = db.get(Ride, ride_id)
+        assert ride.status == RideStatus.ACCEPTED
+        assert ride.driver_id == winner.json()["driver_id"]
+    finally:
+        db.close()
+
+def test_accepting_a_ride_that_is_not_pending(client, register, online_driver):
+    lat, lng = 13.121, 77.471
+    rider = register("rider")
+    driver, other = online_driver(lat, lng), online_driver(lat, lng)
+    response = client.post("/api/rides/", headers=rider, json=ride_request(lat, lng))
+    assert response.status_code == 201, response.text
+    ride_id = response.json()["id"]
+
+    def accept(headers: dict):
+        return client.patch(f"/api/rides/{ride_id}", headers=headers, json={"status": "accepted"})
+
+    assert accept(driver).status_code == 200
+    # Another driver lost the race; the driver holding the ride did not
+    assert accept(other).status_code == 409
+    assert accept(driver).status_code == 400
+
+    for status in ("in_progress", "completed"):
+        response = client.patch(f"/api/rides/{ride_id}", headers=driver, json={"status": status})
+        assert response.status_code == 200, response.text
+    assert accept(other).status_code == 400
@@ -0,0 +1,60 @@
+import json
+
+from app.database import SessionLocal
+from app.geo import cell_for
+from app.models import OutboxEvent
+from app.surge import surge_engine
+from tests.conftest import ride_request
+
+def pending_in_cell(lat: float, lng: float) -> int:
+    return surge_engine._pending.get(cell_for(lat, lng, surge_engine.cell_size), 0)
+
+def test_cancelling_pending_ride_resolves_surge_demand(client, register):
+    lat, lng = 13.051, 77.512
+    rider = register("rider")
+    before = pending_in_cell(lat, lng)
+
+    response = client.post("/api/rides/", headers=rider, json=ride_request(lat, lng))
+    assert response.status_code == 201, response.text
+    assert pending_in_cell(lat, lng) == before + 1
+
+    response = client.delete(f"/api/rides/{response.json()['id']}", headers=rider)
+    assert response.status_code == 204, response.text
+    assert pending_in_cell(lat, lng) == before
+
+def user_id(client, headers: dict) -> int:
+    return client.get("/api/users/me", headers=headers).json()["id"]
+
+def test_new_ride_is_offered_to_drivers_in_the_dispatch_radius(client, register, online_driver):
+    lat, lng = 13.071, 77.532
+    near, far = online_driver(lat + 0.005, lng), online_driver(lat + 0.1, lng)
+    response = client.post("/api/rides/", headers=register("rider"), json=ride_request(lat, lng))
+    assert response.status_code == 201, response.text
+    ride_id = response.json()["id"]
+
+    db = SessionLocal()
+    try:
+        offers = [
+            json.loads(event.user_ids)
+            for event in db.query(OutboxEvent).filter(OutboxEvent.event_type == "new_ride_request")
+            if json.loads(event.payload)["ride_id"] == ride_id
+        ]
+    finally:
+        db.close()
+    assert offers == [[user_id(client, near)]]
+    assert user_id(client, far) not in offers[0]
+
+def test_available_rides_are_the_pending_ones_in_the_dispatch_radius(client, register, online_driver):
+    lat, lng = 13.091, 77.552
+    driver = online_driver(lat, lng)
+    rider = register("rider")
+    near = client.post("/api/rides/", headers=rider, json=ride_request(lat + 0.01, lng)).json()["id"]
+    # Inside the bounding box's corner but outside the radius
+    corner = client.post("/api/rides/", headers=rider, json=ride_request(lat + 0.025, lng + 0.025)).json()["id"]
+    far = client.post("/api/rides/", headers=rider, json=ride_request(lat + 0.2, lng)).json()["id"]
+
+    response = client.get("/api/rides/available", headers=driver)
+    assert response.status_code == 200, response.text
+    available = {ride["id"] for ride in response.json()}
+    assert near in available
+    assert corner not in available and far not in available
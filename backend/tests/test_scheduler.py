@@ -0,0 +1,78 @@
+import asyncio
+from datetime import timedelta
+
+from app.database import SessionLocal
+from app.models import Ride, RideStatus
+from app.scheduler import RideScheduler, utcnow
+from tests.conftest import ride_request
+
+def book(client, rider: dict, lat: float, lng: float, pickup_in: timedelta) -> int:
+    body = dict(ride_request(lat, lng), scheduled_time=(utcnow() + pickup_in).isoformat())
+    response = client.post("/api/rides/", headers=rider, json=body)
+    assert response.status_code == 201, response.text
+    assert response.json()["status"] == "scheduled"
+    return response.json()["id"]
+
+def ride_status(ride_id: int) -> RideStatus:
+    db = SessionLocal()
+    try:
+        return db.get(Ride, ride_id).status
+    finally:
+        db.close()
+
+def test_due_ride_is_released_into_dispatch(client, register, monkeypatch):
+    monkeypatch.setattr("app.scheduler.outbox_relay.wake", lambda: None)
+    ride_id = book(client, register("rider"), 13.301, 77.401, timedelta(minutes=30))
+    # The app's scheduler holds it for another 15 minutes; with a 60 minute lead it is due now
+    scheduler = RideScheduler(lead_minutes=60)
+
+    async def scenario():
+        await scheduler.refill()
+        assert ride_id in scheduler._queued
+        await scheduler.release_due()
+
+    asyncio.run(scenario())
+    assert ride_status(ride_id) == RideStatus.PENDING
+    assert ride_id not in scheduler._queued
+    assert scheduler.released >= 1
+
+def test_ride_cancelled_before_release_is_skipped(client, register, monkeypatch):
+    monkeypatch.setattr("app.scheduler.outbox_relay.wake", lambda: None)
+    rider = register("rider")
+    ride_id = book(client, rider, 13.311, 77.411, timedelta(minutes=30))
+    scheduler = RideScheduler(lead_minutes=60)
+
+    async def scenario():
+        await scheduler.refill()
+        assert ride_id in scheduler._queued
+        response = client.delete(f"/api/rides/{ride_id}", headers=rider)
+        assert response.status_code == 204, response.text
+        skipped = scheduler.skipped
+        await scheduler.release_due()
+        assert scheduler.skipped == skipped + 1
+
+    asyncio.run(scenario())
+    assert ride_status(ride_id) == RideStatus.CANCELLED
+
+def test_refill_loads_rides_as_the_horizon_moves(client, register, monkeypatch):
+    rider = register("rider")
+    soon = book(client, rider, 13.321, 77.421, timedelta(minutes=30))
+    later = book(client, rider, 13.322, 77.422, timedelta(hours=3))
+    scheduler = RideScheduler(lead_minutes=15, horizon_hours=1)
+
+    async def scenario():
+        await scheduler.refill()
+        assert soon in scheduler._queued
+        assert later not in scheduler._queued
+
+        # Beyond the loaded window, so it waits for a refill rather than growing the heap
+        scheduler.schedule(later, utcnow() + timedelta(hours=3))
+        assert later not in scheduler._queued
+
+        two_hours_on = utcnow() + timedelta(hours=2)
+        monkeypatch.setattr("app.scheduler.utcnow", lambda: two_hours_on)
+        await scheduler.refill()
+        assert later in scheduler._queued
+
+    asyncio.run(scenario())
+    assert ride_status(later) == RideStatus.SCHEDULED
@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy import create_engine
+
+from app.schema import HEAD_REVISION, SchemaVersionError, check_schema_version, head_revision
+
+def test_head_revision_constant_matches_the_migration_scripts():
+    assert HEAD_REVISION == head_revision()
+
+def test_startup_check_accepts_a_migrated_database(app):
+    from app.database import engine
+
+    check_schema_version(engine)
+
+def test_startup_check_rejects_an_unmigrated_database():
+    with pytest.raises(SchemaVersionError):
+        check_schema_version(create_engine("sqlite://"))
@@ -0,0 +1,53 @@
+import threading
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.outbox import add_event
+
+def book_vacation(client, rider: dict) -> int:
+    start = datetime.utcnow() + timedelta(days=7)
+    response = client.post("/api/vacation/", headers=rider, json={
+        "destination": "Goa",
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=3)).isoformat()
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def test_only_drivers_and_admins_confirm_or_reject(client, register):
+    rider = register("rider")
+    vacation_id = book_vacation(client, rider)
+    assert client.patch(f"/api/vacation/{vacation_id}/confirm", headers=rider).status_code == 403
+    assert client.patch(f"/api/vacation/{vacation_id}/reject", headers=rider).status_code == 403
+
+    response = client.patch(f"/api/vacation/{vacation_id}/reject", headers=register("admin"))
+    assert response.status_code == 200, response.text
+    assert response.json()["vacation"]["status"] == "rejected"
+
+def test_concurrent_confirms_have_exactly_one_winner(app, register, monkeypatch):
+    client = TestClient(app)
+    vacation_id = book_vacation(client, register("rider"))
+    drivers = [register("driver"), register("driver")]
+
+    # Both handlers have read the pending booking before either commits
+    barrier = threading.Barrier(len(drivers), timeout=5)
+
+    def add_event_after_both_read(*args, **kwargs):
+        barrier.wait()
+        return add_event(*args, **kwargs)
+
+    monkeypatch.setattr("app.routers.vacation.add_event", add_event_after_both_read)
+    results = [None] * len(drivers)
+
+    def confirm(index: int):
+        # Outside a ``with`` block each client runs its request on its own event loop thread
+        results[index] = TestClient(app).patch(f"/api/vacation/{vacation_id}/confirm", headers=drivers[index])
+
+    threads = [threading.Thread(target=confirm, args=(index,)) for index in range(len(drivers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(response.status_code for response in results) == [200, 409], [r.text for r in results]
@@ -0,0 +1,83 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.sql import Insert
+
+from app.database import SessionLocal, engine
+from app.models import Ride, RideStatus
+from app.scheduler import RideScheduler, as_utc
+
+def book_vacation(client, rider: dict, departure: datetime, activities: int = 0) -> int:
+    start = datetime.utcnow() + timedelta(days=1)
+    response = client.post("/api/vacation/", headers=rider, json={
+        "destination": "Goa",
+        "hotel_name": "Sea View",
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=3)).isoformat(),
+        "schedule": {"packageName": "Beach"},
+        "flight_details": {
+            "departureTime": departure.isoformat(),
+            "arrivalTime": (departure + timedelta(hours=2)).isoformat()
+        },
+        "activities": [{"location": f"Activity {i}"} for i in range(activities)]
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def test_rides_are_inserted_in_one_statement_and_queued_in_order(client, register, monkeypatch):
+    scheduler = RideScheduler(lead_minutes=15)
+    monkeypatch.setattr("app.routers.vacation_scheduler.ride_scheduler", scheduler)
+    rider = register("rider")
+    departure = datetime.utcnow().replace(microsecond=0) + timedelta(hours=3)
+    vacation_id = book_vacation(client, rider, departure, activities=2)
+
+    inserts = []
+
+    # Counted per execute() call; the dialect may still split it into several batches
+    def count_inserts(conn, clauseelement, multiparams, params, execution_options):
+        if isinstance(clauseelement, Insert) and clauseelement.table.name == "rides":
+            inserts.append(clauseelement)
+
+    event.listen(engine, "before_execute", count_inserts)
+    try:
+        response = client.post(f"/api/scheduler/vacation/{vacation_id}/schedule-rides", headers=rider)
+    finally:
+        event.remove(engine, "before_execute", count_inserts)
+    assert response.status_code == 200, response.text
+    assert len(inserts) == 1
+
+    rides = response.json()["rides"]
+    assert [ride["pickup_address"] for ride in rides] == ["Home", "Destination Airport", "Sea View", "Sea View"]
+    assert all(ride["status"] == "scheduled" for ride in rides)
+
+    # RETURNING rows come back in parameter order, so each id is queued with its own pickup time
+    release_at = {ride_id: release for release, ride_id in scheduler._heap}
+    for ride in rides:
+        pickup = as_utc(datetime.fromisoformat(ride["scheduled_time"]))
+        assert release_at[ride["id"]] == (pickup - scheduler.lead).timestamp()
+    assert as_utc(datetime.fromisoformat(rides[0]["scheduled_time"])) == as_utc(departure - timedelta(minutes=30))
+    assert as_utc(datetime.fromisoformat(rides[1]["scheduled_time"])) == as_utc(departure + timedelta(hours=2, minutes=30))
+
+def ride_status(ride_id: int) -> RideStatus:
+    db = SessionLocal()
+    try:
+        return db.get(Ride, ride_id).status
+    finally:
+        db.close()
+
+def test_past_due_ride_is_released_by_the_scheduler(client, register):
+    rider = register("rider")
+    # The airport pickup is overdue; the dropoff 30 minutes after landing is 90 minutes out
+    vacation_id = book_vacation(client, rider, datetime.utcnow() - timedelta(hours=1))
+    response = client.post(f"/api/scheduler/vacation/{vacation_id}/schedule-rides", headers=rider)
+    assert response.status_code == 200, response.text
+    pickup, dropoff = response.json()["rides"]
+    # Stored as SCHEDULED like every automated ride, never straight into the pending pool
+    assert pickup["status"] == dropoff["status"] == "scheduled"
+
+    deadline = time.monotonic() + 5
+    while ride_status(pickup["id"]) != RideStatus.PENDING and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert ride_status(pickup["id"]) == RideStatus.PENDING
+    assert ride_status(dropoff["id"]) == RideStatus.SCHEDULED
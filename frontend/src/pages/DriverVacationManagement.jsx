@@ -35,6 +35,10 @@ export default function DriverVacationManagement() {
 
   // Parse schedule data if available
   const parseSchedule = (scheduleJson) => {
+    // The API returns parsed JSON; older responses sent a JSON string
+    if (typeof scheduleJson !== 'string') {
+      return scheduleJson;
+    }
     try {
       return JSON.parse(scheduleJson);
     } catch (e) {
@@ -120,6 +120,7 @@ export default function RiderDashboard() {
 
   const getStatusBadge = (status) => {
     const badges = {
+      scheduled: 'badge',
       pending: 'badge-warning',
       accepted: 'badge-info',
       in_progress: 'badge-info',
@@ -146,6 +147,8 @@ export default function RiderDashboard() {
 
   const getStatusText = (status) => {
     switch(status) {
+      case 'scheduled':
+        return '🗓️ Scheduled'
       case 'pending':
         return '⏳ Finding driver...'
       case 'accepted':
@@ -369,8 +372,8 @@ export default function RiderDashboard() {
                       </span>
                     )}
                   </div>
-                  {/* Cancel button for pending rides */}
-                  {ride.status === 'pending' && (
+                  {/* Cancel button for pending and scheduled rides */}
+                  {(ride.status === 'pending' || ride.status === 'scheduled') && (
                     <div className="mt-3 pt-3 border-t border-gray-200">
                       <button
                         onClick={() => handleCancelRide(ride.id)}
@@ -49,6 +49,7 @@ echo   Edit backend\.env with your database credentials
 echo.
 echo STEP 4: Start Backend
 echo   cd backend
+echo   alembic upgrade head
 echo   python main.py
 echo.
 echo STEP 5: Setup Frontend (in new terminal)